@@ -0,0 +1,325 @@
+"""
+Import time profiler for the project
+
+Runs an entry point (main.py by default) under `python -X importtime` and:
+1. Prints the import tree w/ the self / cumulative time of each module
+   (median of --runs runs, as a single run is noisy), leaving out the modules
+   the interpreter imports at startup whatever the target
+2. Flags the import cycles between the project's modules (ex. mod_a1 <-> mod_c1),
+   found by reading their import statements
+3. Compares the total import time to a stored baseline, exiting w/ status 1
+   when it regressed by more than --threshold
+
+Usage:
+python importprofile.py
+python importprofile.py --save-baseline importtime_baseline.json
+python importprofile.py --baseline importtime_baseline.json --threshold 0.2
+python importprofile.py --target "-c" "import package_a.mod_a1"
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+THRESHOLD = 0.2  # Allowed relative increase of the total import time
+MIN_MS = 0.0  # Modules importing faster than this are hidden from the tree
+
+
+class ImportNode:
+    """
+    Module in the import tree, w/ the modules it imported as children
+    """
+
+    def __init__(self, name, self_us, cumulative_us, children):
+        self.name = name
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.children = children
+
+
+def parse_importtime(stderr):
+    """
+    Parse the output of -X importtime into a tree
+    - Lines are printed once a module finished importing, so the modules it
+      imported come before it, one indentation level (2 spaces) deeper
+    :param stderr: Output of a process run w/ -X importtime
+    :return: List of the ImportNode imported at the top level, in import order
+    """
+    pending = {}  # Mapping of depth -> nodes not attached to a parent yet
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        node = ImportNode(
+            name.strip(), int(self_us), int(cumulative_us), pending.pop(depth + 1, [])
+        )
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+
+def run_importtime(target, runs):
+    """
+    Run the target runs times under -X importtime
+    :param target: Arguments given to python (ex. ["main.py"])
+    :param runs: Number of runs
+    :return: (tree of the first run, mapping of module -> median self /
+        cumulative time across the runs, median total import time)
+    """
+    startup = {node.name for node in _importtime(["-c", "pass"])}
+    trees = [
+        [node for node in _importtime(target) if node.name not in startup]
+        for _ in range(runs)
+    ]
+
+    samples = {}  # Mapping of module -> list of (self, cumulative) samples
+    for tree in trees:
+        for node, _ in walk(tree):
+            samples.setdefault(node.name, []).append((node.self_us, node.cumulative_us))
+    medians = {
+        name: {
+            "self_us": statistics.median(sample[0] for sample in values),
+            "cumulative_us": statistics.median(sample[1] for sample in values),
+        }
+        for name, values in samples.items()
+    }
+    total_us = statistics.median(
+        sum(node.cumulative_us for node in tree) for tree in trees
+    )
+    return trees[0], medians, total_us
+
+
+def _importtime(target):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *target],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"{' '.join(target)} failed:\n{result.stderr}")
+    return parse_importtime(result.stderr)
+
+
+def walk(nodes, depth=0):
+    """
+    Yield every node of a tree, parents before their children
+    :return: Generator of (ImportNode, depth)
+    """
+    for node in nodes:
+        yield node, depth
+        yield from walk(node.children, depth + 1)
+
+
+def print_tree(tree, medians, min_ms=MIN_MS):
+    """
+    Print the import tree, w/ the median times of each module
+    """
+    print(f"{'self ms':>8} {'cumul ms':>9}  module")
+    for node, depth in walk(tree):
+        times = medians[node.name]
+        if times["cumulative_us"] / 1000 < min_ms:
+            continue
+        print(
+            f"{times['self_us'] / 1000:>8.2f} {times['cumulative_us'] / 1000:>9.2f}  "
+            f"{'  ' * depth}{node.name}"
+        )
+
+
+def project_imports(project_dir=PROJECT_DIR):
+    """
+    Read the import statements of every module of the project
+    - lazy_import("...") calls count as (lazy) imports too
+    :param project_dir: Root directory of the project
+    :return: Mapping of module -> {imported project module: True if lazy}
+    """
+    modules = {}  # Mapping of module name -> path
+    for root, dirs, files in os.walk(project_dir):
+        dirs[:] = [name for name in dirs if not name.startswith((".", "__"))]
+        for file in files:
+            if file.endswith(".py"):
+                path = os.path.join(root, file)
+                name = os.path.relpath(path, project_dir)[: -len(".py")]
+                name = name.replace(os.sep, ".").removesuffix(".__init__")
+                modules[name] = path
+
+    def resolve(name):
+        # Keep the longest project module matching the import
+        while name and name not in modules:
+            name = name.rpartition(".")[0]
+        return name or None
+
+    graph = {}
+    for module, path in modules.items():
+        with open(path, "r") as file:
+            tree = ast.parse(file.read(), path)
+
+        imports = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [(alias.name, False) for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                # "from package import module" imports the submodule
+                names = [(f"{node.module}.{alias.name}", False) for alias in node.names]
+            elif (
+                isinstance(node, ast.Call)
+                and getattr(node.func, "id", None) == "lazy_import"
+                and node.args
+                and isinstance(node.args[0], ast.Constant)
+            ):
+                names = [(node.args[0].value, True)]
+            else:
+                continue
+
+            for name, lazy in names:
+                imported = resolve(name)
+                if imported and imported != module:
+                    imports[imported] = imports.get(imported, True) and lazy
+        graph[module] = imports
+    return graph
+
+
+def find_cycles(graph):
+    """
+    Find the import cycles of a graph, w/ Tarjan's strongly connected components
+    :param graph: Mapping of module -> {imported module: True if lazy}
+    :return: List of cycles, each a sorted list of module names
+    """
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    cycles = []
+
+    def visit(module):
+        index[module] = low[module] = len(index)
+        stack.append(module)
+        on_stack.add(module)
+        for imported in graph.get(module, {}):
+            if imported not in index:
+                visit(imported)
+                low[module] = min(low[module], low[imported])
+            elif imported in on_stack:
+                low[module] = min(low[module], index[imported])
+
+        if low[module] == index[module]:
+            component = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member == module:
+                    break
+            if len(component) > 1:
+                cycles.append(sorted(component))
+
+    for module in graph:
+        if module not in index:
+            visit(module)
+    return cycles
+
+
+def print_cycles(graph, cycles):
+    """
+    Print each cycle w/ its edges, marking the lazy ones (harmless at import time)
+    """
+    if not cycles:
+        print("No import cycles")
+        return
+    for cycle in cycles:
+        members = set(cycle)
+        edges = [
+            (module, imported, lazy)
+            for module in cycle
+            for imported, lazy in graph[module].items()
+            if imported in members
+        ]
+        eager = [edge for edge in edges if not edge[2]]
+        status = "eager, modules load each other" if eager else "lazy only, harmless"
+        print(f"Import cycle between {', '.join(cycle)} ({status})")
+        for module, imported, lazy in edges:
+            print(f"  {module} -> {imported}{' (lazy)' if lazy else ''}")
+
+
+def compare_to_baseline(baseline, medians, total_us, threshold=THRESHOLD):
+    """
+    Compare import times to a baseline
+    :param baseline: Dictionary saved by --save-baseline
+    :return: True if the total import time regressed by more than threshold
+    """
+    limit_us = baseline["total_us"] * (1 + threshold)
+    change = total_us / baseline["total_us"] - 1
+    print(
+        f"Total import time {total_us / 1000:.2f} ms vs. baseline "
+        f"{baseline['total_us'] / 1000:.2f} ms ({change:+.0%}, "
+        f"limit {limit_us / 1000:.2f} ms)"
+    )
+
+    # Point at the modules which got slower the most, or appeared
+    deltas = sorted(
+        (
+            (times["self_us"] - baseline["modules"].get(name, 0), name)
+            for name, times in medians.items()
+        ),
+        reverse=True,
+    )
+    for delta_us, name in deltas[:5]:
+        if delta_us > 0:
+            new = "" if name in baseline["modules"] else " (new)"
+            print(f"  {name}{new}: {delta_us / 1000:+.2f} ms self time")
+
+    return total_us > limit_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the project's imports")
+    parser.add_argument(
+        "--target",
+        nargs=argparse.REMAINDER,
+        default=["main.py"],
+        help="Arguments given to python, defaults to main.py",
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--min-ms", type=float, default=MIN_MS)
+    parser.add_argument("--baseline", help="Baseline to compare to")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--save-baseline", metavar="FILE")
+    args = parser.parse_args()
+
+    tree, medians, total_us = run_importtime(args.target, args.runs)
+    print_tree(tree, medians, args.min_ms)
+    print(f"\nTotal import time: {total_us / 1000:.2f} ms (median of {args.runs})\n")
+
+    graph = project_imports()
+    print_cycles(graph, find_cycles(graph))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(
+                {
+                    "target": args.target,
+                    "total_us": total_us,
+                    "modules": {
+                        name: times["self_us"] for name, times in medians.items()
+                    },
+                },
+                file,
+                indent=2,
+            )
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        print()
+        if compare_to_baseline(baseline, medians, total_us, args.threshold):
+            sys.exit("Import time regressed past the threshold")
+
+
+if __name__ == "__main__":
+    main()
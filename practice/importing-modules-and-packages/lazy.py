@@ -0,0 +1,47 @@
+"""
+Lazy import helpers
+
+A module imported w/ lazy_import() is only loaded the first time one of its
+attributes is used, so importing a module which depends on many others
+doesn't load them all up front (and import cycles between them are harmless)
+
+Only the __import__ builtin is used (not importlib.util.LazyLoader), as
+importlib.util itself imports more modules than this project has
+"""
+
+import sys
+
+
+class LazyModule(type(sys)):
+    """
+    Stand-in for a module, importing the real one when an attribute is first used
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        # Let __getattr__ answer these from the real module
+        for attr in ("__package__", "__loader__", "__spec__"):
+            del self.__dict__[attr]
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def _load(self):
+        if "_module" not in self.__dict__:
+            __import__(self.__name__)
+            self.__dict__["_module"] = sys.modules[self.__name__]
+        return self.__dict__["_module"]
+
+
+def lazy_import(name):
+    """
+    Import a module by its absolute name, deferring the import until first use
+    :param name: Absolute name of the module (ex. "package_b.mod_b1")
+    :return: The module if already imported, else a LazyModule standing in for it
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
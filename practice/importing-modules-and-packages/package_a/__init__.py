@@ -0,0 +1,22 @@
+"""
+package_a/__init__.py
+
+Submodules are only imported when first accessed (PEP 562), ex. package_a.mod_a1
+- Nothing is imported here, so importing a single submodule stays as cheap as
+  it was when this was a namespace package (w/o __init__.py)
+"""
+
+__all__ = ["mod_a1", "mod_a2", "mod_a3"]
+
+
+def __getattr__(name):
+    """Imports a submodule the first time it is accessed as an attribute"""
+    if name in __all__:
+        __import__(f"{__name__}.{name}")  # Binds the submodule in globals()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    """Lists the submodules, imported or not"""
+    return sorted(set(__all__) | set(globals()))
@@ -10,21 +10,26 @@ In order to run mod_a1.py directly:
 
 # Importing modules from a root directory
 import helper
+from lazy import lazy_import
+
+# The modules below are imported lazily: each one is only loaded when one of
+# its attributes is first used, so importing mod_a1 to call a1_func() doesn't
+# load package_b / package_c (which import package_a back)
+# Eager equivalent => `import package_a.mod_a2 as ma2`
 
 # Import modules from the same directory (package)
-import package_a.mod_a2 as ma2
-import package_a.mod_a3 as ma3
+ma2 = lazy_import("package_a.mod_a2")
+ma3 = lazy_import("package_a.mod_a3")
 
 # Import modules from an adjacent package (package_b)
-import package_b.mod_b1 as mb1  # using standard import syntax
-from package_b import mod_b2 as mb2, mod_b3 as mb3  # Using from..import syntax
+mb1 = lazy_import("package_b.mod_b1")
+mb2 = lazy_import("package_b.mod_b2")
+mb3 = lazy_import("package_b.mod_b3")
 
 # Import modules from a sub-directory / sub-package (package_c)
-import package_b.package_c.mod_c1 as mc1  # using standard import syntax
-from package_b.package_c import (
-    mod_c2 as mc2,
-    mod_c3 as mc3,
-)  # using from..import syntax
+mc1 = lazy_import("package_b.package_c.mod_c1")
+mc2 = lazy_import("package_b.package_c.mod_c2")
+mc3 = lazy_import("package_b.package_c.mod_c3")
 
 
 def a1_func():
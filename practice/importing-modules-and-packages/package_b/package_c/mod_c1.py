@@ -10,16 +10,24 @@ In order to run mod_c1.py directly:
 
 # Import modules from root directory
 import helper
+from lazy import lazy_import
+
+# The modules below are imported lazily (see package_a/mod_a1.py), which also
+# keeps the mod_a1 <-> mod_c1 import cycle from loading the whole tree
 
 # Import adjacent modules
-import package_b.package_c.mod_c2 as mc2
-import package_b.package_c.mod_c3 as mc3
+mc2 = lazy_import("package_b.package_c.mod_c2")
+mc3 = lazy_import("package_b.package_c.mod_c3")
 
 # Import modules from parent package (package_b)
-from package_b import mod_b1 as mb1, mod_b2 as mb2, mod_b3 as mb3
+mb1 = lazy_import("package_b.mod_b1")
+mb2 = lazy_import("package_b.mod_b2")
+mb3 = lazy_import("package_b.mod_b3")
 
 # Import modules from package_a
-from package_a import mod_a1 as ma1, mod_a2 as ma2, mod_a3 as ma3
+ma1 = lazy_import("package_a.mod_a1")
+ma2 = lazy_import("package_a.mod_a2")
+ma3 = lazy_import("package_a.mod_a3")
 
 
 def c1_func():
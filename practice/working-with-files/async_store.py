@@ -0,0 +1,202 @@
+"""
+asyncio API for the db_controller backends
+
+The controllers block on disk I/O (or sqlite3), which would stall the event
+loop. AsyncStore runs every call in a bounded thread pool instead:
+- Reads of the same store run concurrently
+- Writes to the same store are serialized, and never overlap a read
+  (a file backend rewrites its file, so a concurrent read could see it half written)
+- A store is meant to be used from a single event loop
+
+Usage:
+async with open_async_store("json") as store:  # Closed w/ aclose() on exit
+    await store.add_todo("new todo")
+    async for todo in store.aiter_todos():
+        print(todo)
+"""
+
+import asyncio
+import contextlib
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import backends
+
+MAX_WORKERS = 4  # Threads running blocking controller calls, per store
+ITER_BATCH_SIZE = 500  # Todos fetched per executor round trip by aiter_todos()
+
+
+class ReadWriteLock:
+    """
+    asyncio lock allowing many readers or a single writer at a time
+    - Waiting writers block new readers, so a steady flow of reads can't starve writes
+    """
+
+    def __init__(self):
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+        self._condition = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def reading(self):
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: not self._writing and not self._waiting_writers
+            )
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def writing(self):
+        async with self._condition:
+            self._waiting_writers += 1
+            await self._condition.wait_for(
+                lambda: not self._writing and not self._readers
+            )
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class AsyncStore:
+    """
+    Exposes the db_controller functions as coroutines
+    """
+
+    def __init__(self, store, max_workers: int = MAX_WORKERS):
+        """
+        :param store: db_controller module (or store) to wrap
+        :param max_workers: Maximum number of threads running blocking calls
+        """
+        self.store = store
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="async-store"
+        )
+        self._lock = ReadWriteLock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def close(self):
+        """
+        Shut the thread pool down, waiting for the running calls to finish
+        - Blocks, use aclose() from a coroutine
+        """
+        self._executor.shutdown(wait=True)
+
+    async def aclose(self):
+        """
+        Like close(), waiting for the running calls w/o blocking the event loop
+        """
+        await asyncio.to_thread(self.close)
+
+    async def create_db_if_not_exists(self):
+        return await self._write(self.store.create_db_if_not_exists)
+
+    async def get_todos(self):
+        return await self._read(self.store.get_todos)
+
+    async def get_todo_by_id(self, id: int):
+        return await self._read(self.store.get_todo_by_id, id)
+
+    async def add_todo(self, msg: str):
+        return await self._write(self.store.add_todo, msg)
+
+    async def insert_todos(self, todos):
+        return await self._write(self.store.insert_todos, list(todos))
+
+    async def update_todo(
+        self, id: int, new_msg: str = None, new_complete: bool = None
+    ):
+        return await self._write(self.store.update_todo, id, new_msg, new_complete)
+
+    async def toggle_complete(self, id: int):
+        return await self._write(self.store.toggle_complete, id)
+
+    async def delete_todo(self, id: int):
+        return await self._write(self.store.delete_todo, id)
+
+    async def execute_batch(self, ops):
+        return await self._write(self.store.execute_batch, list(ops))
+
+    async def aiter_todos(self, batch_size: int = ITER_BATCH_SIZE):
+        """
+        Asynchronously yield every todo, reading batch_size todos per executor call
+        - The batches are read ahead of the caller (see _read_ahead()), so writes
+          only wait for the store to be read, never for a slow caller (ex. a
+          client of server.py) to consume the todos
+        - The batches the caller hasn't consumed yet are kept in memory
+        """
+        batches = asyncio.Queue()
+        stop = asyncio.Event()
+        reader = asyncio.create_task(self._read_ahead(batches, batch_size, stop))
+        try:
+            while (batch := await batches.get()) is not None:
+                for todo in batch:
+                    yield todo
+            await reader  # Raises the error which ended the reading, if any
+        finally:
+            # The caller stopped early, the current batch is read before the
+            # file / cursor is released
+            stop.set()
+            await asyncio.gather(reader, return_exceptions=True)
+
+    async def _read_ahead(self, batches: asyncio.Queue, batch_size: int, stop):
+        """
+        Put the batches of todos into a queue until the store is read or stop is set
+        - The read lock is released as soon as the last batch is read
+        - None is put after the last batch
+        """
+        try:
+            async with self._lock.reading():
+                todos = self.store.iter_todos()
+
+                def next_batch():
+                    return list(itertools.islice(todos, batch_size))
+
+                try:
+                    while not stop.is_set() and (batch := await self._run(next_batch)):
+                        batches.put_nowait(batch)
+                finally:
+                    # Release the file / cursor right away
+                    if hasattr(todos, "close"):
+                        await self._run(todos.close)
+        finally:
+            batches.put_nowait(None)
+
+    async def _read(self, func, *args):
+        async with self._lock.reading():
+            return await self._run(func, *args)
+
+    async def _write(self, func, *args):
+        async with self._lock.writing():
+            return await self._run(func, *args)
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+
+def open_async_store(name: str, db_name: str = None, max_workers: int = MAX_WORKERS):
+    """
+    Load a backend and wrap it in an AsyncStore
+    :param name: Name of the backend (one of backends.BACKENDS)
+    :param db_name: DB file to use instead of the backend's default
+    :param max_workers: Maximum number of threads running blocking calls
+    :return: AsyncStore
+    """
+    return AsyncStore(backends.load_backend(name, db_name), max_workers)
@@ -0,0 +1,87 @@
+"""
+Registry of the available storage backends
+
+Each backend lives in its own sub-directory as database/db_controller.py
+and exposes the same set of functions (see CONTROLLER_API), so any of them
+can be loaded and used interchangeably
+
+Controllers are only imported once they are loaded, so a process using a
+single backend never imports the modules the others depend on
+"""
+
+import importlib.util
+import os
+import zipimport
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Mapping of backend names to the sub-directory holding their controller
+BACKENDS = {
+    "txt": "txt-files",
+    "csv": "csv-files",
+    "json": "json-files",
+    "sqlite": "sqlite",
+}
+
+# Environment variable selecting the backend when none is given explicitly
+BACKEND_ENV_VAR = "TODO_BACKEND"
+DEFAULT_BACKEND = "sqlite"
+
+# Functions implemented by every db_controller module
+CONTROLLER_API = (
+    "create_db_if_not_exists",
+    "get_todos",
+    "iter_todos",
+    "get_todo_by_id",
+    "add_todo",
+    "insert_todos",
+    "update_todo",
+    "toggle_complete",
+    "delete_todo",
+    "execute_batch",
+)
+
+
+def load_backend(name: str, db_name: str = None):
+    """
+    Import a fresh copy of a backend's db_controller module
+    - Each call returns an independent module, so two stores of the same
+      backend (ex. a primary and an archive) don't share their DB_NAME
+    :param name: Name of the backend (one of BACKENDS)
+    :param db_name: DB file to use instead of the controller's default DB_NAME
+    :return: The loaded db_controller module
+    """
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown backend '{name}', expected one of: {', '.join(BACKENDS)}"
+        )
+
+    path = os.path.join(BASE_DIR, BACKENDS[name], "database", "db_controller.py")
+    if os.path.exists(path):
+        spec = importlib.util.spec_from_file_location(f"{name}_db_controller", path)
+    else:
+        # Running from a zipapp (see build_zipapp.py), which only holds bytecode
+        spec = zipimport.zipimporter(os.path.dirname(path)).find_spec("db_controller")
+    if spec is None:
+        raise ModuleNotFoundError(f"No db_controller found for backend '{name}'")
+
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    if db_name is not None:
+        module.DB_NAME = db_name
+    return module
+
+
+def resolve_backend(name: str = None):
+    """
+    Pick the backend to use
+    :param name: Explicitly requested backend, if any
+    :return: name, else the BACKEND_ENV_VAR environment variable, else DEFAULT_BACKEND
+    """
+    name = name or os.environ.get(BACKEND_ENV_VAR) or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown backend '{name}', expected one of: {', '.join(BACKENDS)}"
+        )
+    return name
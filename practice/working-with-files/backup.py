@@ -0,0 +1,234 @@
+"""
+Online backup of a store, while the CLI (or the server) keeps using it
+
+- sqlite: data.db is copied w/ the sqlite3 backup API, --pages pages per step,
+  so writers only wait for a step, not for the whole copy (a write made
+  during the backup restarts it from the first page on the next step)
+- txt / csv / json: the files (every shard of a sharded store) are copied
+  while holding the store's lock shared, so writes wait until the copy is done
+  and it never holds a half written file; the copy is done by the kernel w/
+  os.copy_file_range() (or os.sendfile()), w/o going through Python buffers
+- The destination is the DB_NAME of the copy, shards go to <destination>.d/
+  (copied into a new directory which then replaces it, so no shard of an
+  older backup is left behind)
+- Progress and throughput (MB/sec) are reported while copying
+
+Usage:
+python backup.py --backend sqlite --to backups/data.db
+python backup.py --backend txt --db big.txt --to backups/big.txt
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import backends
+
+PAGES = 256  # SQLite pages copied per backup step
+STEP_DELAY = 0.001  # Seconds between steps, for writers to get the DB
+CHUNK_SIZE = 8 * 1024 * 1024  # Bytes copied between two progress reports
+
+
+def backup(
+    store,
+    destination: str,
+    pages: int = PAGES,
+    chunk_size: int = CHUNK_SIZE,
+    on_progress=None,
+):
+    """
+    Copy a store's DB to destination while it stays in use
+    :param store: db_controller module (or store) to back up
+    :param destination: Path of the copy, the DB_NAME of the backed up store
+    :param pages: SQLite pages copied per step
+    :param chunk_size: Bytes the file backends copy between progress reports
+    :param on_progress: Optional callback invoked after each step w/
+        (bytes copied so far, total bytes, seconds elapsed)
+    :return: Number of bytes copied
+    """
+    if os.path.abspath(destination) == os.path.abspath(store.DB_NAME):
+        raise ValueError("Can't back up a DB onto itself")
+    if hasattr(store, "lock"):
+        return _backup_files(store, destination, chunk_size, on_progress)
+    return _backup_sqlite(store, destination, pages, on_progress)
+
+
+def _backup_sqlite(store, destination: str, pages: int, on_progress=None):
+    """
+    Copy a SQLite DB w/ Connection.backup(), a few pages at a time
+    :return: Number of bytes copied
+    """
+    import sqlite3
+
+    start = time.perf_counter()
+    source = sqlite3.connect(store.DB_NAME)
+    target = sqlite3.connect(destination)
+    page_size = source.execute("PRAGMA page_size").fetchone()[0]
+
+    def progress(status, remaining, total):
+        if on_progress:
+            copied = (total - remaining) * page_size
+            on_progress(copied, total * page_size, time.perf_counter() - start)
+
+    try:
+        with target:
+            source.backup(target, pages=pages, progress=progress, sleep=STEP_DELAY)
+        return target.execute("PRAGMA page_count").fetchone()[0] * page_size
+    finally:
+        target.close()
+        source.close()
+
+
+def _backup_files(store, destination: str, chunk_size: int, on_progress=None):
+    """
+    Copy the files of a txt / csv / json store, under its shared lock
+    - The shards of a sharded store are copied into a temporary directory,
+      which replaces <destination>.d/ once every shard was copied
+    :return: Number of bytes copied
+    """
+    if store._suffixes(destination) != store._suffixes(store.DB_NAME):
+        # The extension picks the compression and the name of the shards
+        raise ValueError(
+            f"The backup of {store.DB_NAME} needs the same extension, "
+            f"not {destination}"
+        )
+
+    shard_dir = None
+    if store.SHARD_SIZE:
+        shard_dir = tempfile.mkdtemp(
+            prefix=f"{os.path.basename(destination)}.d.",
+            dir=os.path.dirname(destination) or ".",
+        )
+
+    start = time.perf_counter()
+    copied = 0
+    try:
+        with store.lock(shared=True):
+            paths = [path for path in store._paths() if os.path.exists(path)]
+            total = sum(os.path.getsize(path) for path in paths)
+
+            for path in paths:
+                if shard_dir:
+                    target = os.path.join(shard_dir, os.path.basename(path))
+                else:
+                    target = destination
+                for size in _copy_file(path, target, chunk_size):
+                    copied += size
+                    if on_progress:
+                        on_progress(copied, total, time.perf_counter() - start)
+    except BaseException:
+        if shard_dir:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+        raise
+
+    if shard_dir:
+        _replace_dir(shard_dir, f"{destination}.d")
+    return copied
+
+
+def _replace_dir(source: str, target: str):
+    """
+    Move a directory to target, removing the directory already there
+    - The old directory is first moved aside, target is only missing between
+      the 2 renames
+    """
+    old = None
+    if os.path.exists(target):
+        old = tempfile.mkdtemp(
+            prefix=f"{os.path.basename(target)}.old.",
+            dir=os.path.dirname(target) or ".",
+        )
+        os.rename(target, os.path.join(old, "d"))
+    os.rename(source, target)
+    if old:
+        shutil.rmtree(old)
+
+
+def _copy_file(source: str, target: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Copy a file in the kernel, w/ os.copy_file_range() (Linux), os.sendfile()
+    (when copy_file_range isn't supported, ex. across file systems on older
+    kernels) or, as a last resort, read() / write()
+    :return: Generator of the number of bytes copied by each step
+    """
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        in_fd, out_fd = src.fileno(), dst.fileno()
+        remaining = os.fstat(in_fd).st_size
+        offset = 0
+
+        for copy in (_copy_file_range, _sendfile):
+            try:
+                while remaining > 0:
+                    size = copy(in_fd, out_fd, offset, min(chunk_size, remaining))
+                    if not size:  # The file shrank, can't happen under the lock
+                        return
+                    offset += size
+                    remaining -= size
+                    yield size
+                return
+            except (AttributeError, OSError):
+                # Not available here, or not between these files: try the next
+                # method, from where the failed one stopped
+                os.lseek(out_fd, offset, os.SEEK_SET)
+
+        src.seek(offset)
+        while remaining > 0:
+            data = src.read(min(chunk_size, remaining))
+            if not data:
+                return
+            dst.write(data)
+            remaining -= len(data)
+            yield len(data)
+
+
+def _copy_file_range(in_fd: int, out_fd: int, offset: int, size: int) -> int:
+    return os.copy_file_range(in_fd, out_fd, size, offset, offset)
+
+
+def _sendfile(in_fd: int, out_fd: int, offset: int, size: int) -> int:
+    # sendfile() writes at the position of out_fd
+    return os.sendfile(out_fd, in_fd, offset, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up a store while it's in use")
+    parser.add_argument("--backend", choices=backends.BACKENDS, required=True)
+    parser.add_argument("--db", help="DB file to back up, defaults to the backend's")
+    parser.add_argument("--to", dest="destination", required=True)
+    parser.add_argument(
+        "--pages", type=int, default=PAGES, help="SQLite pages copied per step"
+    )
+    args = parser.parse_args()
+
+    store = backends.load_backend(args.backend, args.db)
+    if not os.path.exists(store.DB_NAME):
+        sys.exit(f"No DB to back up at {store.DB_NAME}")
+
+    def report(copied, total, elapsed):
+        rate = copied / elapsed / 1024**2 if elapsed else 0
+        percent = copied / total * 100 if total else 100
+        print(
+            f"\r{copied / 1024**2:,.1f} / {total / 1024**2:,.1f} MB ({percent:.0f}%, "
+            f"{rate:,.1f} MB/sec)",
+            end="",
+        )
+
+    start = time.perf_counter()
+    try:
+        copied = backup(store, args.destination, args.pages, on_progress=report)
+    except ValueError as e:
+        sys.exit(str(e))
+    elapsed = time.perf_counter() - start
+
+    rate = copied / elapsed / 1024**2 if elapsed else 0
+    print(
+        f"\rBacked up {copied / 1024**2:,.1f} MB of {store.DB_NAME} to "
+        f"{args.destination} in {elapsed:.2f}s ({rate:,.1f} MB/sec)"
+    )
+
+
+if __name__ == "__main__":
+    main()
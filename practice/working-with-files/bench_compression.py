@@ -0,0 +1,133 @@
+"""
+Compare the compressed storage options of the csv and json backends
+
+For each codec a store of --rows generated todos is written w/ insert_todos()
+and read back w/ get_todos(), reporting:
+- the file size and compression ratio (vs. the uncompressed file)
+- write and read throughput, in rows/sec and uncompressed MB/sec
+
+Then --appends todos are added one at a time w/ add_todo(), reporting:
+- add_todo() calls per second
+- bytes the file grew by per todo added: the csv backend appends each todo
+  to a compressed file as a new compressed member (gzip) or stream (bz2,
+  lzma), w/ its own header and no shared dictionary, the json backend
+  rewrites the whole file
+- read throughput once they were added, decompressing every member
+
+Usage:
+python bench_compression.py --backend json --rows 200000
+python bench_compression.py --backend csv --rows 100000 --appends 1000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import backends
+
+# Extensions understood by the controllers, "" being the uncompressed file
+CODECS = {"none": "", "gzip": ".gz", "bz2": ".bz2", "lzma": ".xz"}
+
+
+def bench_codec(
+    backend: str, extension: str, todos: list, directory: str, appends: int
+):
+    """
+    Write then read todos w/ a single codec, then add todos one at a time
+    :return: Dictionary of the file sizes and write / read / append times (in
+        seconds)
+    """
+    db_name = os.path.join(directory, f"bench.{backend}{extension}")
+    store = backends.load_backend(backend, db_name)
+    store.create_db_if_not_exists()
+
+    start = time.perf_counter()
+    store.insert_todos(todos)
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    read = store.get_todos()
+    read_time = time.perf_counter() - start
+    assert len(read) == len(todos)
+
+    size = os.path.getsize(db_name)
+    start = time.perf_counter()
+    for number in range(appends):
+        store.add_todo(f"appended todo message number {number}")
+    append_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    read = store.get_todos()
+    reread_time = time.perf_counter() - start
+    assert len(read) == len(todos) + appends
+
+    return {
+        "size": size,
+        "write_time": write_time,
+        "read_time": read_time,
+        "appended_size": os.path.getsize(db_name),
+        "append_time": append_time,
+        "reread_time": reread_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compressed storage")
+    parser.add_argument("--backend", choices=["csv", "json"], default="json")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument(
+        "--appends", type=int, default=20, help="Todos then added one at a time"
+    )
+    args = parser.parse_args()
+
+    todos = [
+        {"id": id, "msg": f"todo message number {id}", "complete": id % 3 == 0}
+        for id in range(args.rows)
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {
+            codec: bench_codec(args.backend, extension, todos, directory, args.appends)
+            for codec, extension in CODECS.items()
+        }
+
+    raw_size = results["none"]["size"]
+    raw_mb = raw_size / 1024 / 1024
+    print(
+        f"{args.rows:,} todos, {args.backend} backend, {raw_mb:.1f} MB uncompressed\n"
+    )
+    print(
+        f"{'codec':<6} {'size (MB)':>10} {'ratio':>7} "
+        f"{'write rows/s':>13} {'write MB/s':>11} {'read rows/s':>12} {'read MB/s':>10}"
+    )
+    for codec, result in results.items():
+        print(
+            f"{codec:<6} {result['size'] / 1024 / 1024:>10.2f} "
+            f"{raw_size / result['size']:>6.1f}x "
+            f"{args.rows / result['write_time']:>13,.0f} "
+            f"{raw_mb / result['write_time']:>11.1f} "
+            f"{args.rows / result['read_time']:>12,.0f} "
+            f"{raw_mb / result['read_time']:>10.1f}"
+        )
+
+    if not args.appends:
+        return
+    print(f"\nThen {args.appends:,} todos added one at a time\n")
+    print(
+        f"{'codec':<6} {'appends/s':>10} {'bytes/append':>13} "
+        f"{'size (MB)':>10} {'read rows/s':>12}"
+    )
+    rows = args.rows + args.appends
+    for codec, result in results.items():
+        growth = result["appended_size"] - result["size"]
+        print(
+            f"{codec:<6} {args.appends / result['append_time']:>10,.0f} "
+            f"{growth / args.appends:>13,.0f} "
+            f"{result['appended_size'] / 1024 / 1024:>10.2f} "
+            f"{rows / result['reread_time']:>12,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compare the memory used by each operation of the backends
+
+For each backend a store of --rows generated todos is written, then each
+operation runs once under memory.MemoryTracker, reporting its peak memory and
+the peak per row of the store (what the store costs in memory as it grows).
+- get_todos() loads every todo, while iter_todos() keeps one at a time
+  (one file at a time for the sharded stores)
+- Budgets (ex. --budget get_todos=200MB) make the benchmark exit w/ status 1
+  when an operation goes over, to catch memory regressions
+
+Usage:
+python bench_memory.py --rows 20000
+python bench_memory.py --backend json --rows 200000 --budget get_todos=100MB
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import warnings
+
+import backends
+import memory
+
+
+def bench_backend(backend: str, todos: list, directory: str, budgets: dict = None):
+    """
+    Run each operation once on a store holding todos
+    :return: (peaks of the operations, see MemoryTracker.peaks(), list of the
+        budget violations)
+    """
+    db_name = os.path.join(directory, f"bench-{backend}.db")
+    store = backends.load_backend(backend, db_name)
+    store.create_db_if_not_exists()
+    store.insert_todos(todos)
+
+    tracker = memory.MemoryTracker(store, budgets)
+    middle = todos[len(todos) // 2]["id"]
+    with warnings.catch_warnings(record=True) as violations:
+        warnings.simplefilter("always", memory.MemoryBudgetWarning)
+        tracker.get_todos()
+        for _ in tracker.iter_todos():
+            pass
+        tracker.get_todo_by_id(middle)
+        tracker.add_todo("one more todo")
+        tracker.update_todo(middle, "updated todo", True)
+        tracker.toggle_complete(middle)
+        tracker.delete_todo(middle)
+        tracker.execute_batch([("add_todo", (f"batch {i}",)) for i in range(100)])
+    tracker.close()
+    return tracker.peaks(), [str(violation.message) for violation in violations]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory per operation")
+    parser.add_argument("--backend", choices=backends.BACKENDS)
+    # tracemalloc slows the operations down a few times, keep the default store small
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument(
+        "--budget",
+        action="append",
+        metavar="OP=SIZE",
+        help="Memory budget of an operation (ex. get_todos=50MB), repeatable",
+    )
+    args = parser.parse_args()
+    try:
+        budgets = memory.parse_budgets(args.budget)
+    except ValueError as e:
+        parser.error(str(e))
+
+    todos = [
+        {"id": id, "msg": f"todo message number {id}", "complete": id % 3 == 0}
+        for id in range(args.rows)
+    ]
+
+    violations = []
+    for backend in [args.backend] if args.backend else backends.BACKENDS:
+        with tempfile.TemporaryDirectory() as directory:
+            peaks, backend_violations = bench_backend(
+                backend, todos, directory, budgets
+            )
+        print(f"{backend} backend, {args.rows:,} todos")
+        # Per row figures are relative to the size of the store
+        for stats in peaks.values():
+            stats.setdefault("bytes_per_row", stats["peak_bytes"] / args.rows)
+        print(memory.format_peaks(peaks, budgets) + "\n")
+        violations += [f"{backend}: {message}" for message in backend_violations]
+
+    if violations:
+        sys.exit("Over budget:\n" + "\n".join(violations))
+
+
+if __name__ == "__main__":
+    main()
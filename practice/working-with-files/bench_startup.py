@@ -0,0 +1,112 @@
+"""
+Measure the cold start time of the CLI commands, per backend
+
+Each command is run --runs times in a fresh interpreter (against an empty DB
+in a temporary directory) and the median wall time is reported, next to:
+- the time of an interpreter doing nothing, the floor no command can beat
+- the number of modules imported and the total time spent importing them
+  (from -X importtime), which is much less noisy than the wall time
+- which of the storage modules (sqlite3, json, csv, gzip) got imported
+
+Usage:
+python bench_startup.py --runs 20
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import backends
+
+CLI_PATH = os.path.join(backends.BASE_DIR, "cli.py")
+
+# Mapping of command name -> (extra CLI arguments, stdin)
+COMMANDS = {
+    "list": (["--list"], ""),
+    "batch": (["--batch", "-"], "a cold start\nc 0\n"),
+}
+
+# Modules only some backends need, reported when a command imports them
+# (bz2 and lzma aren't listed, argparse imports them through shutil anyway)
+STORAGE_MODULES = ["sqlite3", "json", "csv", "gzip"]
+
+
+def time_command(args: list, stdin: str, runs: int, directory: str):
+    """
+    Run a command runs times
+    :return: Median wall time, in seconds
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            input=stdin,
+            cwd=directory,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def imported_modules(args: list, stdin: str, directory: str):
+    """
+    Run a command once w/ -X importtime
+    :return: Dictionary of the names of the modules it imported -> seconds spent
+        importing each (w/o the modules it imported itself)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        input=stdin,
+        cwd=directory,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and not line.endswith("imported package"):
+            self_us, _, name = line[len("import time:") :].split("|")
+            modules[name.strip()] = int(self_us) / 1_000_000
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CLI cold start")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--backend", choices=backends.BACKENDS, action="append")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        floor = time_command(["-c", "pass"], "", args.runs, directory)
+        floor_modules = imported_modules(["-c", "pass"], "", directory)
+        print(
+            f"Interpreter w/o any command: {floor * 1000:.1f} ms, "
+            f"{len(floor_modules)} modules\n"
+        )
+        print(
+            f"{'backend':<8} {'command':<8} {'ms':>7} {'over floor':>11} "
+            f"{'modules':>8} {'import ms':>10}  storage modules imported"
+        )
+
+        for backend in args.backend or backends.BACKENDS:
+            for command, (extra_args, stdin) in COMMANDS.items():
+                cli_args = [CLI_PATH, "--backend", backend, *extra_args]
+                median = time_command(cli_args, stdin, args.runs, directory)
+                modules = imported_modules(cli_args, stdin, directory)
+                storage = [name for name in STORAGE_MODULES if name in modules]
+                print(
+                    f"{backend:<8} {command:<8} {median * 1000:>7.1f} "
+                    f"{(median - floor) * 1000:>+10.1f} {len(modules):>8} "
+                    f"{sum(modules.values()) * 1000:>10.1f}  {', '.join(storage) or '-'}"
+                )
+
+
+if __name__ == "__main__":
+    main()
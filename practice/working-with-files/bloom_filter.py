@@ -0,0 +1,248 @@
+"""
+Counting Bloom filter of the ids of a file backed store (txt / csv / json)
+
+The filter is kept next to the DB in <DB_NAME>.bloom, so looking up, updating
+or deleting an id which isn't in the DB doesn't read the file which would hold
+it. The controllers decide when it's used (their BLOOM_FILTER setting) and read
+their own files, this module only knows the filter's file.
+
+Shape of File:
+32 bytes header (magic, number of counters, number of hashes, number of ids),
+the counters, then a "name inode size mtime" line per DB file
+"""
+
+import os
+
+
+class BloomFilter:
+    """
+    Counting Bloom filter of the ids in a DB, persisted in its own file
+    - Each id increments `hashes` one byte counters, deleting it decrements
+      them (a counter stuck at 255 is never decremented, it may be shared w/
+      ids still in the DB)
+    - Only a 0 counter is certain: an id w/ one is not in the DB, the file must
+      still be read for the others (~1% of the missing ids)
+    - The stamp (inode, size, mtime) of each DB file is saved w/ the counters,
+      a file whose stamp doesn't match anymore was written w/o updating the filter
+    - The counters are updated in place through mmap, w/o rewriting the file
+    """
+
+    MAGIC = b"TODOBLM1"
+    HEADER_SIZE = 32
+
+    def __init__(self, file, size: int, hashes: int, count: int, stamps):
+        # Only imported when needed, the filter is read by the lookups only
+        import mmap
+
+        self.file = file
+        self.size = size  # Number of counters
+        self.hashes = hashes
+        self.count = count  # Number of ids counted
+        self.stamps = stamps  # Mapping of file name -> stamp
+        self.counters = mmap.mmap(file.fileno(), self.HEADER_SIZE + size)
+
+    @classmethod
+    def open(cls, path: str):
+        """
+        Open a saved filter
+        :param path: Path of the filter (ex. db.txt.bloom)
+        :return: BloomFilter, None if there is none (or it isn't readable)
+        """
+        try:
+            file = open(path, "r+b")
+        except FileNotFoundError:
+            return None
+
+        header = file.read(cls.HEADER_SIZE)
+        size, hashes, count = (
+            int.from_bytes(header[i : i + 8], "little") for i in (8, 16, 24)
+        )
+        if (
+            header[:8] != cls.MAGIC
+            or os.fstat(file.fileno()).st_size < cls.HEADER_SIZE + size
+        ):
+            file.close()
+            return None
+
+        file.seek(cls.HEADER_SIZE + size)
+        stamps = {}
+        for line in file.read().decode().splitlines():
+            name, *stamp = line.rsplit(" ", 3)
+            stamps[name] = [int(n) for n in stamp]
+        return cls(file, size, hashes, count, stamps)
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        files,
+        counters_per_id: int,
+        hashes: int,
+        min_ids: int,
+    ):
+        """
+        Build a filter from every id in the DB and save it
+        - Sized for twice the number of ids, it's rebuilt once they outgrow it
+        :param path: Path of the filter
+        :param files: Mapping of DB file path -> (stamp, iterable of its ids)
+        :param counters_per_id: Counters per id the filter is sized for
+        :param hashes: Counters incremented per id
+        :param min_ids: Number of ids the smallest filter is sized for
+        :return: Open BloomFilter
+        """
+        stamps = {}
+        ids = []
+        for file_path, (stamp, file_ids) in files.items():
+            stamps[os.path.basename(file_path)] = stamp
+            ids += file_ids
+
+        size = max(2 * len(ids), min_ids) * counters_per_id
+        counters = bytearray(size)
+        for id in ids:
+            for slot in slots(id, size, hashes):
+                if counters[slot] < 255:
+                    counters[slot] += 1
+
+        # Only imported when needed, the filter is rarely rebuilt
+        import tempfile
+
+        # Written aside (a file per thread rebuilding it) and renamed, a lookup
+        # never reads a half written filter
+        fd, temp_path = tempfile.mkstemp(
+            prefix=f"{os.path.basename(path)}.",
+            suffix=".tmp",
+            dir=os.path.dirname(path) or ".",
+        )
+        with os.fdopen(fd, "wb") as file:
+            file.write(cls.MAGIC)
+            for n in (size, hashes, len(ids)):
+                file.write(n.to_bytes(8, "little"))
+            file.write(counters)
+            file.write(_format_stamps(stamps))
+        os.replace(temp_path, path)
+        return cls.open(path)
+
+    def __contains__(self, id: int):
+        offset = self.HEADER_SIZE
+        return all(
+            self.counters[offset + slot] for slot in slots(id, self.size, self.hashes)
+        )
+
+    def is_current(self, stamps):
+        """
+        :param stamps: Mapping of path -> stamp of DB files
+        :return: Whether the filter was saved along w/ those versions of the files
+        """
+        return all(
+            self.stamps.get(os.path.basename(path)) == stamp
+            for path, stamp in stamps.items()
+        )
+
+    def add(self, id: int):
+        for slot in slots(id, self.size, self.hashes):
+            if self.counters[self.HEADER_SIZE + slot] < 255:
+                self.counters[self.HEADER_SIZE + slot] += 1
+        self.count += 1
+
+    def remove(self, id: int):
+        for slot in slots(id, self.size, self.hashes):
+            if 0 < self.counters[self.HEADER_SIZE + slot] < 255:
+                self.counters[self.HEADER_SIZE + slot] -= 1
+        self.count -= 1
+
+    def save(self, stamps):
+        """
+        Save the number of ids and the new stamps of the files written, then close
+        :param stamps: Mapping of path -> stamp of the DB files written since the
+            filter was opened
+        """
+        for path, stamp in stamps.items():
+            self.stamps[os.path.basename(path)] = stamp
+        self.counters[24:32] = self.count.to_bytes(8, "little")
+        self.counters.close()
+        self.file.seek(self.HEADER_SIZE + self.size)
+        self.file.write(_format_stamps(self.stamps))
+        self.file.truncate()
+        self.file.close()
+
+    def close(self):
+        self.counters.close()
+        self.file.close()
+
+
+def might_exist(path: str, id: int, stamps, build) -> bool:
+    """
+    Check a filter for an id, before reading the file which would hold it
+    - The filter is (re)built when there is none, or when the file holding the
+      id was changed w/o updating the filter
+    - The caller keeps writers out (ex. w/ a shared lock) while it checks
+    :param path: Path of the filter
+    :param id: ID of the todo
+    :param stamps: Mapping of path -> stamp of the file which would hold the id
+    :param build: Function building the filter from the DB, returning it open
+    :return: False if there is certainly no todo w/ that id, True if there may be
+    """
+    bloom = BloomFilter.open(path)
+    if bloom is None or not bloom.is_current(stamps):
+        if bloom is not None:
+            bloom.close()
+        bloom = build()
+    try:
+        return id in bloom
+    finally:
+        bloom.close()
+
+
+def update(path: str, stamps, new_stamps, added, removed, counters_per_id, build):
+    """
+    Count the ids added to / removed from the DB by a write in a filter
+    - A filter which wasn't current before the write is deleted, to be rebuilt
+      by the next lookup
+    :param path: Path of the filter
+    :param stamps: Mapping of path -> stamp of the files written, from before
+        they were written
+    :param new_stamps: Mapping of path -> stamp of the same files, once written
+    :param added: Ids added to the DB
+    :param removed: Ids removed from the DB, once per todo removed
+    :param counters_per_id: Counters per id the filter is sized for
+    :param build: Function building the filter from the DB, returning it open
+    """
+    bloom = BloomFilter.open(path)
+    if bloom is None:
+        return  # Built by the next lookup
+
+    if not bloom.is_current(stamps):
+        bloom.close()
+        os.remove(path)
+        return
+
+    for id in added:
+        bloom.add(id)
+    for id in removed:
+        bloom.remove(id)
+    if bloom.count > bloom.size // counters_per_id:
+        # Too many ids for the number of counters, false positives pile up
+        bloom.close()
+        build().close()
+    else:
+        bloom.save(new_stamps)
+
+
+def slots(id: int, size: int, hashes: int):
+    """
+    Return the counters of an id in a Bloom filter of size counters
+    - The id is mixed w/ splitmix64 and split in 2 hashes, combined into as many
+      as needed (double hashing)
+    """
+    x = (id + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    x ^= x >> 31
+    h1, h2 = x & 0xFFFFFFFF, (x >> 32) | 1
+    return [(h1 + i * h2) % size for i in range(hashes)]
+
+
+def _format_stamps(stamps):
+    return "".join(
+        f"{name} {' '.join(map(str, stamp))}\n" for name, stamp in stamps.items()
+    ).encode()
@@ -0,0 +1,153 @@
+"""
+Bundle the CLI and a single backend into an executable zipapp
+
+Starting the CLI from the source tree means searching sys.path for each of
+its modules and checking (or writing) their bytecode cache. The bundle holds:
+- cli, backends, metrics, profiling, memory, changelog, replication, tiering,
+  promotion, migrate and the backend's db_controller (w/ bloom_filter and
+  file_store for the file backends), as precompiled .pyc only (the bundle
+  only runs on the Python version it was built w/)
+- a __main__ which trims sys.path to the archive and the standard library
+- a shebang running python w/ -I -S (isolated mode, no site-packages)
+Files are stored uncompressed, so importing them is a plain read.
+
+Usage:
+python build_zipapp.py --backend txt
+./dist/todo-txt.pyz --list
+python build_zipapp.py --backend sqlite --bench --runs 20
+"""
+
+import argparse
+import io
+import os
+import py_compile
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+import backends
+
+DIST_DIR = os.path.join(backends.BASE_DIR, "dist")
+INTERPRETER = f"{sys.executable} -IS"
+
+MAIN_SOURCE = """import sys
+
+# Only look for modules in the archive and the standard library
+sys.path[:] = [sys.path[0]] + [path for path in sys.path[1:] if "-packages" not in path]
+
+import cli
+
+cli.main(backend={backend!r})
+"""
+
+
+def build(backend: str, output: str = None, interpreter: str = INTERPRETER):
+    """
+    Build the zipapp of a backend
+    :param backend: Name of the backend to bundle (one of backends.BACKENDS)
+    :param output: Path of the archive, defaults to dist/todo-<backend>.pyz
+    :param interpreter: Interpreter (and options) of the shebang line
+    :return: Path of the archive
+    """
+    output = output or os.path.join(DIST_DIR, f"todo-{backend}.pyz")
+    controller = os.path.join(backends.BACKENDS[backend], "database", "db_controller")
+    sources = {
+        "cli": os.path.join(backends.BASE_DIR, "cli.py"),
+        "backends": os.path.join(backends.BASE_DIR, "backends.py"),
+        "metrics": os.path.join(backends.BASE_DIR, "metrics.py"),
+        "profiling": os.path.join(backends.BASE_DIR, "profiling.py"),
+        "memory": os.path.join(backends.BASE_DIR, "memory.py"),
+        "changelog": os.path.join(backends.BASE_DIR, "changelog.py"),
+        "replication": os.path.join(backends.BASE_DIR, "replication.py"),
+        "tiering": os.path.join(backends.BASE_DIR, "tiering.py"),
+        "promotion": os.path.join(backends.BASE_DIR, "promotion.py"),
+        "migrate": os.path.join(backends.BASE_DIR, "migrate.py"),
+        controller: os.path.join(backends.BASE_DIR, f"{controller}.py"),
+    }
+    if backend != "sqlite":
+        # Shared by the file backends' controllers
+        for name in ("bloom_filter", "file_store"):
+            sources[name] = os.path.join(backends.BASE_DIR, f"{name}.py")
+
+    with tempfile.TemporaryDirectory() as directory:
+        main_path = os.path.join(directory, "__main__.py")
+        with open(main_path, "w") as file:
+            file.write(MAIN_SOURCE.format(backend=backend))
+        sources["__main__"] = main_path
+
+        # zipimport only looks for "<module>.pyc" next to where the .py would be
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+            for name, source in sources.items():
+                compiled = os.path.join(directory, "compiled.pyc")
+                py_compile.compile(source, compiled, dfile=f"{name}.py", doraise=True)
+                archive.write(compiled, f"{name.replace(os.sep, '/')}.pyc")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "wb") as file:
+        file.write(f"#!{interpreter}\n".encode())
+        file.write(buffer.getvalue())
+    os.chmod(output, 0o755)
+    return output
+
+
+def bench(backend: str, archive: str, runs: int):
+    """
+    Compare the cold start of `--list` from the source tree and from the zipapp
+    - The variants take turns (after a warm-up run each), so a slowdown of the
+      machine during the benchmark doesn't favour one of them
+    :return: Mapping of variant -> median wall time, in seconds
+    """
+    main_path = os.path.join(backends.BASE_DIR, backends.BACKENDS[backend], "main.py")
+    variants = {
+        "source tree": [sys.executable, main_path, "--list"],
+        "zipapp": [sys.executable, archive, "--list"],
+        "zipapp -I -S": [archive, "--list"],
+    }
+    env = dict(os.environ)
+    # Let the source tree keep its bytecode cache, as it would outside of a sandbox
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    times = {variant: [] for variant in variants}
+    with tempfile.TemporaryDirectory() as directory:
+        for run in range(runs + 1):
+            for variant, command in variants.items():
+                start = time.perf_counter()
+                subprocess.run(
+                    command, cwd=directory, env=env, capture_output=True, check=True
+                )
+                if run:
+                    times[variant].append(time.perf_counter() - start)
+    return {variant: statistics.median(values) for variant, values in times.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a zipapp of the CLI")
+    parser.add_argument("--backend", choices=backends.BACKENDS, default="sqlite")
+    parser.add_argument("--output", help="Defaults to dist/todo-<backend>.pyz")
+    parser.add_argument("--interpreter", default=INTERPRETER)
+    parser.add_argument(
+        "--bench", action="store_true", help="Compare the cold start to the sources"
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    archive = build(args.backend, args.output, args.interpreter)
+    print(f"Built {archive} ({os.path.getsize(archive) / 1024:.1f} KB)")
+
+    if args.bench:
+        results = bench(args.backend, archive, args.runs)
+        baseline = results["source tree"]
+        print(f"\nCold start of '--list' (median of {args.runs} runs):")
+        for variant, seconds in results.items():
+            print(
+                f"{variant:<14} {seconds * 1000:>7.1f} ms "
+                f"({seconds / baseline - 1:+.0%})"
+            )
+
+
+if __name__ == "__main__":
+    main()
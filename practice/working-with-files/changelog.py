@@ -0,0 +1,472 @@
+"""
+Change data capture for the Todo stores
+
+LoggedStore wraps a store (any backend) and appends each change it makes to a
+change log, one compact JSON line per change:
+{"seq":12,"ts":1767225600.123,"op":"update","id":3,"fields":{"complete":true}}
+- op is "add" (fields: msg, complete), "update" (the fields changed) or
+  "delete" (no fields), toggle_complete() is logged as an update
+- seq numbers the changes from 1, they keep increasing across runs
+- ts is the time the change was logged, for replicas to measure their lag
+- A change is logged once the store applied it
+
+apply_changes() replays the changes made after a given seq into another store
+(ex. a reporting copy in another backend), so keeping a copy in sync costs in
+proportion to what changed, not to the size of the store. The changes after
+a seq are found by bisecting the log, w/o reading it from the start.
+- All the writes must go through the LoggedStore: it allocates the ids of
+  new todos itself (see _allocate_id()), and a single process owns the log
+  (ChangeLog locks it)
+
+Usage:
+python cli.py --backend json --change-log todos.changes
+python changelog.py --log todos.changes --to sqlite --to-db report.db
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import backends
+
+BATCH_SIZE = 10_000  # Changes applied per insert_todos() / execute_batch() call
+
+
+class ChangeLog:
+    """
+    Append-only file of changes, w/ their sequence numbers
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: File of the log, created if needed
+        :raises RuntimeError: If another process has the log open
+        """
+        self.path = path
+        self._file = open(path, "ab")
+        try:
+            _lock(self._file)
+            self.seq = _recover(path)  # seq of the last change logged
+        except BaseException:
+            self._file.close()
+            raise
+
+    def append(self, changes):
+        """
+        Log changes, numbering them after the last one
+        :param changes: List of (op, id, fields) tuples
+        :return: seq of the last change
+        """
+        lines = []
+        now = round(time.time(), 3)
+        for op, id, fields in changes:
+            self.seq += 1
+            change = {"seq": self.seq, "ts": now, "op": op, "id": id}
+            if fields:
+                change["fields"] = fields
+            lines.append(json.dumps(change, separators=(",", ":")) + "\n")
+        if lines:
+            self._file.write("".join(lines).encode())
+            self._file.flush()
+        return self.seq
+
+    def close(self):
+        self._file.close()
+
+
+class LoggedStore:
+    """
+    Exposes the functions of a store, logging the changes they make
+    """
+
+    def __init__(self, store, log: ChangeLog):
+        """
+        :param store: db_controller module or store to wrap
+        :param log: ChangeLog the changes are appended to
+        """
+        self.store = store
+        self.log = log
+        self._next_id = None  # Cached once computed, see _allocate_id()
+
+    def __getattr__(self, name):
+        # Reads (and anything else) go straight to the store
+        return getattr(self.store, name)
+
+    def add_todo(self, msg: str):
+        """
+        Add a new todo, w/ an id allocated here so that the change holds it
+        """
+        todo = {"id": self._allocate_id(), "msg": msg, "complete": False}
+        self.log.append(self._insert([todo]))
+        return True
+
+    def insert_todos(self, todos):
+        todos = list(todos)
+        self._next_id = None
+        self.log.append(self._insert(todos))
+        return len(todos)
+
+    def update_todo(self, id: int, new_msg: str = None, new_complete: bool = None):
+        updated = self.store.update_todo(id, new_msg, new_complete)
+        self.log.append(_changes("update_todo", (id, new_msg, new_complete), updated))
+        return updated
+
+    def toggle_complete(self, id: int):
+        new_complete = self.store.toggle_complete(id)
+        self.log.append(_changes("toggle_complete", (id,), new_complete))
+        return new_complete
+
+    def delete_todo(self, id: int):
+        deleted = self.store.delete_todo(id)
+        self.log.append(_changes("delete_todo", (id,), deleted))
+        return deleted
+
+    def execute_batch(self, ops):
+        """
+        Run the operations in batches, logging each change
+        - Adds are run as insert_todos() (to know the ids), the operations
+          between two adds as a single execute_batch() of the store
+        """
+        results = []
+        changes = []
+        try:
+            for adding, group in _group_ops(ops, lambda op: op[0] == "add_todo"):
+                if adding:
+                    todos = [
+                        {"id": self._allocate_id(), "msg": args[0], "complete": False}
+                        for _, args in group
+                    ]
+                    changes += self._insert(todos)
+                    results += [True] * len(todos)
+                    continue
+
+                for name, _ in group:
+                    if name not in ("update_todo", "toggle_complete", "delete_todo"):
+                        raise ValueError(f"Unsupported batch operation '{name}'")
+                group_results = self.store.execute_batch(group)
+                for (name, args), result in zip(group, group_results):
+                    changes += _changes(name, args, result)
+                results += group_results
+        finally:
+            # The groups run before a failing one were applied, log them too
+            self.log.append(changes)
+        return results
+
+    def _insert(self, todos):
+        """
+        Insert todos into the store
+        :return: List of the changes to log
+        :raises RuntimeError: If the store inserted fewer todos than given, as
+            which ones it didn't insert isn't known none of them is logged
+        """
+        count = self.store.insert_todos(todos)
+        if count != len(todos):
+            self._next_id = None  # Recomputed from the todos actually stored
+            raise RuntimeError(
+                f"The store inserted {count} of {len(todos)} todos, "
+                "they weren't logged"
+            )
+        return [_added(todo) for todo in todos]
+
+    def _allocate_id(self):
+        """
+        Return the next unused id of the store
+        """
+        if self._next_id is None:
+            ids = [todo["id"] for todo in self.store.iter_todos()]
+            self._next_id = max(ids) + 1 if ids else 0
+        id = self._next_id
+        self._next_id += 1
+        return id
+
+
+def read_changes(path: str, since: int = 0):
+    """
+    Lazily yield the changes logged after a sequence number
+    - A last line w/o its newline (being written, or cut by a crash) is skipped
+    :param path: File of the change log
+    :param since: seq of the last change already applied, 0 for all changes
+    :return: Generator of change dictionaries ("seq", "ts", "op", "id", "fields")
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as file:
+        file.seek(offset_after(file, since) if since else 0)
+        for line in file:
+            if not line.endswith(b"\n"):
+                return
+            yield json.loads(line)
+
+
+def apply_changes(target, changes, batch_size: int = BATCH_SIZE, on_progress=None):
+    """
+    Apply changes (see read_changes()) to a store, in batches
+    - Consecutive adds are inserted together w/ insert_todos(), the other
+      changes are run together w/ execute_batch()
+    - Stops at the first change the store didn't apply, so the seq never
+      moves past a change missing from the store
+    :param target: db_controller module (or store) to apply the changes to
+    :param changes: Iterable of change dictionaries, in seq order
+    :param batch_size: Maximum number of changes applied per call
+    :param on_progress: Optional callback invoked after each batch w/
+        (seq of the last change applied, changes applied so far), including
+        the changes applied before a failed one
+    :return: (seq of the last change applied, number of changes applied),
+        the seq is None when there were no changes
+    :raises RuntimeError: If a change couldn't be applied
+    """
+    last_seq = None
+    applied = 0
+    batch = []
+
+    def flush():
+        nonlocal last_seq, applied
+        if batch[0]["op"] == "add":
+            count = target.insert_todos(
+                {"id": change["id"], **change["fields"]} for change in batch
+            )
+            # Which todos are missing isn't known, none of them count as applied
+            done = len(batch) if count == len(batch) else 0
+        else:
+            results = target.execute_batch([_operation(change) for change in batch])
+            done = next(
+                (index for index, result in enumerate(results) if not result),
+                len(batch),
+            )
+        if done:
+            last_seq = batch[done - 1]["seq"]
+            applied += done
+            if on_progress:
+                on_progress(last_seq, applied)
+        if done < len(batch):
+            raise RuntimeError(
+                f"Change {batch[done]['seq']} ({batch[done]['op']} of todo "
+                f"{batch[done]['id']}) couldn't be applied to {target.DB_NAME}"
+            )
+        batch.clear()
+
+    for change in changes:
+        if batch and (
+            len(batch) >= batch_size
+            or (batch[0]["op"] == "add") != (change["op"] == "add")
+        ):
+            flush()
+        batch.append(change)
+    if batch:
+        flush()
+    return last_seq, applied
+
+
+def load_seq(store) -> int:
+    """
+    Return the seq of the last change applied to a store, 0 if none was
+    - Recorded in <DB_NAME>.seq next to the store's DB
+    """
+    path = f"{store.DB_NAME}.seq"
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r") as file:
+        return int(file.read())
+
+
+def save_seq(store, seq: int):
+    """
+    Record the seq of the last change applied to a store (see load_seq())
+    """
+    path = f"{store.DB_NAME}.seq"
+    # Replaced at once, a reader never sees a half written number
+    with open(f"{path}.tmp", "w") as file:
+        file.write(str(seq))
+    os.replace(f"{path}.tmp", path)
+
+
+def _added(todo: dict) -> tuple:
+    return "add", todo["id"], {"msg": todo["msg"], "complete": todo["complete"]}
+
+
+def _changes(name: str, args: tuple, result) -> list:
+    """
+    Return the changes made by a write function, from its arguments and result
+    :return: List of (op, id, fields) tuples, empty if nothing changed
+    """
+    if name == "update_todo" and result:
+        id, new_msg, new_complete = (tuple(args) + (None, None))[:3]
+        fields = {}
+        if new_msg is not None:
+            fields["msg"] = new_msg
+        if new_complete is not None:
+            fields["complete"] = new_complete
+        return [("update", id, fields)]
+    if name == "toggle_complete" and result is not None:
+        return [("update", args[0], {"complete": result})]
+    if name == "delete_todo" and result:
+        return [("delete", args[0], None)]
+    return []
+
+
+def _operation(change: dict) -> tuple:
+    """
+    Return the execute_batch() operation applying an update or a delete
+    """
+    if change["op"] == "delete":
+        return "delete_todo", (change["id"],)
+    fields = change.get("fields", {})
+    return "update_todo", (change["id"], fields.get("msg"), fields.get("complete"))
+
+
+def _group_ops(ops, key):
+    """
+    Split operations into runs of consecutive operations w/ the same key
+    :return: Generator of (key, list of operations)
+    """
+    group, group_key = [], None
+    for op in ops:
+        op_key = key(op)
+        if group and op_key != group_key:
+            yield group_key, group
+            group = []
+        group.append(op)
+        group_key = op_key
+    if group:
+        yield group_key, group
+
+
+def last_seq(path: str) -> int:
+    """
+    Return the seq of the last change in a log, w/o reading it all (or
+    changing it, unlike ChangeLog which removes a cut last line)
+    :return: seq, 0 if the log holds no change
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as file:
+        line, _ = _last_line(file)
+    return json.loads(line)["seq"] if line else 0
+
+
+def _lock(file):
+    """
+    Lock a change log exclusively, for as long as the file stays open
+    :raises RuntimeError: If another process holds the lock
+    """
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        return
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise RuntimeError(f"{file.name} is already open in another process")
+
+
+def _recover(path: str) -> int:
+    """
+    Return the seq of the last change in the log, 0 for a new log
+    - A last line cut by a crash is removed, for the next change to start on
+      its own line
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as file:
+        line, end = _last_line(file)
+        if end < file.seek(0, os.SEEK_END):
+            file.truncate(end)
+    return json.loads(line)["seq"] if line else 0
+
+
+def _last_line(file):
+    """
+    Read back from the end of a log until the start of its last complete line
+    :param file: Change log opened in binary mode
+    :return: (last complete line w/o its newline or None, offset after it)
+    """
+    size = file.seek(0, os.SEEK_END)
+    block = 4096
+    while True:
+        start = max(size - block, 0)
+        file.seek(start)
+        tail = file.read()
+        end = tail.rfind(b"\n")
+        if end != -1 and (tail.rfind(b"\n", 0, end) != -1 or start == 0):
+            return tail[tail.rfind(b"\n", 0, end) + 1 : end], start + end + 1
+        if start == 0:  # Not a single complete line
+            return None, 0
+        block *= 2
+
+
+def offset_after(file, since: int) -> int:
+    """
+    Bisect the log for the first change w/ a seq above since
+    :param file: Change log opened in binary mode
+    :return: Offset of the line of that change (the end of the file if none)
+    """
+    low, high = 0, file.seek(0, os.SEEK_END)
+    while low < high:
+        middle = (low + high) // 2
+        _seek_line(file, middle)
+        line = file.readline()
+        if not line.endswith(b"\n") or json.loads(line)["seq"] > since:
+            high = middle
+        else:
+            low = middle + 1
+    return _seek_line(file, low)
+
+
+def _seek_line(file, offset: int) -> int:
+    """
+    Seek to the first line starting at or after offset
+    :return: Offset of that line
+    """
+    if offset == 0:
+        return file.seek(0)
+    file.seek(offset - 1)
+    file.readline()
+    return file.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a change log to a store")
+    parser.add_argument("--log", required=True, help="Change log to read")
+    parser.add_argument("--to", dest="target", choices=backends.BACKENDS, required=True)
+    parser.add_argument("--to-db", help="DB file to update, defaults to the backend's")
+    parser.add_argument(
+        "--since",
+        type=int,
+        help="seq of the last change already applied, defaults to the one "
+        "recorded in <to-db>.seq by the previous run",
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    target = backends.load_backend(args.target, args.to_db)
+    target.create_db_if_not_exists()
+    since = load_seq(target) if args.since is None else args.since
+
+    def save(seq, applied):
+        # Recorded after each batch, an interrupted run resumes from there
+        save_seq(target, seq)
+        print(f"\r{applied:,} changes applied (seq {seq:,})", end="")
+
+    start = time.perf_counter()
+    try:
+        last_seq, applied = apply_changes(
+            target, read_changes(args.log, since), args.batch_size, save
+        )
+    except (ValueError, RuntimeError) as e:
+        sys.exit(str(e))
+    elapsed = time.perf_counter() - start
+
+    if last_seq is None:
+        print(f"{target.DB_NAME} is up to date (seq {since:,})")
+        return
+    rate = applied / elapsed if elapsed else 0
+    print(
+        f"\rApplied {applied:,} changes to {target.DB_NAME}, seq {since:,} -> "
+        f"{last_seq:,}, in {elapsed:.2f}s ({rate:,.0f} changes/sec)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,541 @@
+"""
+This file contains functions for requesting user via the CLI
+
+One CLI serves every backend. Only the controller of the selected backend is
+imported (see backends.py), so a command never pays for the imports of the
+storage it doesn't use (ex. sqlite3 when working w/ the txt files).
+
+Usage:
+python cli.py --backend json
+TODO_BACKEND=sqlite python cli.py --list
+"""
+
+import argparse
+import itertools
+import os
+import shutil
+import sys
+import time
+
+import backends
+import metrics
+
+# db_controller module (or store) the prompts work on, set by main()
+# (wrapped in a metrics.MeteredStore)
+db = None
+# profiling.CommandProfiler running each command, set by main() w/ --profile
+profiler = None
+
+PAGE_SIZE = 50  # Todos listed per page by the 'l' option
+ID_WIDTH = 8  # Width of the id column of listed todos
+LIST_BUFFER_SIZE = 1000  # Todos written at once by --list
+PROMOTION_STATE = "promotion.json"  # Written once promotion.py promoted a store
+
+HELP_MSG = """
+Help:
+- 'a' to add a new todo
+- 'l' to list all todos
+- 'e' to edit a todo
+- 'c' to toggle a todo's completion status
+- 'd' to delete a specific todo
+- 's' to show the statistics of each operation
+- 'q' to quit the application
+- 'h' display help
+"""
+
+
+def prompt_add_todo():
+    print("Creating new TODO...")
+    msg = input("Enter your TODO message: ")
+
+    created = False
+    if msg:
+        created = db.add_todo(msg)
+
+    if created:
+        print("New TODO successfully created!")
+    else:
+        print("Unable to create new TODO")
+
+
+def prompt_list_todos():
+    print("Listing TODOS...")
+    todos = db.iter_todos()
+    try:
+        for page in paginate(todos, PAGE_SIZE):
+            write_todos(page)
+            if len(page) < PAGE_SIZE:
+                break
+            if input("Press enter for more, 'q' to stop: ").strip() == "q":
+                break
+    finally:
+        # Release the file / cursor when the listing stops early
+        if hasattr(todos, "close"):
+            todos.close()
+
+
+def paginate(todos, page_size: int):
+    """
+    Lazily split todos into pages, only fetching a page when it is needed
+    :param todos: Iterable of Todo Dictionaries
+    :param page_size: Number of todos per page
+    :return: Generator of lists of at most page_size todos
+    """
+    todos = iter(todos)
+    while page := list(itertools.islice(todos, page_size)):
+        yield page
+
+
+def format_todo(todo: dict, width: int = None) -> str:
+    """
+    Format a todo as a single table row, e.g. "    12  [x]  buy milk"
+    :param todo: Todo Dictionary
+    :param width: Maximum line width, longer messages are truncated
+    :return: Formatted row (w/o newline)
+    """
+    row = (
+        f"{todo['id']:>{ID_WIDTH}}  [{'x' if todo['complete'] else ' '}]  {todo['msg']}"
+    )
+    if width and len(row) > width:
+        row = row[: width - 3] + "..."
+    return row
+
+
+def write_todos(todos, file=None):
+    """
+    Write todos as table rows w/ a single write call
+    :param todos: Iterable of Todo Dictionaries
+    :param file: Text stream to write to, defaults to sys.stdout
+    :return: None
+    """
+    file = file or sys.stdout
+    width = shutil.get_terminal_size().columns
+    file.write("".join(f"{format_todo(todo, width)}\n" for todo in todos))
+    file.flush()
+
+
+def prompt_edit_todo_msg():
+    print("Preparing to edit TODO message...")
+    id = input("Enter TODO ID to Edit: ")
+    msg = input("Enter new TODO msg: ")
+
+    updated = False
+    if id and msg:
+        updated = db.update_todo(int(id), msg, None)
+
+    if updated:
+        print(f"TODO with id {id} successfully updated")
+    else:
+        print(f"Unable to update TODO with ID {id}")
+
+
+def prompt_toggle_complete():
+    print("Toggling TODO completion status")
+    id = input("Enter TODO ID to toggle completion status: ")
+
+    if id:
+        completed = db.toggle_complete(int(id))
+        print(f"TODO with id {id} completion status: {completed}")
+
+
+def prompt_delete_todo():
+    print("Preparing to delete TODO...")
+    id = input("Enter ID of TODO to delete: ")
+
+    deleted = False
+    if id:
+        deleted = db.delete_todo(int(id))
+
+    if deleted:
+        print(f"Successfully deleted TODO with ID {id}")
+    else:
+        print(f"Unable to delete TODO with ID {id}")
+
+
+def prompt_stats():
+    if not hasattr(db, "snapshot"):
+        print("No statistics are collected for this store")
+        return
+    print(metrics.format_stats(db.snapshot()))
+    if hasattr(db, "peaks"):
+        print(f"\nPeak memory:\n{db.report()}")
+
+
+def prompt_help():
+    """
+    Displays the help message to the console
+    """
+    print(HELP_MSG)
+
+
+# Mapping of character keys to corresponding function
+cli_options = {
+    "a": prompt_add_todo,
+    "l": prompt_list_todos,
+    "e": prompt_edit_todo_msg,
+    "c": prompt_toggle_complete,
+    "d": prompt_delete_todo,
+    "s": prompt_stats,
+    "h": prompt_help,
+}
+
+
+def start_cli():
+    """
+    Prompts User for Input
+    :return: None
+    """
+    db.create_db_if_not_exists()
+    print(HELP_MSG)
+    user_input = input("Please specify an option: ")
+    while user_input != "q":
+        if user_input in cli_options:
+            run_command(cli_options[user_input])
+        user_input = input("Please specify an option: ")
+    print("Exiting application...")
+
+
+def run_command(func, *args, name: str = None):
+    """
+    Run a command, under the profiler when --profile is given
+    :param func: Function running the command
+    :param name: Name of the command in the profiles, defaults to the function's
+    :return: What func returned
+    """
+    if profiler is None:
+        return func(*args)
+    return profiler.run(name or func.__name__, func, *args)
+
+
+BATCH_HELP = """
+Batch file format, one command per line (blank lines and '#' comments are skipped):
+a <msg>         add a new todo
+e <id> <msg>    edit a todo's message
+c <id>          toggle a todo's completion status
+d <id>          delete a todo
+"""
+
+BATCH_SIZE = 1000  # Commands applied per db.execute_batch() call
+
+
+def parse_batch_command(line: str):
+    """
+    Parse a single line of a batch file
+    :param line: Line of the batch file
+    :return: (function name, args) tuple for db.execute_batch(), None for blank lines
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+
+    key, _, rest = line.partition(" ")
+    rest = rest.strip()
+    if key == "a" and rest:
+        return "add_todo", (rest,)
+    if key == "e":
+        id, _, msg = rest.partition(" ")
+        if id.isdigit() and msg.strip():
+            return "update_todo", (int(id), msg.strip(), None)
+    if key in ("c", "d") and rest.isdigit():
+        name = "toggle_complete" if key == "c" else "delete_todo"
+        return name, (int(rest),)
+    raise ValueError(f"Invalid batch command: {line!r}")
+
+
+def run_batch(lines, batch_size: int = BATCH_SIZE):
+    """
+    Apply the commands of a batch file w/o prompting, batch_size commands at a time
+    - Every line is parsed before the first command runs, so an invalid line
+      leaves the DB untouched instead of half applied
+    - Each group of commands reads and writes the DB once (see db.execute_batch)
+    :param lines: Iterable of batch file lines
+    :param batch_size: Number of commands applied at once
+    :return: Dictionary w/ the number of commands, failures and seconds elapsed
+    :raises ValueError: If a line isn't a valid command, nothing is applied
+    """
+    ops = []
+    for number, line in enumerate(lines, start=1):
+        try:
+            op = parse_batch_command(line)
+        except ValueError as e:
+            raise ValueError(f"Line {number}: {e}") from None
+        if op is not None:
+            ops.append(op)
+
+    db.create_db_if_not_exists()
+    start = time.perf_counter()
+    failed = 0
+    for group_start in range(0, len(ops), batch_size):
+        group = ops[group_start : group_start + batch_size]
+        for (name, _), result in zip(group, db.execute_batch(group)):
+            if name == "toggle_complete":
+                # Returns the new status, None if the todo doesn't exist
+                failed += result is None
+            else:
+                failed += not result
+
+    return {
+        "commands": len(ops),
+        "failed": failed,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main(argv=None, backend: str = None):
+    """
+    Run the interactive CLI, or apply a batch file when --batch is given
+    :param argv: Command line arguments, defaults to sys.argv
+    :param backend: Backend used when --backend isn't given, before falling back
+        to the TODO_BACKEND environment variable and backends.DEFAULT_BACKEND
+    :return: None
+    """
+    global db, profiler
+
+    parser = argparse.ArgumentParser(
+        description="Todo CLI",
+        epilog=BATCH_HELP,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--backend",
+        choices=backends.BACKENDS,
+        help=f"Storage to use, defaults to ${backends.BACKEND_ENV_VAR} "
+        f"or {backends.DEFAULT_BACKEND}",
+    )
+    parser.add_argument("--db", help="DB file, defaults to the backend's")
+    parser.add_argument(
+        "--batch", metavar="FILE", help="Apply the commands in FILE ('-' for stdin)"
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--list", action="store_true", help="Print every todo w/o prompting"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="FILE",
+        help="Dump the statistics of each operation to FILE (JSON), periodically "
+        "and on exit",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=metrics.DUMP_INTERVAL,
+        help="Seconds between two dumps of --metrics-file",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile each command w/ cProfile, printing the hot functions on exit",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        metavar="DIR",
+        help="Directory of the .prof / .collapsed (flamegraph) files written "
+        "w/ --profile, defaults to ./profiles",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        action="append",
+        metavar="OP=SIZE",
+        help="Track the peak memory of each operation w/ tracemalloc, w/ a budget "
+        "for OP (ex. get_todos=50MB), repeatable",
+    )
+    parser.add_argument(
+        "--memory-mode",
+        choices=["warn", "fail"],
+        help="What to do when an operation goes over its budget, giving it w/o "
+        "budgets only tracks the peaks (default: warn)",
+    )
+    parser.add_argument(
+        "--slow-query-log",
+        metavar="FILE",
+        help="Log the slow SQLite statements w/ their query plan to FILE "
+        "(rotated, sqlite backend only)",
+    )
+    parser.add_argument(
+        "--slow-query-ms",
+        type=float,
+        help="Minimum duration of a logged statement, in milliseconds",
+    )
+    parser.add_argument(
+        "--change-log",
+        metavar="FILE",
+        help="Append each change (add, update, delete) to FILE, for changelog.py "
+        "to apply to another store",
+    )
+    parser.add_argument(
+        "--read-replica",
+        action="append",
+        metavar="BACKEND:DB",
+        help="Send the reads to a replica kept in sync by replication.py "
+        "(ex. sqlite:replica.db), repeatable",
+    )
+    parser.add_argument(
+        "--max-replica-lag",
+        type=int,
+        help="Read from the primary when a replica is more changes behind "
+        "--change-log than this",
+    )
+    parser.add_argument(
+        "--promote-max-rows",
+        type=int,
+        help="Promote the (file) store to SQLite once it holds this many todos, "
+        "see promotion.py",
+    )
+    parser.add_argument(
+        "--promote-max-latency",
+        type=float,
+        help="Promote the (file) store to SQLite after consecutive operations "
+        "slower than this, in seconds",
+    )
+    parser.add_argument(
+        "--promote-to", metavar="FILE", help="SQLite file the store is promoted into"
+    )
+    parser.add_argument(
+        "--archive",
+        metavar="FILE",
+        help="SQLite archive the completed todos are moved to by tiering.py, "
+        "read and written along w/ the store",
+    )
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        # Only imported when needed, as cProfile / pstats are slow to import
+        import profiling
+
+        profiler = profiling.CommandProfiler(args.profile_dir)
+
+    name = backends.resolve_backend(args.backend or backend)
+    promote = args.promote_max_rows is not None or args.promote_max_latency is not None
+    if args.promote_to and not promote:
+        parser.error("--promote-to needs --promote-max-rows or --promote-max-latency")
+    if promote or os.path.exists(PROMOTION_STATE):
+        # Only imported when needed, like the json module it imports
+        import promotion
+
+        if promote and name == "sqlite":
+            parser.error("Only the file backends can be promoted to SQLite")
+        try:
+            if promote:
+                store = promotion.PromotingStore(
+                    name,
+                    args.db,
+                    max_rows=_default(args.promote_max_rows, promotion.MAX_ROWS),
+                    max_latency=_default(
+                        args.promote_max_latency, promotion.MAX_LATENCY
+                    ),
+                    state_path=PROMOTION_STATE,
+                    target_db=args.promote_to or promotion.TARGET_DB,
+                )
+            else:
+                # An earlier run promoted the store, open the SQLite store instead
+                _, store = promotion.open_store(name, args.db, PROMOTION_STATE)
+        except ModuleNotFoundError:
+            # A zipapp only bundles the controller of its backend
+            parser.error("The store was promoted to SQLite, which isn't bundled")
+    else:
+        store = backends.load_backend(name, args.db)
+    if args.archive:
+        # Only imported when needed, the archive tier imports sqlite3
+        import tiering
+
+        try:
+            archive = backends.load_backend("sqlite", args.archive)
+        except ModuleNotFoundError:
+            # A zipapp only bundles the controller of its backend
+            parser.error("--archive needs the sqlite backend, which isn't bundled")
+        store = tiering.TieredStore(store, archive)
+    db = metrics.MeteredStore(store)
+    if args.slow_query_log:
+        if not hasattr(db, "enable_slow_query_log"):
+            parser.error("--slow-query-log needs the sqlite backend")
+        threshold = (
+            args.slow_query_ms / 1000 if args.slow_query_ms is not None else None
+        )
+        db.enable_slow_query_log(args.slow_query_log, threshold)
+    log = None
+    if args.change_log:
+        # Only imported when needed, like the json module it imports
+        import changelog
+
+        try:
+            log = changelog.ChangeLog(args.change_log)
+        except RuntimeError as e:
+            parser.error(str(e))
+        db = changelog.LoggedStore(db, log)
+    if args.read_replica and not args.change_log:
+        # The replicas only get the changes logged by the primary, and their
+        # lag is measured against its log
+        parser.error("--read-replica needs --change-log")
+    if args.max_replica_lag is not None and not args.read_replica:
+        parser.error("--max-replica-lag needs --read-replica")
+    if args.read_replica:
+        import replication
+
+        try:
+            replicas = [replication.parse_replica(r) for r in args.read_replica]
+        except ValueError as e:
+            parser.error(str(e))
+        db = replication.ReplicatedStore(db, replicas, args.max_replica_lag)
+    if args.memory_budget or args.memory_mode:
+        # Only imported when needed, tracking slows down the allocations
+        import memory
+
+        try:
+            budgets = memory.parse_budgets(args.memory_budget)
+            db = memory.MemoryTracker(db, budgets, args.memory_mode or "warn")
+        except ValueError as e:
+            parser.error(str(e))
+    if args.metrics_file:
+        db.start_dump(args.metrics_file, args.metrics_interval)
+    try:
+        if args.list or args.batch is not None:
+            run_command(run, args, name="list" if args.list else "batch")
+        else:
+            run(args)
+    finally:
+        db.stop_dump()
+        if args.slow_query_log:
+            db.disable_slow_query_log()
+        if log is not None:
+            log.close()
+        if profiler is not None:
+            profiler.report()
+            profiler = None
+
+
+def _default(value, default):
+    return default if value is None else value
+
+
+def run(args):
+    """
+    Run the command selected by the parsed command line arguments
+    """
+    if args.list:
+        db.create_db_if_not_exists()
+        for page in paginate(db.iter_todos(), LIST_BUFFER_SIZE):
+            write_todos(page)
+        return
+
+    if args.batch is None:
+        return start_cli()
+
+    file = sys.stdin if args.batch == "-" else open(args.batch, "r")
+    try:
+        result = run_batch(file, args.batch_size)
+    except ValueError as e:
+        sys.exit(str(e))
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+    rate = result["commands"] / result["seconds"] if result["seconds"] else 0
+    print(
+        f"Applied {result['commands']:,} commands in {result['seconds']:.2f}s "
+        f"({rate:,.0f} ops/sec), {result['failed']:,} failed"
+    )
+
+
+if __name__ == "__main__":
+    main()
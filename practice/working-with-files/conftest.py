@@ -0,0 +1,23 @@
+"""
+pytest setup, so a single run (python -m pytest) collects every test of the tree
+
+The tests of each backend live in <backend>/database/test_db_controller.py and
+import the controller next to them as db_controller. The four test modules
+(and the four controllers) share their names, so the ones imported for the
+previous backend are dropped before the next one is collected: each test
+module keeps a reference to its own controller.
+"""
+
+import sys
+
+# Module names shared by the tests of every backend
+BACKEND_MODULES = ("test_db_controller", "db_controller")
+
+
+def pytest_collectstart(collector):
+    if (
+        getattr(collector, "path", None)
+        and collector.path.name == "test_db_controller.py"
+    ):
+        for name in BACKEND_MODULES:
+            sys.modules.pop(name, None)
@@ -3,25 +3,97 @@ Responsible for Interfacing with the DB (.json file)
 
 Shape of File:
 id,msg,complete
+
+Sharded Layout (optional, enabled by setting SHARD_SIZE):
+db.csv.d/shard-000000.csv -> ids 0 to SHARD_SIZE - 1
+db.csv.d/shard-000001.csv -> ids SHARD_SIZE to 2 * SHARD_SIZE - 1
+...
+
+Compressed Storage (optional, chosen from the extension of DB_NAME):
+db.csv.gz -> gzip (zlib / DEFLATE)
+db.csv.bz2 -> bz2
+db.csv.xz -> lzma
+
+Bloom Filter (optional, enabled by setting BLOOM_FILTER):
+db.csv.bloom -> counters of the ids in the DB, see bloom_filter.py
 """
 
+import importlib
 import os
 import csv
+import sys
+
+# The modules shared by the file backends live in the top directory, like the
+# CLI (see main.py), which isn't on sys.path when the controller is imported
+# on its own (ex. by its tests)
+_TOP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _TOP_DIR not in sys.path:
+    sys.path.append(_TOP_DIR)
+
+import bloom_filter  # noqa: E402
+import file_store  # noqa: E402
 
 DB_NAME = "db.csv"
 HEADERS = ["id", "msg", "complete"]
 
+# Number of ids stored per shard file, None keeps every todo in DB_NAME
+SHARD_SIZE = None
+
+# Files of at least this many bytes are parsed by several processes in
+# get_todos(), None parses every file in this process
+PARALLEL_THRESHOLD = 64 * 1024 * 1024
+PARALLEL_WORKERS = None  # Processes parsing a big file, None for one per CPU
+
+# Mapping of file extensions to the module (de)compressing them, each module
+# is only imported once a file w/ its extension is opened. Appending to a
+# compressed file (add_todo(), insert_todos()) adds a compressed member to it
+# instead of recompressing it, ~100 bytes per todo added one at a time; the
+# next write rewriting the file (update, toggle, delete) compacts it again
+COMPRESSION_MODULES = {".gz": "gzip", ".bz2": "bz2", ".xz": "lzma"}
+
+# Keep a Bloom filter of the ids in <DB_NAME>.bloom, so looking up, updating or
+# deleting an id which isn't in the DB doesn't read the file (the first lookup
+# reads every file to build it)
+BLOOM_FILTER = False
+BLOOM_COUNTERS_PER_ID = 10  # W/ 7 hashes, ~1% of the missing ids get a scan
+BLOOM_HASHES = 7
+BLOOM_MIN_IDS = 1024  # Number of ids the smallest filter is sized for
+
 # Create a mapping between strings and their boolean types
 bool_mapping = {"True": True, "False": False}
 
+# Mapping of thread id -> number of lock() blocks it entered and didn't exit
+# yet, only the outermost block of each thread locks
+_lock_depths = {}
+
+
+def lock(shared: bool = False):
+    """
+    Lock the DB against writes from other processes, w/ an advisory flock() on
+    DB_NAME (or on the shard directory when sharded), see file_store.Lock
+    - The write functions hold it exclusively, backup.py holds it shared while
+      copying the files, so a backup never copies a half written file
+    :param shared: Take a shared lock, held by several processes at once
+    :return: Context manager holding the lock
+    """
+    return file_store.Lock(
+        _shard_dir() if SHARD_SIZE else DB_NAME, shared, _lock_depths
+    )
+
+
+# Runs a write function w/ the DB locked exclusively (see lock())
+_exclusive = file_store.exclusive(lock)
+
 
 def create_db_if_not_exists():
     """
     Create a new DB (csv file) if one does not exist in the directory
     :return: None
     """
-    if not os.path.exists(DB_NAME):
-        with open(DB_NAME, "w", newline="") as file:
+    if SHARD_SIZE:
+        os.makedirs(_shard_dir(), exist_ok=True)
+    elif not os.path.exists(DB_NAME):
+        with _open(DB_NAME, "w", newline="") as file:
             writer = csv.writer(file)
             writer.writerow(HEADERS)
 
@@ -29,18 +101,25 @@ def create_db_if_not_exists():
 def get_todos():
     """
     Return a list of all Todos in the DB
+    - Files of PARALLEL_THRESHOLD bytes or more are parsed in parallel
     :return: List of Todo Dictionaries
     """
-    with open(DB_NAME, "r") as file:
-        reader = csv.DictReader(file)
-        todos = list(reader)
+    todos = []
+    for path in _paths():
+        if PARALLEL_THRESHOLD and os.path.getsize(path) >= PARALLEL_THRESHOLD:
+            todos += _read_parallel(path)
+        else:
+            todos += _iter_file(path)
+    return todos
 
-    # Convert the 'id' and 'complete' fields to their appropriate types
-    for todo in todos:
-        todo["id"] = int(todo["id"])
-        todo["complete"] = bool_mapping[todo["complete"]]
 
-    return todos
+def iter_todos():
+    """
+    Lazily yield every Todo in the DB, one file (or shard) at a time
+    :return: Generator of Todo Dictionaries
+    """
+    for path in _paths():
+        yield from _iter_file(path)
 
 
 def get_todo_by_id(id: int):
@@ -49,7 +128,11 @@ def get_todo_by_id(id: int):
     :param id: The ID of the Todo to return
     :return: Todo of specified ID or None if not found
     """
-    with open(DB_NAME, "r") as file:
+    path = _path_for_id(id)
+    if not os.path.exists(path) or not _might_exist(id):
+        return None
+
+    with _open(path, "r", newline="") as file:
         reader = csv.DictReader(file)
         for row in reader:
             if int(row["id"]) == id:
@@ -60,25 +143,66 @@ def get_todo_by_id(id: int):
                 }
 
 
+@_exclusive
 def add_todo(msg: str):
     """
     Create a new Todo and add it to the DB
     :param msg: The message of the new Todo
     :return: Boolean representing if the book was updated or not
     """
-    todo_count = _get_todos_count()
-    with open(DB_NAME, "a", newline="") as file:
+    new_id = _next_id()
+    path = _path_for_id(new_id)
+    if SHARD_SIZE:
+        os.makedirs(_shard_dir(), exist_ok=True)
+
+    # If the file is empty, write the headers first
+    # (the size is checked up front, as .tell() is always 0 for compressed appends)
+    needs_headers = not os.path.exists(path) or os.path.getsize(path) == 0
+
+    stamps = {path: _stamp(path)}
+    with _open(path, "a", newline="") as file:
         writer = csv.DictWriter(file, fieldnames=HEADERS)
-        # If the file is empty, write the headers first
-        if (
-            file.tell() == 0
-        ):  # .tell() returns current position of file cursor, 0 if file is empty
+        if needs_headers:
             writer.writeheader()
         # Append the new todo
-        writer.writerow({"id": todo_count, "msg": msg, "complete": False})
-        return True
+        writer.writerow({"id": new_id, "msg": msg, "complete": False})
+    _update_bloom_filter(stamps, added=[new_id])
+    return True
+
+
+@_exclusive
+def insert_todos(todos):
+    """
+    Add Todos which already have an ID (ex. when moving todos between DBs)
+    - Each todo is appended to the file (or shard) covering its id
+    - The ids are expected not to exist in the DB yet
+    :param todos: Iterable of Todo Dictionaries
+    :return: Number of todos inserted
+    """
+    # Group the todos by the file they belong in, so each file is opened once
+    todos_by_path = {}
+    for todo in todos:
+        todos_by_path.setdefault(_path_for_id(todo["id"]), []).append(todo)
+
+    if SHARD_SIZE and todos_by_path:
+        os.makedirs(_shard_dir(), exist_ok=True)
 
+    stamps = {path: _stamp(path) for path in todos_by_path}
+    for path, batch in todos_by_path.items():
+        needs_headers = not os.path.exists(path) or os.path.getsize(path) == 0
+        with _open(path, "a", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=HEADERS)
+            if needs_headers:
+                writer.writeheader()
+            writer.writerows(batch)
+    _update_bloom_filter(
+        stamps, added=[todo["id"] for batch in todos_by_path.values() for todo in batch]
+    )
 
+    return sum(len(batch) for batch in todos_by_path.values())
+
+
+@_exclusive
 def update_todo(id: int, new_msg: str = None, new_complete: bool = None):
     """
     Update a Todo Item in the DB
@@ -87,7 +211,12 @@ def update_todo(id: int, new_msg: str = None, new_complete: bool = None):
     :param new_complete: The new completion status
     :return: Boolean representing if book was updated or not
     """
-    todos = get_todos()
+    # Only the file (or shard) holding the id needs to be rewritten
+    path = _path_for_id(id)
+    if not os.path.exists(path) or not _might_exist(id):
+        return False
+
+    todos = _read_todos(path)
     updated = False
 
     for todo in todos:
@@ -100,31 +229,41 @@ def update_todo(id: int, new_msg: str = None, new_complete: bool = None):
             break
 
     if updated:
-        _write_todos(todos)
+        stamps = {path: _stamp(path)}
+        _write_todos(todos, path)
+        _update_bloom_filter(stamps)
 
     return updated
 
 
+@_exclusive
 def toggle_complete(id: int):
     """
     Toggle the completion status of the todo
     :param id: ID of the todo
-    :return: Boolean value representing completion status after toggle
+    :return: Boolean value representing completion status after toggle,
+        None if there is no todo w/ that id
     """
     todo = get_todo_by_id(id)
-    todo_complete = todo["complete"]
     if todo:
-        update_todo(id, None, (not todo_complete))
-    return not todo_complete
+        new_complete = not todo["complete"]
+        update_todo(id, None, new_complete)
+        return new_complete
 
 
+@_exclusive
 def delete_todo(id: int):
     """
     Delete the TODO w/ specified ID from the DB
     :param id: ID of the TODO to remove from the DB
     :return: Boolean value representing success or failure of todo deletion
     """
-    todos = get_todos()
+    # Only the file (or shard) holding the id needs to be rewritten
+    path = _path_for_id(id)
+    if not os.path.exists(path) or not _might_exist(id):
+        return False
+
+    todos = _read_todos(path)
 
     # Filter out todo w/ specified id
     new_todos = [todo for todo in todos if int(todo["id"]) != id]
@@ -132,10 +271,171 @@ def delete_todo(id: int):
     if len(todos) == len(new_todos):
         return False  # No item was deleted
 
-    _write_todos(new_todos)
+    stamps = {path: _stamp(path)}
+    _write_todos(new_todos, path)
+    _update_bloom_filter(stamps, removed=[id] * (len(todos) - len(new_todos)))
     return True
 
 
+@_exclusive
+def execute_batch(ops):
+    """
+    Run many operations, reading and writing each file (or shard) involved only once
+    - Results are the same as calling the functions one after the other
+    :param ops: List of (function name, args) tuples, the supported functions being
+        ("add_todo", (msg,)), ("update_todo", (id, new_msg, new_complete)),
+        ("toggle_complete", (id,)) and ("delete_todo", (id,))
+    :return: List of results, one per operation
+    """
+    loaded = {}  # Mapping of path -> _LoadedFile of the files read so far
+    changed = set()  # Paths of the files which need to be written back
+    stamps = {}  # Mapping of path -> _stamp() of the files read, for the filter
+    added, removed = [], []  # Ids added to / removed from the DB
+
+    def file_for(id):
+        path = _path_for_id(id)
+        if path not in loaded:
+            stamps[path] = _stamp(path)
+            loaded[path] = _LoadedFile(
+                _read_todos(path) if os.path.exists(path) else []
+            )
+        return path, loaded[path]
+
+    results = []
+    for name, args in ops:
+        if name == "add_todo":
+            new_id = _next_id(loaded)
+            path, file = file_for(new_id)
+            file.add({"id": new_id, "msg": args[0], "complete": False})
+            changed.add(path)
+            added.append(new_id)
+            results.append(True)
+
+        elif name in ("update_todo", "toggle_complete"):
+            path, file = file_for(args[0])
+            matches = file.by_id.get(args[0])
+            if not matches:
+                results.append(False if name == "update_todo" else None)
+                continue
+
+            if name == "update_todo":
+                _, new_msg, new_complete = args
+            else:
+                new_msg, new_complete = None, not matches[0]["complete"]
+            for todo in matches[:1]:  # Like update_todo(), only the first match
+                if new_msg is not None:
+                    todo["msg"] = new_msg
+                if new_complete is not None:
+                    todo["complete"] = new_complete
+            changed.add(path)
+            results.append(True if name == "update_todo" else new_complete)
+
+        elif name == "delete_todo":
+            path, file = file_for(args[0])
+            removed += [args[0]] * len(file.by_id.get(args[0], ()))
+            deleted = file.remove(args[0])
+            if deleted:
+                changed.add(path)
+            results.append(deleted)
+
+        else:
+            raise ValueError(f"Unsupported batch operation '{name}'")
+
+    if SHARD_SIZE and changed:
+        os.makedirs(_shard_dir(), exist_ok=True)
+    for path in changed:
+        _write_todos(loaded[path].live(), path)
+    if changed:
+        _update_bloom_filter(
+            {path: stamps[path] for path in changed}, added=added, removed=removed
+        )
+
+    return results
+
+
+class _LoadedFile:
+    """
+    Todos of a single file held in memory by execute_batch(), indexed by id
+    """
+
+    def __init__(self, todos):
+        self.todos = todos
+        self.by_id = {}  # Mapping of id -> todos w/ that id (ids may be repeated)
+        self.removed = set()  # id() of the deleted todos, dropped when written
+        for todo in todos:
+            self.by_id.setdefault(todo["id"], []).append(todo)
+
+    def __len__(self):
+        return len(self.todos) - len(self.removed)
+
+    def add(self, todo):
+        self.todos.append(todo)
+        self.by_id.setdefault(todo["id"], []).append(todo)
+
+    def remove(self, todo_id):
+        matches = self.by_id.pop(todo_id, [])
+        self.removed.update(id(todo) for todo in matches)
+        return bool(matches)
+
+    def live(self):
+        return [todo for todo in self.todos if id(todo) not in self.removed]
+
+
+def _might_exist(id: int):
+    """
+    Check the Bloom filter for an id, before reading the file which would hold it
+    (see bloom_filter.might_exist())
+    :param id: ID of the todo
+    :return: False if there is certainly no todo w/ that id, True if there may be
+    """
+    if not BLOOM_FILTER:
+        return True
+
+    path = _path_for_id(id)
+    # Shared, so that no write changes the files while the filter is checked
+    with lock(shared=True):
+        return bloom_filter.might_exist(
+            _bloom_path(), id, {path: _stamp(path)}, _build_bloom_filter
+        )
+
+
+def _update_bloom_filter(stamps, added=(), removed=()):
+    """
+    Count the ids added to / removed from the DB by a write in the Bloom filter
+    (see bloom_filter.update())
+    :param stamps: Mapping of path -> _stamp() of the files written, from before
+        they were written
+    :param added: Ids added to the DB
+    :param removed: Ids removed from the DB, once per todo removed
+    """
+    if not BLOOM_FILTER:
+        return
+    bloom_filter.update(
+        _bloom_path(),
+        stamps,
+        {path: _stamp(path) for path in stamps},
+        added,
+        removed,
+        BLOOM_COUNTERS_PER_ID,
+        _build_bloom_filter,
+    )
+
+
+def _build_bloom_filter():
+    """
+    Build the Bloom filter from every id in the DB, reading every file
+    :return: Open bloom_filter.BloomFilter
+    """
+    files = {
+        path: (_stamp(path), (todo["id"] for todo in _iter_file(path)))
+        for path in _paths()
+        if os.path.exists(path)
+    }
+    return bloom_filter.BloomFilter.build(
+        _bloom_path(), files, BLOOM_COUNTERS_PER_ID, BLOOM_HASHES, BLOOM_MIN_IDS
+    )
+
+
 def _get_todos_count():
     """
     Return the number of todos in the DB
@@ -144,12 +444,222 @@ def _get_todos_count():
     return len(get_todos())
 
 
-def _write_todos(todos):
+def _next_id(loaded=None):
+    """
+    Return the id to assign to the next new todo
+    - Unsharded DBs keep using the number of todos as the next id
+    - Sharded DBs use the highest id of the last non-empty shard + 1,
+      so adding a todo never has to read every shard
+    :param loaded: Mapping of path -> _LoadedFile already in memory
+        (see execute_batch), used instead of reading those files
+    :return: Integer id for the next todo
+    """
+    loaded = loaded or {}
+    if not SHARD_SIZE:
+        if DB_NAME in loaded:
+            return len(loaded[DB_NAME])
+        return _get_todos_count()
+
+    for path in reversed(_paths(extra=loaded)):
+        if path in loaded:
+            ids = loaded[path].by_id.keys()
+        else:
+            ids = [todo["id"] for todo in _read_todos(path)]
+        if ids:
+            return max(ids) + 1
+    return 0
+
+
+def _read_todos(path):
+    """
+    Read every todo stored in a single csv file
+    :param path: Path of the csv file (DB_NAME or a shard)
+    :return: List of Todo Dictionaries
+    """
+    return list(_iter_file(path))
+
+
+def _iter_file(path):
+    """
+    Lazily yield the todos stored in a single csv file, one row at a time
+    :param path: Path of the csv file (DB_NAME or a shard)
+    :return: Generator of Todo Dictionaries
+    """
+    with _open(path, "r", newline="") as file:
+        reader = csv.DictReader(file)
+        for todo in reader:
+            # Convert the 'id' and 'complete' fields to their appropriate types
+            todo["id"] = int(todo["id"])
+            todo["complete"] = bool_mapping[todo["complete"]]
+            yield todo
+
+
+def _write_todos(todos, path=None):
     """
     Writes a list of dictionaries into a csv file
     :param todos: Dictionary w/ following headers: "id", "msg", "complete"
+    :param path: File to write to, defaults to DB_NAME
     """
-    with open(DB_NAME, "w", newline="") as file:
+    with _open(path or DB_NAME, "w", newline="") as file:
         writer = csv.DictWriter(file, fieldnames=HEADERS)
         writer.writeheader()
         writer.writerows(todos)
+
+
+def _read_parallel(path, workers: int = None):
+    """
+    Read every todo of a big csv file, parsed by several processes
+    - The rows after the header are split at newlines into one range of bytes
+      per process
+    - Each process sends back its todos as columns (ids, messages joined by
+      newlines, completion flags), a lot faster to pickle than dictionaries,
+      and the dictionaries are built here in file order
+    - The file is parsed in this process when it's compressed, when it holds
+      quoted fields (they can span several lines), w/ one CPU, w/o os.fork()
+      (the controller can't be imported by name from a new interpreter), or
+      while other threads run (ex. AsyncStore's), as a forked child may
+      inherit locks they hold and deadlock
+    :param path: Path of the csv file (DB_NAME or a shard)
+    :param workers: Number of processes, defaults to PARALLEL_WORKERS
+    :return: List of Todo Dictionaries
+    """
+    import multiprocessing
+    import threading
+
+    workers = workers or PARALLEL_WORKERS or os.cpu_count() or 1
+    if (
+        workers < 2
+        or "fork" not in multiprocessing.get_all_start_methods()
+        or threading.active_count() > 1
+        or os.path.splitext(path)[1] in COMPRESSION_MODULES
+    ):
+        return list(_iter_file(path))
+    with _open(path, "rb") as file:
+        header = next(csv.reader([file.readline().decode()]), None)
+        start = file.tell()
+        quoted = any(b'"' in chunk for chunk in iter(lambda: file.read(1 << 20), b""))
+    if header != HEADERS or quoted:
+        return list(_iter_file(path))
+
+    context = multiprocessing.get_context("fork")
+    processes = []
+    for start, end in _chunk_bounds(path, workers, start):
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_parse_chunk, args=(path, start, end, sender), daemon=True
+        )
+        process.start()
+        sender.close()
+        processes.append((process, receiver))
+
+    todos = []
+    try:
+        for _, receiver in processes:
+            chunk = receiver.recv()
+            if isinstance(chunk, Exception):
+                raise chunk
+            ids, messages, completes = chunk
+            todos += [
+                {"id": id, "msg": msg, "complete": complete == 1}
+                for id, msg, complete in zip(
+                    ids.tolist(), messages.split("\n"), completes
+                )
+            ]
+    finally:
+        for process, receiver in processes:
+            receiver.close()
+            process.join()
+    return todos
+
+
+def _chunk_bounds(path, count: int, start: int = 0):
+    """
+    Split a file, from start on, into ranges of whole lines of about the same size
+    :return: List of (start, end) byte offsets
+    """
+    size = os.path.getsize(path)
+    offsets = [start]
+    with open(path, "rb") as file:
+        for i in range(1, count):
+            file.seek(max(start + (size - start) * i // count, offsets[-1]))
+            file.readline()  # To the start of the next line
+            offsets.append(file.tell())
+    offsets.append(size)
+    return [(start, end) for start, end in zip(offsets, offsets[1:]) if start < end]
+
+
+def _parse_chunk(path, start: int, end: int, connection):
+    """
+    Parse the rows of a range of bytes of a csv file (run by _read_parallel())
+    :param connection: multiprocessing Connection the columns are sent to
+    """
+    import array
+
+    try:
+        with open(path, "rb") as file:
+            file.seek(start)
+            lines = file.read(end - start).decode().split("\n")
+        if not lines[-1]:
+            lines.pop()  # The range ends w/ a newline (unless the file doesn't)
+        ids, messages, completes = array.array("q"), [], bytearray()
+        # Rows end w/ "\r\n", the reader drops the "\r" left by the split
+        for id, msg, complete in csv.reader(lines):
+            ids.append(int(id))
+            messages.append(msg)
+            completes.append(bool_mapping[complete])
+        result = ids, "\n".join(messages), bytes(completes)
+    except Exception as e:
+        result = e
+    connection.send(result)
+    connection.close()
+
+
+def _open(path, mode="r", **kwargs):
+    """
+    Open a DB file, transparently (de)compressing it when its extension asks for it
+    - Every DB file is opened through here (see metrics.py)
+    :param path: Path of the file (DB_NAME or a shard)
+    :param mode: Text mode to open the file in ("r", "w" or "a"), or a binary
+        mode for an uncompressed file
+    :return: File object
+    """
+    module = COMPRESSION_MODULES.get(os.path.splitext(path)[1])
+    if module is None:
+        return open(path, mode, **kwargs)
+    # Compressed files are streamed through the (de)compressor in text mode
+    return importlib.import_module(module).open(path, f"{mode}t", **kwargs)
+
+
+def _bloom_path():
+    """
+    Return the path of the Bloom filter of the DB (ex. db.csv.bloom)
+    """
+    return f"{DB_NAME}.bloom"
+
+
+# Shared w/ the other file controllers, see file_store.py
+_stamp = file_store.stamp
+_suffixes = file_store.suffixes
+
+
+def _shard_dir():
+    """
+    Return the directory holding the shard files (ex. db.csv.d)
+    """
+    return file_store.shard_dir(DB_NAME)
+
+
+def _path_for_id(id: int):
+    """
+    Return the path of the file which holds (or will hold) the todo w/ specified ID
+    :return: DB_NAME, or the shard file covering the id when sharding is enabled
+    """
+    return file_store.path_for_id(DB_NAME, SHARD_SIZE, id)
+
+
+def _paths(extra=()):
+    """
+    Return the paths of every file making up the DB, ordered by id range
+    :param extra: Shard paths to include even if they don't exist on disk yet
+    """
+    return file_store.paths(DB_NAME, SHARD_SIZE, extra)
@@ -0,0 +1,170 @@
+"""
+Helpers shared by the file backed controllers (txt / csv / json)
+
+- The files making up a DB: DB_NAME, or the shard files in <DB_NAME>.d when
+  SHARD_SIZE is set, and the stamps telling whether a file changed
+- The advisory flock() keeping other processes (and threads) from writing
+  while a write function or a backup runs
+
+The controllers keep their settings (DB_NAME, SHARD_SIZE) as module globals,
+which may be changed at runtime, so each call is given their current values.
+
+Sharded Layout:
+db.txt.d/shard-000000.txt -> ids 0 to SHARD_SIZE - 1
+db.txt.d/shard-000001.txt -> ids SHARD_SIZE to 2 * SHARD_SIZE - 1
+...
+"""
+
+import os
+
+
+def exclusive(lock):
+    """
+    Return a decorator running a write function w/ the DB locked exclusively
+    :param lock: lock() function of the controller (see Lock)
+    :return: Decorator
+    """
+
+    def decorate(func):
+        def locked(*args, **kwargs):
+            with lock():
+                return func(*args, **kwargs)
+
+        locked.__name__, locked.__doc__ = func.__name__, func.__doc__
+        return locked
+
+    return decorate
+
+
+class Lock:
+    """
+    flock() held from __enter__ to __exit__ on a DB file (or shard directory)
+    - Nested locks (ex. toggle_complete() calling update_todo()) lock only once,
+      each thread locks on its own
+    - Nothing is locked before the DB exists, or w/o fcntl (Windows)
+    """
+
+    def __init__(self, path: str, shared: bool, depths: dict):
+        """
+        :param path: DB_NAME, or the shard directory when sharded
+        :param shared: Take a shared lock, held by several processes at once
+        :param depths: Mapping of thread id -> number of lock blocks it entered
+            and didn't exit yet, one per controller module
+        """
+        self.path = path
+        self.shared = shared
+        self.depths = depths
+        self.fd = None
+        self.thread = None
+
+    def __enter__(self):
+        # Only imported when needed, most commands never lock the DB
+        import threading
+
+        # Each thread locks on its own, w/ its own file descriptor, so threads
+        # (ex. the async store's) exclude each other like processes do
+        self.thread = threading.get_ident()
+        depth = self.depths.get(self.thread, 0)
+        if depth == 0:
+            self.fd = lock_fd(self.path, self.shared)
+        self.depths[self.thread] = depth + 1
+        return self
+
+    def __exit__(self, *exc_info):
+        depth = self.depths.pop(self.thread) - 1
+        if depth:
+            self.depths[self.thread] = depth
+        if self.fd is not None:
+            # Closing the descriptor releases the lock
+            os.close(self.fd)
+            self.fd = None
+
+
+def lock_fd(path: str, shared: bool):
+    """
+    Open a DB file (or the shard directory) and flock() it
+    :param path: Path of the file or directory
+    :param shared: Take a shared lock instead of an exclusive one
+    :return: File descriptor holding the lock, None if nothing could be locked
+    """
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        return None
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+def stamp(path: str):
+    """
+    Return what identifies a version of a file, to tell if it changed
+    :return: [inode, size, mtime in ns], None if the file doesn't exist
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+def shard_dir(db_name: str):
+    """
+    Return the directory holding the shard files of a DB (ex. db.txt.d)
+    """
+    return f"{db_name}.d"
+
+
+def path_for_id(db_name: str, shard_size: int, id: int):
+    """
+    Return the path of the file which holds (or will hold) the todo w/ specified ID
+    :param db_name: DB_NAME of the controller
+    :param shard_size: SHARD_SIZE of the controller, None when not sharded
+    :param id: ID of the todo
+    :return: db_name, or the shard file covering the id when sharding is enabled
+    """
+    if not shard_size:
+        return db_name
+    suffix = suffixes(db_name)
+    return os.path.join(shard_dir(db_name), f"shard-{id // shard_size:06d}{suffix}")
+
+
+def suffixes(path: str):
+    """
+    Return every extension of a file name, ex. ".csv.gz" for "db.csv.gz"
+    - Same as "".join(pathlib.Path(path).suffixes), w/o importing pathlib
+    """
+    name = os.path.basename(path).lstrip(".")
+    return name[name.index(".") :] if "." in name else ""
+
+
+def paths(db_name: str, shard_size: int, extra=()):
+    """
+    Return the paths of every file making up a DB, ordered by id range
+    :param db_name: DB_NAME of the controller
+    :param shard_size: SHARD_SIZE of the controller, None when not sharded
+    :param extra: Shard paths to include even if they don't exist on disk yet
+    :return: List of file paths
+    """
+    if not shard_size:
+        return [db_name]
+
+    directory = shard_dir(db_name)
+    shards = {os.path.basename(path) for path in extra}
+    if os.path.isdir(directory):
+        shards.update(
+            name for name in os.listdir(directory) if name.startswith("shard-")
+        )
+    return [
+        os.path.join(directory, name)
+        for name in sorted(
+            shards, key=lambda name: int(name[len("shard-") :].split(".", 1)[0])
+        )
+    ]
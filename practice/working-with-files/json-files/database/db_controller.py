@@ -9,35 +9,108 @@ Shape of File:
         complete: false
     }
 ]
+
+Sharded Layout (optional, enabled by setting SHARD_SIZE):
+db.json.d/shard-000000.json -> ids 0 to SHARD_SIZE - 1
+db.json.d/shard-000001.json -> ids SHARD_SIZE to 2 * SHARD_SIZE - 1
+...
+
+Compressed Storage (optional, chosen from the extension of DB_NAME):
+db.json.gz -> gzip (zlib / DEFLATE)
+db.json.bz2 -> bz2
+db.json.xz -> lzma
+
+Bloom Filter (optional, enabled by setting BLOOM_FILTER):
+db.json.bloom -> counters of the ids in the DB, see bloom_filter.py
 """
 
+import importlib
 import os
 import json
+import sys
+
+# The modules shared by the file backends live in the top directory, like the
+# CLI (see main.py), which isn't on sys.path when the controller is imported
+# on its own (ex. by its tests)
+_TOP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _TOP_DIR not in sys.path:
+    sys.path.append(_TOP_DIR)
+
+import bloom_filter  # noqa: E402
+import file_store  # noqa: E402
 
 DB_NAME = "db.json"
 
+# Number of ids stored per shard file, None keeps every todo in DB_NAME
+SHARD_SIZE = None
+
+# Mapping of file extensions to the module (de)compressing them, each module
+# is only imported once a file w/ its extension is opened
+COMPRESSION_MODULES = {".gz": "gzip", ".bz2": "bz2", ".xz": "lzma"}
+
+# Keep a Bloom filter of the ids in <DB_NAME>.bloom, so looking up, updating or
+# deleting an id which isn't in the DB doesn't read the file (the first lookup
+# reads every file to build it)
+BLOOM_FILTER = False
+BLOOM_COUNTERS_PER_ID = 10  # W/ 7 hashes, ~1% of the missing ids get a scan
+BLOOM_HASHES = 7
+BLOOM_MIN_IDS = 1024  # Number of ids the smallest filter is sized for
+
 # Create a mapping between strings and their boolean types
 bool_mapping = {"True": True, "False": False}
 
+# Mapping of thread id -> number of lock() blocks it entered and didn't exit
+# yet, only the outermost block of each thread locks
+_lock_depths = {}
+
+
+def lock(shared: bool = False):
+    """
+    Lock the DB against writes from other processes, w/ an advisory flock() on
+    DB_NAME (or on the shard directory when sharded), see file_store.Lock
+    - The write functions hold it exclusively, backup.py holds it shared while
+      copying the files, so a backup never copies a half written file
+    :param shared: Take a shared lock, held by several processes at once
+    :return: Context manager holding the lock
+    """
+    return file_store.Lock(
+        _shard_dir() if SHARD_SIZE else DB_NAME, shared, _lock_depths
+    )
+
+
+# Runs a write function w/ the DB locked exclusively (see lock())
+_exclusive = file_store.exclusive(lock)
+
 
 def create_db_if_not_exists():
     """
     Create a new DB (json file) if one does not exist in the directory
     :return: None
     """
-    if not os.path.exists(DB_NAME):
-        with open(DB_NAME, "w") as file:
+    if SHARD_SIZE:
+        os.makedirs(_shard_dir(), exist_ok=True)
+    elif not os.path.exists(DB_NAME):
+        with _open(DB_NAME, "w") as file:
             json.dump([], file)
 
 
 def get_todos():
     """
     Return a list of all Todos in the DB
+    - Each file is parsed at once w/ json.load, which is faster than
+      iter_todos() when every todo is held in memory anyway
     :return: List of Todo Dictionaries
     """
-    with open(DB_NAME, "r") as file:
-        todos = json.load(file)
-        return todos
+    return [todo for path in _paths() for todo in _read_todos(path)]
+
+
+def iter_todos():
+    """
+    Lazily yield every Todo in the DB, one file (or shard) at a time
+    :return: Generator of Todo Dictionaries
+    """
+    for path in _paths():
+        yield from _iter_file(path)
 
 
 def get_todo_by_id(id: int):
@@ -46,8 +119,11 @@ def get_todo_by_id(id: int):
     :param id: The ID of the Todo to return
     :return: Todo of specified ID or None if not found
     """
-    # Retrieve todos from DB
-    todos = get_todos()
+    # Retrieve todos from the file (or shard) holding the id
+    path = _path_for_id(id)
+    if not os.path.exists(path) or not _might_exist(id):
+        return None
+    todos = _read_todos(path)
 
     # Search and return specific todo if found
     for todo in todos:
@@ -55,26 +131,65 @@ def get_todo_by_id(id: int):
             return todo
 
 
+@_exclusive
 def add_todo(msg: str):
     """
     Create a new Todo and add it to the DB
     :param msg: The message of the new Todo
     :return: Boolean representing if the book was updated or not
     """
-    # Retrieve todos from DB
-    todos = get_todos()
+    # Retrieve todos from the file (or shard) the new todo belongs in
+    if SHARD_SIZE:
+        new_id = _next_id()
+        path = _path_for_id(new_id)
+        os.makedirs(_shard_dir(), exist_ok=True)
+        todos = _read_todos(path) if os.path.exists(path) else []
+    else:
+        # The next id is the number of todos, so the file is only parsed once
+        path = DB_NAME
+        todos = _read_todos(path) if os.path.exists(path) else []
+        new_id = len(todos)
 
     # Create new todo and append it to retrieved todos
-    todos_count = len(todos)
-    new_todo = {"id": todos_count, "msg": msg, "complete": False}
+    new_todo = {"id": new_id, "msg": msg, "complete": False}
     todos.append(new_todo)
 
     # Write new todo list back to JSON file
-    _write_todos(todos)
+    stamps = {path: _stamp(path)}
+    _write_todos(todos, path)
+    _update_bloom_filter(stamps, added=[new_id])
 
     return True
 
 
+@_exclusive
+def insert_todos(todos):
+    """
+    Add Todos which already have an ID (ex. when moving todos between DBs)
+    - Each todo is added to the file (or shard) covering its id
+    - The ids are expected not to exist in the DB yet
+    :param todos: Iterable of Todo Dictionaries
+    :return: Number of todos inserted
+    """
+    # Group the todos by the file they belong in, so each file is rewritten once
+    todos_by_path = {}
+    for todo in todos:
+        todos_by_path.setdefault(_path_for_id(todo["id"]), []).append(todo)
+
+    if SHARD_SIZE and todos_by_path:
+        os.makedirs(_shard_dir(), exist_ok=True)
+
+    stamps = {path: _stamp(path) for path in todos_by_path}
+    for path, batch in todos_by_path.items():
+        _append_todos(batch, path)
+    _update_bloom_filter(
+        stamps, added=[todo["id"] for batch in todos_by_path.values() for todo in batch]
+    )
+
+    return sum(len(batch) for batch in todos_by_path.values())
+
+
+@_exclusive
 def update_todo(id: int, new_msg: str = None, new_complete: bool = None):
     """
     Update a Todo Item in the DB
@@ -83,7 +198,12 @@ def update_todo(id: int, new_msg: str = None, new_complete: bool = None):
     :param new_complete: The new completion status
     :return: Boolean representing if book was updated or not
     """
-    todos = get_todos()
+    # Only the file (or shard) holding the id needs to be rewritten
+    path = _path_for_id(id)
+    if not os.path.exists(path) or not _might_exist(id):
+        return False
+
+    todos = _read_todos(path)
     updated = False
 
     for todo in todos:
@@ -96,16 +216,20 @@ def update_todo(id: int, new_msg: str = None, new_complete: bool = None):
             break
 
     if updated:
-        _write_todos(todos)
+        stamps = {path: _stamp(path)}
+        _write_todos(todos, path)
+        _update_bloom_filter(stamps)
 
     return updated
 
 
+@_exclusive
 def toggle_complete(id: int):
     """
     Toggle the completion status of the todo
     :param id: ID of the todo
-    :return: Boolean value representing completion status after toggle
+    :return: Boolean value representing completion status after toggle,
+        None if there is no todo w/ that id
     """
     todo = get_todo_by_id(id)
     if todo:
@@ -114,13 +238,19 @@ def toggle_complete(id: int):
         return new_complete
 
 
+@_exclusive
 def delete_todo(id: int):
     """
     Delete the TODO w/ specified ID from the DB
     :param id: ID of the TODO to remove from the DB
     :return: Boolean value representing success or failure of todo deletion
     """
-    todos = get_todos()
+    # Only the file (or shard) holding the id needs to be rewritten
+    path = _path_for_id(id)
+    if not os.path.exists(path) or not _might_exist(id):
+        return False
+
+    todos = _read_todos(path)
 
     # Filter out todo we don't want
     new_todos = [todo for todo in todos if todo["id"] != id]
@@ -128,10 +258,171 @@ def delete_todo(id: int):
     if len(todos) == len(new_todos):
         return False  # No item was deleted
 
-    _write_todos(new_todos)
+    stamps = {path: _stamp(path)}
+    _write_todos(new_todos, path)
+    _update_bloom_filter(stamps, removed=[id] * (len(todos) - len(new_todos)))
     return True
 
 
+@_exclusive
+def execute_batch(ops):
+    """
+    Run many operations, reading and writing each file (or shard) involved only once
+    - Results are the same as calling the functions one after the other
+    :param ops: List of (function name, args) tuples, the supported functions being
+        ("add_todo", (msg,)), ("update_todo", (id, new_msg, new_complete)),
+        ("toggle_complete", (id,)) and ("delete_todo", (id,))
+    :return: List of results, one per operation
+    """
+    loaded = {}  # Mapping of path -> _LoadedFile of the files read so far
+    changed = set()  # Paths of the files which need to be written back
+    stamps = {}  # Mapping of path -> _stamp() of the files read, for the filter
+    added, removed = [], []  # Ids added to / removed from the DB
+
+    def file_for(id):
+        path = _path_for_id(id)
+        if path not in loaded:
+            stamps[path] = _stamp(path)
+            loaded[path] = _LoadedFile(
+                _read_todos(path) if os.path.exists(path) else []
+            )
+        return path, loaded[path]
+
+    results = []
+    for name, args in ops:
+        if name == "add_todo":
+            new_id = _next_id(loaded)
+            path, file = file_for(new_id)
+            file.add({"id": new_id, "msg": args[0], "complete": False})
+            changed.add(path)
+            added.append(new_id)
+            results.append(True)
+
+        elif name in ("update_todo", "toggle_complete"):
+            path, file = file_for(args[0])
+            matches = file.by_id.get(args[0])
+            if not matches:
+                results.append(False if name == "update_todo" else None)
+                continue
+
+            if name == "update_todo":
+                _, new_msg, new_complete = args
+            else:
+                new_msg, new_complete = None, not matches[0]["complete"]
+            for todo in matches[:1]:  # Like update_todo(), only the first match
+                if new_msg is not None:
+                    todo["msg"] = new_msg
+                if new_complete is not None:
+                    todo["complete"] = new_complete
+            changed.add(path)
+            results.append(True if name == "update_todo" else new_complete)
+
+        elif name == "delete_todo":
+            path, file = file_for(args[0])
+            removed += [args[0]] * len(file.by_id.get(args[0], ()))
+            deleted = file.remove(args[0])
+            if deleted:
+                changed.add(path)
+            results.append(deleted)
+
+        else:
+            raise ValueError(f"Unsupported batch operation '{name}'")
+
+    if SHARD_SIZE and changed:
+        os.makedirs(_shard_dir(), exist_ok=True)
+    for path in changed:
+        _write_todos(loaded[path].live(), path)
+    if changed:
+        _update_bloom_filter(
+            {path: stamps[path] for path in changed}, added=added, removed=removed
+        )
+
+    return results
+
+
+class _LoadedFile:
+    """
+    Todos of a single file held in memory by execute_batch(), indexed by id
+    """
+
+    def __init__(self, todos):
+        self.todos = todos
+        self.by_id = {}  # Mapping of id -> todos w/ that id (ids may be repeated)
+        self.removed = set()  # id() of the deleted todos, dropped when written
+        for todo in todos:
+            self.by_id.setdefault(todo["id"], []).append(todo)
+
+    def __len__(self):
+        return len(self.todos) - len(self.removed)
+
+    def add(self, todo):
+        self.todos.append(todo)
+        self.by_id.setdefault(todo["id"], []).append(todo)
+
+    def remove(self, todo_id):
+        matches = self.by_id.pop(todo_id, [])
+        self.removed.update(id(todo) for todo in matches)
+        return bool(matches)
+
+    def live(self):
+        return [todo for todo in self.todos if id(todo) not in self.removed]
+
+
+def _might_exist(id: int):
+    """
+    Check the Bloom filter for an id, before reading the file which would hold it
+    (see bloom_filter.might_exist())
+    :param id: ID of the todo
+    :return: False if there is certainly no todo w/ that id, True if there may be
+    """
+    if not BLOOM_FILTER:
+        return True
+
+    path = _path_for_id(id)
+    # Shared, so that no write changes the files while the filter is checked
+    with lock(shared=True):
+        return bloom_filter.might_exist(
+            _bloom_path(), id, {path: _stamp(path)}, _build_bloom_filter
+        )
+
+
+def _update_bloom_filter(stamps, added=(), removed=()):
+    """
+    Count the ids added to / removed from the DB by a write in the Bloom filter
+    (see bloom_filter.update())
+    :param stamps: Mapping of path -> _stamp() of the files written, from before
+        they were written
+    :param added: Ids added to the DB
+    :param removed: Ids removed from the DB, once per todo removed
+    """
+    if not BLOOM_FILTER:
+        return
+    bloom_filter.update(
+        _bloom_path(),
+        stamps,
+        {path: _stamp(path) for path in stamps},
+        added,
+        removed,
+        BLOOM_COUNTERS_PER_ID,
+        _build_bloom_filter,
+    )
+
+
+def _build_bloom_filter():
+    """
+    Build the Bloom filter from every id in the DB, reading every file
+    :return: Open bloom_filter.BloomFilter
+    """
+    files = {
+        path: (_stamp(path), (todo["id"] for todo in _iter_file(path)))
+        for path in _paths()
+        if os.path.exists(path)
+    }
+    return bloom_filter.BloomFilter.build(
+        _bloom_path(), files, BLOOM_COUNTERS_PER_ID, BLOOM_HASHES, BLOOM_MIN_IDS
+    )
+
+
 def _get_todos_count():
     """
     Return the number of todos in the DB
@@ -140,10 +431,181 @@ def _get_todos_count():
     return len(get_todos())
 
 
-def _write_todos(todos):
+def _next_id(loaded=None):
+    """
+    Return the id to assign to the next new todo
+    - Unsharded DBs keep using the number of todos as the next id
+    - Sharded DBs use the highest id of the last non-empty shard + 1,
+      so adding a todo never has to read every shard
+    :param loaded: Mapping of path -> _LoadedFile already in memory
+        (see execute_batch), used instead of reading those files
+    :return: Integer id for the next todo
+    """
+    loaded = loaded or {}
+    if not SHARD_SIZE:
+        if DB_NAME in loaded:
+            return len(loaded[DB_NAME])
+        return _get_todos_count()
+
+    for path in reversed(_paths(extra=loaded)):
+        if path in loaded:
+            ids = loaded[path].by_id.keys()
+        else:
+            ids = [todo["id"] for todo in _read_todos(path)]
+        if ids:
+            return max(ids) + 1
+    return 0
+
+
+def _read_todos(path):
+    """
+    Read every todo stored in a single json file
+    :param path: Path of the json file (DB_NAME or a shard)
+    :return: List of Todo Dictionaries
+    """
+    with _open(path, "r") as file:
+        return json.load(file)
+
+
+def _iter_file(path, chunk_size: int = 64 * 1024):
     """
-    Writes a list of dictionaries into a csv file
+    Lazily yield the todos stored in a single json file
+    - The array is decoded one todo at a time from chunk_size reads, so memory
+      use doesn't grow w/ the size of the file
+    :param path: Path of the json file (DB_NAME or a shard)
+    :param chunk_size: Number of characters read from the file at a time
+    :return: Generator of Todo Dictionaries
+    """
+    decoder = json.JSONDecoder()
+    with _open(path, "r") as file:
+        buffer, pos = "", 0
+        started = False  # Whether the opening bracket of the array was found
+        while True:
+            # Skip whitespace and the commas separating the todos
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+
+            if pos == len(buffer):
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    if started:
+                        raise ValueError(f"Unexpected end of file in {path}")
+                    return
+                buffer, pos = chunk, 0
+                continue
+
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError(f"{path} does not hold a JSON array")
+                started = True
+                pos += 1
+                continue
+
+            if buffer[pos] == "]":
+                return
+
+            try:
+                todo, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The todo is cut off by the end of the buffer, read some more
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+
+            yield todo
+
+
+def _append_todos(todos, path):
+    """
+    Add todos to the end of a json file without rewriting the existing ones
+    - Only the closing bracket of the array is overwritten
+    - Compressed files can't be patched in place, so they are rewritten
+    :param todos: List of Todo Dictionaries
+    :param path: Path of the json file (DB_NAME or a shard)
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        _write_todos(todos, path)
+        return
+
+    if os.path.splitext(path)[1] in COMPRESSION_MODULES:
+        _write_todos(_read_todos(path) + todos, path)
+        return
+
+    with _open(path, "rb+") as file:
+        # Locate the closing bracket, ignoring any trailing whitespace
+        end = file.seek(0, os.SEEK_END)
+        start = file.seek(max(0, end - 4096))
+        tail = file.read().rstrip()
+        if not tail.endswith(b"]"):
+            raise ValueError(f"{path} does not hold a JSON array")
+        closing = start + len(tail) - 1
+        is_empty = tail[:-1].rstrip().endswith(b"[")
+
+        file.seek(closing)
+        separator = "" if is_empty else ", "
+        new_todos = ", ".join(json.dumps(todo) for todo in todos)
+        file.write(f"{separator}{new_todos}]".encode())
+        file.truncate()
+
+
+def _write_todos(todos, path=None):
+    """
+    Writes a list of dictionaries into a json file
     :param todos: Dictionary w/ following headers: "id", "msg", "complete"
+    :param path: File to write to, defaults to DB_NAME
     """
-    with open(DB_NAME, "w") as file:
+    with _open(path or DB_NAME, "w") as file:
         json.dump(todos, file)
+
+
+def _open(path, mode="r", **kwargs):
+    """
+    Open a DB file, transparently (de)compressing it when its extension asks for it
+    - Every DB file is opened through here (see metrics.py)
+    :param path: Path of the file (DB_NAME or a shard)
+    :param mode: Text mode to open the file in ("r", "w" or "a"), or a binary
+        mode for an uncompressed file
+    :return: File object
+    """
+    module = COMPRESSION_MODULES.get(os.path.splitext(path)[1])
+    if module is None:
+        return open(path, mode, **kwargs)
+    # Compressed files are streamed through the (de)compressor in text mode
+    return importlib.import_module(module).open(path, f"{mode}t", **kwargs)
+
+
+def _bloom_path():
+    """
+    Return the path of the Bloom filter of the DB (ex. db.json.bloom)
+    """
+    return f"{DB_NAME}.bloom"
+
+
+# Shared w/ the other file controllers, see file_store.py
+_stamp = file_store.stamp
+_suffixes = file_store.suffixes
+
+
+def _shard_dir():
+    """
+    Return the directory holding the shard files (ex. db.json.d)
+    """
+    return file_store.shard_dir(DB_NAME)
+
+
+def _path_for_id(id: int):
+    """
+    Return the path of the file which holds (or will hold) the todo w/ specified ID
+    :return: DB_NAME, or the shard file covering the id when sharding is enabled
+    """
+    return file_store.path_for_id(DB_NAME, SHARD_SIZE, id)
+
+
+def _paths(extra=()):
+    """
+    Return the paths of every file making up the DB, ordered by id range
+    :param extra: Shard paths to include even if they don't exist on disk yet
+    """
+    return file_store.paths(DB_NAME, SHARD_SIZE, extra)
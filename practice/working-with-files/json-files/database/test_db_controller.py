@@ -1,6 +1,11 @@
 import unittest
+from unittest import mock
 import db_controller as controller
 import os
+import sys
+import threading
+import gzip
+import shutil
 import json
 
 
@@ -26,8 +31,9 @@ class TestDBController(unittest.TestCase):
         - Works just like afterEach in Jest
         """
         # If the db exists (.txt file), remove it
-        if os.path.exists(self.db_name):
-            os.remove(self.db_name)
+        for path in [self.db_name, f"{self.db_name}.bloom"]:
+            if os.path.exists(path):
+                os.remove(path)
 
     def test_create_db_if_not_exists(self):
         # ARRANGE -- Define testing environments & values
@@ -118,6 +124,333 @@ class TestDBController(unittest.TestCase):
         self.assertTrue(deleted)
         self.assertEqual(len(todos), 0)
 
+    def test_execute_batch(self):
+        # ARRANGE -- Define testing environments & values
+        ops = [
+            ("add_todo", ("first",)),
+            ("add_todo", ("second",)),
+            ("update_todo", (1, "first updated", None)),
+            ("toggle_complete", (2,)),
+            ("delete_todo", (0,)),
+            ("delete_todo", (5,)),
+            ("toggle_complete", (5,)),
+        ]
+
+        # ACT -- Run the code that is being tested
+        results = controller.execute_batch(ops)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(results, [True, True, True, True, True, False, None])
+        self.assertEqual(
+            controller.get_todos(),
+            [
+                {"id": 1, "msg": "first updated", "complete": False},
+                {"id": 2, "msg": "second", "complete": True},
+            ],
+        )
+        with self.assertRaises(ValueError):
+            controller.execute_batch([("get_todos", ())])
+
+    def test_iter_todos_streams_in_small_chunks(self):
+        # ARRANGE -- Define testing environments & values
+        controller.insert_todos(
+            [
+                {"id": i, "msg": f"todo {i}", "complete": i % 2 == 0}
+                for i in range(1, 50)
+            ]
+        )
+
+        # ACT -- Decode the file a few characters at a time
+        todos = list(controller._iter_file(self.db_name, chunk_size=7))
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(todos, controller.get_todos())
+        self.assertEqual([todo["id"] for todo in todos], list(range(50)))
+
+    def test_add_todo_parses_the_file_once(self):
+        # ARRANGE -- Define testing environments & values
+        controller.insert_todos([{"id": 1, "msg": "one", "complete": False}])
+
+        # ACT -- Run the code that is being tested
+        with mock.patch.object(controller, "_open", wraps=controller._open) as opened:
+            controller.add_todo("two")
+
+        # ASSERT -- Evaluate result and compare to expected value
+        reads = [call for call in opened.call_args_list if call.args[1:] == ("r",)]
+        self.assertEqual(len(reads), 1)
+        self.assertEqual(controller.get_todo_by_id(2)["msg"], "two")
+
+    def test_insert_todos_appends_to_the_array(self):
+        # ARRANGE -- Start from an empty array
+        with open(self.db_name, "w") as file:
+            json.dump([], file)
+
+        # ACT -- Run the code that is being tested
+        controller.insert_todos([{"id": 5, "msg": "five", "complete": True}])
+        inserted = controller.insert_todos(
+            [{"id": 7, "msg": "seven", "complete": False}]
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(inserted, 1)
+        with open(self.db_name, "r") as file:
+            self.assertEqual(
+                json.load(file),
+                [
+                    {"id": 5, "msg": "five", "complete": True},
+                    {"id": 7, "msg": "seven", "complete": False},
+                ],
+            )
+
+
+class TestShardedDBController(unittest.TestCase):
+    def setUp(self):
+        """
+        - Store every 2 ids in their own shard file under test_db.json.d/
+        """
+        self.db_name = "test_db.json"
+        controller.DB_NAME = self.db_name
+        controller.SHARD_SIZE = 2
+        controller.create_db_if_not_exists()
+
+        for i in range(5):
+            controller.add_todo(f"todo {i}")
+
+    def tearDown(self):
+        controller.SHARD_SIZE = None
+        shutil.rmtree(f"{self.db_name}.d", ignore_errors=True)
+        if os.path.exists(f"{self.db_name}.bloom"):
+            os.remove(f"{self.db_name}.bloom")
+
+    def test_add_todo_creates_shards(self):
+        # ASSERT -- 5 todos w/ 2 ids per shard should span 3 shard files
+        self.assertEqual(
+            sorted(os.listdir(f"{self.db_name}.d")),
+            ["shard-000000.json", "shard-000001.json", "shard-000002.json"],
+        )
+
+    def test_get_todos_streams_shards_in_order(self):
+        # ACT -- Run the code that is being tested
+        todos = controller.get_todos()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual([todo["id"] for todo in todos], [0, 1, 2, 3, 4])
+        self.assertEqual(controller.get_todo_by_id(3)["msg"], "todo 3")
+        self.assertIsNone(controller.get_todo_by_id(10))
+
+    def test_update_and_delete_only_touch_one_shard(self):
+        # ARRANGE -- Remember the modification times of the untouched shards
+        shard_dir = f"{self.db_name}.d"
+        first = os.path.join(shard_dir, "shard-000000.json")
+        last = os.path.join(shard_dir, "shard-000002.json")
+        mtimes = (os.stat(first).st_mtime_ns, os.stat(last).st_mtime_ns)
+
+        # ACT -- Run the code that is being tested
+        updated = controller.update_todo(2, "updated", True)
+        deleted = controller.delete_todo(3)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(updated)
+        self.assertTrue(deleted)
+        self.assertEqual(
+            controller.get_todo_by_id(2), {"id": 2, "msg": "updated", "complete": True}
+        )
+        self.assertIsNone(controller.get_todo_by_id(3))
+        self.assertEqual(
+            (os.stat(first).st_mtime_ns, os.stat(last).st_mtime_ns), mtimes
+        )
+        self.assertFalse(controller.update_todo(10, "Nonexistent Todo"))
+
+    def test_execute_batch_across_shards(self):
+        # ACT -- Run the code that is being tested
+        results = controller.execute_batch(
+            [
+                ("add_todo", ("todo 5",)),
+                ("add_todo", ("todo 6",)),
+                ("toggle_complete", (6,)),
+                ("delete_todo", (0,)),
+            ]
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(results, [True, True, True, True])
+        self.assertEqual(
+            [todo["id"] for todo in controller.get_todos()], [1, 2, 3, 4, 5, 6]
+        )
+        self.assertTrue(controller.get_todo_by_id(6)["complete"])
+        self.assertIn("shard-000003.json", os.listdir(f"{self.db_name}.d"))
+
+
+class TestCompressedDBController(unittest.TestCase):
+    def setUp(self):
+        """
+        - The .gz extension makes the controller gzip the DB file
+        """
+        self.db_name = "test_db.json.gz"
+        controller.DB_NAME = self.db_name
+        controller.create_db_if_not_exists()
+
+        for i in range(3):
+            controller.add_todo(f"todo {i}")
+
+    def tearDown(self):
+        for path in [self.db_name, f"{self.db_name}.bloom"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_db_file_is_gzipped(self):
+        # ACT -- Read the raw file w/ the gzip module
+        with gzip.open(self.db_name, "rt") as file:
+            content = file.read()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertIn("todo 2", content)
+
+    def test_crud_operations_on_compressed_db(self):
+        # ACT -- Run the code that is being tested
+        updated = controller.update_todo(1, "updated", True)
+        deleted = controller.delete_todo(0)
+        inserted = controller.insert_todos(
+            [{"id": 5, "msg": "five", "complete": False}]
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(updated)
+        self.assertTrue(deleted)
+        self.assertEqual(inserted, 1)
+        self.assertEqual(
+            controller.get_todos(),
+            [
+                {"id": 1, "msg": "updated", "complete": True},
+                {"id": 2, "msg": "todo 2", "complete": False},
+                {"id": 5, "msg": "five", "complete": False},
+            ],
+        )
+
+
+class TestBloomFilter(unittest.TestCase):
+    def setUp(self):
+        """
+        - 100 todos, todo 5 deleted, looked up through the Bloom filter
+        """
+        self.db_name = "test_db.json"
+        controller.DB_NAME = self.db_name
+        controller.BLOOM_FILTER = True
+        controller.create_db_if_not_exists()
+        controller.insert_todos(
+            [{"id": i, "msg": f"todo {i}", "complete": False} for i in range(100)]
+        )
+        controller.delete_todo(5)
+
+    def tearDown(self):
+        controller.BLOOM_FILTER = False
+        for path in [self.db_name, f"{self.db_name}.bloom"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_missing_ids_are_not_read_from_the_db(self):
+        # ARRANGE -- Fail on any read of the DB file
+        real_open = open
+
+        def open_except_db(path, *args, **kwargs):
+            self.assertNotEqual(path, self.db_name)
+            return real_open(path, *args, **kwargs)
+
+        # ACT + ASSERT -- The filter answers for the deleted and the unknown ids
+        controller.get_todo_by_id(0)  # Builds the filter
+        with mock.patch.object(controller, "open", open_except_db, create=True):
+            self.assertIsNone(controller.get_todo_by_id(5))
+            self.assertIsNone(controller.get_todo_by_id(1000))
+            self.assertFalse(controller.update_todo(5, "Nonexistent Todo"))
+            self.assertFalse(controller.delete_todo(1000))
+        self.assertEqual(controller.get_todo_by_id(6)["msg"], "todo 6")
+
+    def test_concurrent_first_lookups_build_the_filter_safely(self):
+        # ARRANGE -- Threads all finding no filter, like the async store's reads,
+        # w/ enough todos for the builds to overlap
+        controller.insert_todos(
+            [{"id": i, "msg": "more", "complete": False} for i in range(100, 5000)]
+        )
+        os.remove(f"{self.db_name}.bloom")
+        results, errors = [], []
+
+        def lookup(id):
+            try:
+                results.append(controller.get_todo_by_id(id))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=lookup, args=(i,)) for i in range(20)]
+
+        # Switch threads as often as possible, for them to interleave
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+
+        # ACT -- Run the code that is being tested
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 20)
+        self.assertEqual(
+            [name for name in os.listdir(".") if name.endswith(".tmp")], []
+        )
+
+    def test_lock_excludes_the_other_threads(self):
+        # ARRANGE -- Another thread tries to write while this one holds the lock
+        written = threading.Event()
+        writer = threading.Thread(
+            target=lambda: controller.add_todo("from thread") and written.set()
+        )
+
+        # ACT -- Run the code that is being tested
+        with controller.lock():
+            writer.start()
+            blocked = not written.wait(0.2)
+        writer.join()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(blocked)
+        self.assertTrue(written.is_set())
+
+    def test_filter_is_updated_by_writes_and_grows(self):
+        # ACT -- Run the code that is being tested
+        controller.get_todo_by_id(0)  # Builds the filter, sized for 1024 ids
+        controller.insert_todos(
+            [{"id": i, "msg": "new", "complete": False} for i in range(100, 3000)]
+        )
+        controller.execute_batch([("delete_todo", (7,)), ("add_todo", ("last",))])
+
+        # ASSERT -- Evaluate result and compare to expected value
+        bloom = controller.bloom_filter.BloomFilter.open(controller._bloom_path())
+        self.addCleanup(bloom.close)
+        self.assertEqual(bloom.count, 2999)
+        self.assertGreaterEqual(bloom.size, 3000 * controller.BLOOM_COUNTERS_PER_ID)
+        self.assertIn(2500, bloom)
+        self.assertIsNone(controller.get_todo_by_id(7))
+        self.assertFalse(controller._might_exist(7))
+
+    def test_filter_is_rebuilt_when_the_db_changes_behind_its_back(self):
+        # ARRANGE -- Replace the DB w/o going through the controller
+        controller.get_todo_by_id(0)
+        replaced = controller.get_todos() + [{"id": 5, "msg": "back", "complete": True}]
+        os.remove(self.db_name)
+        controller.BLOOM_FILTER = False
+        try:
+            controller.create_db_if_not_exists()
+            controller.insert_todos(replaced)
+        finally:
+            controller.BLOOM_FILTER = True
+
+        # ACT -- Run the code that is being tested
+        todo = controller.get_todo_by_id(5)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(todo, {"id": 5, "msg": "back", "complete": True})
+
 
 if __name__ == "__main__":
     unittest.main()
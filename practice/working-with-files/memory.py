@@ -0,0 +1,260 @@
+"""
+Memory accounting of the store operations
+
+MemoryTracker wraps a store (like metrics.MeteredStore) and records, w/
+tracemalloc, the peak memory allocated by each call: the highest traced memory
+during the call, minus what was allocated when it started.
+- Budgets cap the peak of an operation (ex. get_todos=50MB), going over one
+  either warns (MemoryBudgetWarning) or raises MemoryBudgetError
+- The budget is checked once the call returned, it can't stop the allocations
+  (a write over its budget has been applied by the time it raises)
+- get_todos() / iter_todos() also count their rows, for a per row figure
+
+tracemalloc makes allocations a few times slower, so tracking is opt-in.
+
+Usage:
+python cli.py --backend json --memory-budget get_todos=50MB --memory-mode fail
+python bench_memory.py --rows 20000
+"""
+
+import tracemalloc
+import warnings
+
+import backends
+
+MODES = ("warn", "fail")
+UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3}
+
+
+class MemoryBudgetWarning(RuntimeWarning):
+    """
+    Warning of an operation going over its memory budget
+    """
+
+
+class MemoryBudgetError(Exception):
+    """
+    Raised by an operation going over its memory budget, in "fail" mode
+    """
+
+
+class OpMemory:
+    """
+    Peak memory of the calls to a single store function
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.peak = 0  # Highest peak of a call, in bytes
+        self.total = 0  # Sum of the peaks, for the mean
+        self.last = 0
+        self.rows = 0  # Rows returned by the call w/ the highest peak
+
+    def record(self, peak: int, rows: int = 0):
+        self.calls += 1
+        self.total += peak
+        self.last = peak
+        if peak >= self.peak:
+            self.peak = peak
+            self.rows = rows
+
+    def to_dict(self) -> dict:
+        stats = {
+            "calls": self.calls,
+            "peak_bytes": self.peak,
+            "mean_peak_bytes": self.total / self.calls if self.calls else 0,
+            "last_peak_bytes": self.last,
+        }
+        if self.rows:
+            stats["rows"] = self.rows
+            stats["bytes_per_row"] = self.peak / self.rows
+        return stats
+
+
+class MemoryTracker:
+    """
+    Exposes the functions of a store, recording the peak memory of each call
+    """
+
+    def __init__(self, store, budgets: dict = None, mode: str = "warn"):
+        """
+        :param store: db_controller module or store to wrap
+        :param budgets: Mapping of function name -> maximum peak, in bytes
+        :param mode: "warn" or "fail", what to do when a call is over budget
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of: {MODES}")
+        unknown = set(budgets or {}) - set(backends.CONTROLLER_API)
+        if unknown:
+            raise ValueError(f"No such operation: {', '.join(sorted(unknown))}")
+
+        self.store = store
+        self.budgets = dict(budgets or {})
+        self.mode = mode
+        self.ops = {name: OpMemory() for name in backends.CONTROLLER_API}
+        # [memory at the start, peak so far] of the calls in progress, a
+        # listing being consumed while other calls run
+        self._measures = []
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def __getattr__(self, name):
+        """
+        Forward attributes to the store, wrapping the db_controller functions
+        """
+        func = getattr(self.store, name)
+        if name not in backends.CONTROLLER_API:
+            return func
+
+        if name == "iter_todos":
+
+            def tracked(*args, **kwargs):
+                return self._iter(func(*args, **kwargs))
+
+        else:
+
+            def tracked(*args, **kwargs):
+                measure = self._start()
+                try:
+                    result = func(*args, **kwargs)
+                finally:
+                    peak = self._stop(measure)
+                rows = len(result) if name == "get_todos" else 0
+                self.ops[name].record(peak, rows)
+                self._check(name, peak)
+                return result
+
+        # Later calls find the wrapper w/o going through __getattr__
+        self.__dict__[name] = tracked
+        return tracked
+
+    def _iter(self, todos):
+        """
+        Yield the todos of iter_todos(), measuring the peak until the last one
+        - What the caller allocates while going through the todos (ex. a page
+          of them) counts too, the listing's memory is only known as a whole
+        """
+        measure = self._start()
+        rows = 0
+        try:
+            for rows, todo in enumerate(todos, start=1):
+                yield todo
+        except GeneratorExit:
+            # Stopped early (ex. after the first page), the peak still counts
+            pass
+        finally:
+            peak = self._stop(measure)
+            self.ops["iter_todos"].record(peak, rows)
+        self._check("iter_todos", peak)
+
+    def _start(self) -> list:
+        current, peak = tracemalloc.get_traced_memory()
+        # tracemalloc has a single peak, keep the one of the calls in progress
+        for measure in self._measures:
+            measure[1] = max(measure[1], peak)
+        tracemalloc.reset_peak()
+        measure = [current, current]
+        self._measures.append(measure)
+        return measure
+
+    def _stop(self, measure: list) -> int:
+        peak = tracemalloc.get_traced_memory()[1]
+        self._measures = [other for other in self._measures if other is not measure]
+        for other in self._measures:
+            other[1] = max(other[1], peak)
+        return max(measure[1], peak) - measure[0]
+
+    def _check(self, name: str, peak: int):
+        budget = self.budgets.get(name)
+        if budget is None or peak <= budget:
+            return
+        message = (
+            f"{name} peaked at {format_size(peak)}, over its "
+            f"{format_size(budget)} budget"
+        )
+        if self.mode == "fail":
+            raise MemoryBudgetError(message)
+        warnings.warn(message, MemoryBudgetWarning, stacklevel=3)
+
+    def peaks(self) -> dict:
+        """
+        Return the peak memory of every function called so far
+        """
+        return {
+            name: stats.to_dict() for name, stats in self.ops.items() if stats.calls
+        }
+
+    def report(self) -> str:
+        """
+        Return the peaks as a table, next to the budgets
+        """
+        return format_peaks(self.peaks(), self.budgets)
+
+    def close(self):
+        """
+        Stop tracing memory allocations
+        """
+        tracemalloc.stop()
+
+
+def parse_size(size: str) -> int:
+    """
+    Parse a size such as "512KB", "1.5MB" or "1024" (bytes)
+    :return: Size in bytes
+    """
+    text = size.strip().upper()
+    for unit in sorted(UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            number = text[: -len(unit)]
+            break
+    else:
+        number, unit = text, "B"
+    try:
+        return int(float(number) * UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid size: {size!r}") from None
+
+
+def parse_budgets(budgets) -> dict:
+    """
+    Parse "operation=size" strings (ex. "get_todos=50MB")
+    :return: Mapping of operation -> budget in bytes
+    """
+    parsed = {}
+    for budget in budgets or []:
+        name, sep, size = budget.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid budget {budget!r}, expected operation=size")
+        parsed[name.strip()] = parse_size(size)
+    return parsed
+
+
+def format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size:.0f} B"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def format_peaks(peaks: dict, budgets: dict = None) -> str:
+    """
+    Format the peaks of MemoryTracker.peaks() as a table, one row per function
+    """
+    budgets = budgets or {}
+    lines = [
+        f"{'operation':<24}{'calls':>8}{'peak':>12}{'mean':>12}{'B/row':>10}"
+        f"{'budget':>12}"
+    ]
+    for name, stats in peaks.items():
+        per_row = stats.get("bytes_per_row")
+        budget = budgets.get(name)
+        lines.append(
+            f"{name:<24}{stats['calls']:>8,}{format_size(stats['peak_bytes']):>12}"
+            f"{format_size(stats['mean_peak_bytes']):>12}"
+            f"{f'{per_row:,.1f}' if per_row is not None else '-':>10}"
+            f"{format_size(budget) if budget else '-':>12}"
+        )
+    if len(lines) == 1:
+        lines.append("No operations yet")
+    return "\n".join(lines)
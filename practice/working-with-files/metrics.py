@@ -0,0 +1,401 @@
+"""
+Per operation metrics of a store
+
+MeteredStore wraps a db_controller module (or any store exposing its
+functions) and keeps, for each function of backends.CONTROLLER_API:
+- the number of calls and of calls which raised
+- a latency histogram w/ power of 2 buckets (in microseconds), from which
+  the p50 / p95 / p99 are estimated
+- the bytes read from / written to the DB files (file backends only), as
+  the OS transfers them: compressed files count their compressed bytes, the
+  processes parsing a big file in parallel (see PARALLEL_THRESHOLD) aren't
+  counted
+
+Everything is kept in memory, recording a call costs a few hundred
+nanoseconds (the number of calls is the sum of the histogram, it isn't counted
+separately). The figures can be shown by the CLI ('s' key) or periodically dumped
+to a JSON file.
+
+Usage:
+python cli.py --backend json --metrics-file metrics.json --metrics-interval 10
+"""
+
+import contextvars
+import importlib
+import io
+import os
+import time
+import types
+
+import backends
+
+# Latency buckets, bucket i counts calls taking < 2**i microseconds (enough
+# buckets for any duration perf_counter_ns() can return, so none is clamped)
+BUCKETS = 64
+DUMP_INTERVAL = 60.0  # Seconds between two dumps of the metrics file
+
+
+class OpStats:
+    """
+    Counters of a single store function
+    """
+
+    __slots__ = (
+        "errors",
+        "total_ns",
+        "max_ns",
+        "buckets",
+        "rows",
+        "bytes_read",
+        "bytes_written",
+    )
+
+    def __init__(self):
+        self.errors = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * BUCKETS
+        self.rows = 0  # Todos yielded, only counted for iter_todos
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    @property
+    def calls(self) -> int:
+        return sum(self.buckets)
+
+    def record(self, elapsed_ns: int):
+        """
+        Record a call
+        :param elapsed_ns: Duration of the call, in nanoseconds
+        """
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.buckets[(elapsed_ns // 1000).bit_length()] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Estimate a latency percentile from the histogram
+        - The upper bound of the bucket holding the percentile is returned,
+          so the estimate is at most 2x the actual latency (and never above max)
+        :param fraction: Percentile as a fraction, ex. 0.99
+        :return: Latency in seconds, 0 if there were no calls
+        """
+        calls = self.calls
+        if not calls:
+            return 0.0
+        rank = fraction * calls
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                break
+        return min(2**bucket * 1000, self.max_ns) / 1e9
+
+    def to_dict(self) -> dict:
+        calls = self.calls
+        stats = {
+            "calls": calls,
+            "errors": self.errors,
+            "total_seconds": self.total_ns / 1e9,
+            "mean_seconds": self.total_ns / calls / 1e9 if calls else 0.0,
+            "p50_seconds": self.percentile(0.5),
+            "p95_seconds": self.percentile(0.95),
+            "p99_seconds": self.percentile(0.99),
+            "max_seconds": self.max_ns / 1e9,
+            # Upper bound of each non-empty bucket (in microseconds) -> calls
+            "histogram_us": {
+                2**bucket: count for bucket, count in enumerate(self.buckets) if count
+            },
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+        if self.rows:
+            stats["rows"] = self.rows
+        return stats
+
+
+class MeteredStore:
+    """
+    Exposes the functions of a store, recording metrics about each call
+    """
+
+    def __init__(self, store):
+        """
+        :param store: db_controller module or store to wrap
+        """
+        self.store = store
+        self.ops = {name: OpStats() for name in backends.CONTROLLER_API}
+        self.started = time.time()
+        # OpStats of the running call, file I/O is counted in it. Each thread (or
+        # asyncio task) has its own, calls running concurrently (ex. in the
+        # async store's threads) count their I/O in their own function
+        self._current = contextvars.ContextVar("current", default=None)
+        self._dump_path = None
+        self._dump_stop = None
+        self._dump_thread = None
+
+        if isinstance(store, types.ModuleType) and hasattr(store, "_open"):
+            # The file controllers open every DB file w/ their _open() helper
+            store._open = self._open
+
+    def __getattr__(self, name):
+        """
+        Forward attributes to the store, wrapping the db_controller functions
+        """
+        func = getattr(self.store, name)
+        if name not in backends.CONTROLLER_API:
+            return func
+
+        stats = self.ops[name]
+        if name == "iter_todos":
+
+            def metered(*args, **kwargs):
+                return self._iter(func(*args, **kwargs), stats, time.perf_counter_ns())
+
+        else:
+
+            def metered(*args, _clock=time.perf_counter_ns, **kwargs):
+                token = self._current.set(stats)
+                start = _clock()
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException:
+                    stats.errors += 1
+                    stats.record(_clock() - start)
+                    raise
+                finally:
+                    self._current.reset(token)
+                stats.record(_clock() - start)
+                return result
+
+        # Later calls find the wrapper w/o going through __getattr__
+        self.__dict__[name] = metered
+        return metered
+
+    def _iter(self, todos, stats: OpStats, start: int):
+        """
+        Yield the todos of iter_todos(), recording the time to the first todo
+        - The time spent by the caller between two todos isn't the store's, so
+          the latency of a listing is the time until its first todo shows up
+        """
+        rows = 0
+        try:
+            for rows, todo in enumerate(todos, start=1):
+                if rows == 1:
+                    stats.record(time.perf_counter_ns() - start)
+                yield todo
+        except Exception:
+            if not rows:
+                stats.errors += 1
+                stats.record(time.perf_counter_ns() - start)
+            raise
+        else:
+            if not rows:
+                stats.record(time.perf_counter_ns() - start)
+        finally:
+            stats.rows += rows
+
+    def _open(
+        self, path, mode="r", buffering=-1, encoding=None, errors=None, newline=None
+    ):
+        """
+        Stand-in for the controller's _open() counting the bytes read / written
+        by the OS
+        - Compressed files are opened like the controller does, w/ the file
+          under the (de)compressor opened here to count what it transfers
+        - Files opened outside of a call are read lazily by iter_todos()
+        """
+        stats = self._current.get() or self.ops["iter_todos"]
+        extension = os.path.splitext(path)[1]
+        module = getattr(self.store, "COMPRESSION_MODULES", {}).get(extension)
+        if module is not None:
+            raw = open(path, f"{mode}b", buffering=0)
+            try:
+                file = importlib.import_module(module).open(
+                    raw, f"{mode}t", encoding=encoding, errors=errors, newline=newline
+                )
+            except BaseException:
+                raw.close()
+                raise
+            return _MeteredFile(file, stats, raw)
+
+        if "+" not in mode and buffering != 0:
+            return _MeteredFile(
+                open(path, mode, buffering, encoding, errors, newline), stats
+            )
+
+        # Files opened for update or unbuffered (ex. binary searched) seek back
+        # and forth, count each read / write
+        raw = _CountingFileIO(path, mode.replace("b", "").replace("t", ""))
+        raw.stats = stats
+        if buffering == 0:
+            return raw
+        buffer = io.BufferedRandom(
+            raw, buffering if buffering > 1 else io.DEFAULT_BUFFER_SIZE
+        )
+        if "b" in mode:
+            return buffer
+        return io.TextIOWrapper(buffer, encoding, errors, newline)
+
+    def snapshot(self) -> dict:
+        """
+        Return the metrics of every function called so far
+        """
+        return {
+            "started": self.started,
+            "uptime_seconds": time.time() - self.started,
+            "ops": {
+                name: stats.to_dict()
+                for name, stats in self.ops.items()
+                if stats.calls or stats.rows
+            },
+        }
+
+    def dump(self, path: str):
+        """
+        Write the snapshot to a JSON file, replacing it atomically
+        """
+        import json
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.snapshot(), file, indent=2)
+        os.replace(tmp_path, path)
+
+    def start_dump(self, path: str, interval: float = DUMP_INTERVAL):
+        """
+        Dump the metrics every interval seconds from a daemon thread
+        - stop_dump() writes the final figures
+        """
+        import threading
+
+        self.stop_dump(final=False)
+        self._dump_stop = threading.Event()
+
+        def run(stop):
+            while not stop.wait(interval):
+                self.dump(path)
+
+        self._dump_thread = threading.Thread(
+            target=run, args=(self._dump_stop,), name="metrics-dump", daemon=True
+        )
+        self._dump_path = path
+        self._dump_thread.start()
+
+    def stop_dump(self, final: bool = True):
+        """
+        Stop the periodic dump, writing the metrics one last time if final
+        """
+        if self._dump_thread is None:
+            return
+        self._dump_stop.set()
+        self._dump_thread.join()
+        self._dump_thread = None
+        if final:
+            self.dump(self._dump_path)
+
+
+class _MeteredFile:
+    """
+    Open file adding the bytes it read / wrote to an OpStats once closed
+    - The controllers use their files as context managers, entering hands out
+      the file itself, so reading it line by line is as fast as w/o metrics
+    - The DB files are read or written sequentially, so the bytes transferred
+      are the distance between the start and the position at closing time
+    """
+
+    __slots__ = ("file", "stats", "raw", "compressed", "start")
+
+    def __init__(self, file, stats: OpStats, raw=None):
+        """
+        :param raw: FileIO under a (de)compressor, closed after it
+        """
+        self.file = file
+        self.stats = stats
+        self.compressed = raw is not None
+        if raw is None:
+            # FileIO under the text / buffered layers
+            buffer = getattr(file, "buffer", file)
+            raw = getattr(buffer, "raw", buffer)
+        self.raw = raw
+        # Appending starts at the end of the file
+        self.start = raw.tell() if "a" in raw.mode else 0
+
+    def __enter__(self):
+        return self.file
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def close(self):
+        if not self.raw.closed:
+            if self.raw.readable():
+                self.stats.bytes_read += self.raw.tell() - self.start
+            else:
+                # Written bytes only reach the raw file once flushed (once the
+                # compressed stream is closed, for a compressed file)
+                if self.compressed:
+                    self.file.close()
+                else:
+                    self.file.flush()
+                self.stats.bytes_written += self.raw.tell() - self.start
+        self.file.close()
+        self.raw.close()
+
+
+class _CountingFileIO(io.FileIO):
+    """
+    Raw file adding each read / write to an OpStats
+    """
+
+    stats: OpStats
+
+    def readinto(self, buffer):
+        count = super().readinto(buffer)
+        if count:
+            self.stats.bytes_read += count
+        return count
+
+    def read(self, size=-1):
+        data = super().read(size)
+        if data:
+            self.stats.bytes_read += len(data)
+        return data
+
+    def readall(self):
+        data = super().readall()
+        self.stats.bytes_read += len(data)
+        return data
+
+    def write(self, data):
+        count = super().write(data)
+        if count:
+            self.stats.bytes_written += count
+        return count
+
+
+def format_stats(snapshot: dict) -> str:
+    """
+    Format a snapshot as a table, one row per function
+    """
+    lines = [
+        f"{'operation':<24}{'calls':>8}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}{'max ms':>9}{'read KB':>10}{'written KB':>12}"
+    ]
+    for name, stats in snapshot["ops"].items():
+        lines.append(
+            f"{name:<24}{stats['calls']:>8,}{stats['errors']:>8,}"
+            f"{stats['p50_seconds'] * 1000:>9.2f}{stats['p95_seconds'] * 1000:>9.2f}"
+            f"{stats['p99_seconds'] * 1000:>9.2f}{stats['max_seconds'] * 1000:>9.2f}"
+            f"{stats['bytes_read'] / 1024:>10,.1f}{stats['bytes_written'] / 1024:>12,.1f}"
+        )
+    if len(lines) == 1:
+        lines.append("No operations yet")
+    return "\n".join(lines)
@@ -0,0 +1,94 @@
+"""
+Stream every Todo from one backend into another
+
+- Todos are read lazily w/ iter_todos() and written w/ insert_todos() in
+  batches, so memory use is bounded by the batch size, not the store size
+- Todo ids are preserved
+- Progress and throughput (rows/sec) are reported while migrating
+
+Usage:
+python migrate.py --from csv --to sqlite
+python migrate.py --from json --from-db big.json --to txt --to-db big.txt --batch-size 50000
+"""
+
+import argparse
+import sys
+import time
+
+import backends
+
+BATCH_SIZE = 10_000  # Todos written per insert_todos() call
+
+
+def migrate(source, target, batch_size: int = BATCH_SIZE, on_progress=None):
+    """
+    Stream every todo from one store into another, batch_size todos at a time
+    :param source: db_controller module (or store) to read the todos from
+    :param target: db_controller module (or store) to write the todos to
+    :param batch_size: Number of todos held in memory and written at once
+    :param on_progress: Optional callback invoked after each batch w/
+        (rows migrated so far, seconds elapsed)
+    :return: Number of todos migrated
+    """
+    start = time.perf_counter()
+    migrated = 0
+    batch = []
+
+    def flush():
+        nonlocal migrated, batch
+        migrated += target.insert_todos(batch)
+        batch = []
+        if on_progress:
+            on_progress(migrated, time.perf_counter() - start)
+
+    for todo in source.iter_todos():
+        batch.append(todo)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy every todo between backends")
+    parser.add_argument(
+        "--from", dest="source", choices=backends.BACKENDS, required=True
+    )
+    parser.add_argument("--to", dest="target", choices=backends.BACKENDS, required=True)
+    parser.add_argument("--from-db", help="DB file to read, defaults to the backend's")
+    parser.add_argument("--to-db", help="DB file to write, defaults to the backend's")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--append",
+        action="store_true",
+        help="Allow migrating into a store which already holds todos",
+    )
+    args = parser.parse_args()
+
+    source = backends.load_backend(args.source, args.from_db)
+    target = backends.load_backend(args.target, args.to_db)
+    if source.DB_NAME == target.DB_NAME:
+        sys.exit("Source and target are the same DB")
+
+    target.create_db_if_not_exists()
+    if not args.append and next(iter(target.iter_todos()), None) is not None:
+        sys.exit(f"{target.DB_NAME} already holds todos, use --append to add to it")
+
+    def report(rows, elapsed):
+        print(f"\r{rows:,} todos migrated ({rows / elapsed:,.0f} rows/sec)", end="")
+
+    start = time.perf_counter()
+    migrated = migrate(source, target, args.batch_size, on_progress=report)
+    elapsed = time.perf_counter() - start
+
+    rate = migrated / elapsed if elapsed else 0
+    print(
+        f"\rMigrated {migrated:,} todos from {source.DB_NAME} to {target.DB_NAME} "
+        f"in {elapsed:.2f}s ({rate:,.0f} rows/sec)"
+    )
+
+
+if __name__ == "__main__":
+    main()
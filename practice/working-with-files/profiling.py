@@ -0,0 +1,142 @@
+"""
+Profiling of the CLI commands
+
+With --profile, each command the CLI dispatches (an interactive option, or the
+whole --list / --batch run) runs under cProfile, and for each one:
+- <n>-<command>.prof is written, to explore w/ pstats or snakeviz
+- <n>-<command>.collapsed holds its stacks in the collapsed format read by
+  flamegraph tools (flamegraph.pl, speedscope, inferno), weighted in microseconds
+The functions w/ the most own time across all commands are printed on exit.
+
+Usage:
+python cli.py --backend json --profile --profile-dir profiles
+flamegraph.pl profiles/001-batch.collapsed > batch.svg
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+
+PROFILE_DIR = "profiles"
+TOP_FUNCTIONS = 15  # Hot functions printed on exit
+
+
+class CommandProfiler:
+    """
+    Runs commands under cProfile, saving a profile of each
+    """
+
+    def __init__(self, directory: str = None, top: int = TOP_FUNCTIONS):
+        """
+        :param directory: Directory the profiles are written to
+        :param top: Number of hot functions printed by report()
+        """
+        self.directory = directory or PROFILE_DIR
+        self.top = top
+        self.commands = 0
+        self._first_number = None  # Number of the first profile written
+        self.stats = None  # pstats.Stats of every command profiled so far
+
+    def run(self, command: str, func, *args, **kwargs):
+        """
+        Call func under cProfile and save its profile, even if it raises
+        :param command: Name of the command, used in the file names
+        :return: What func returned
+        """
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            self._save(command, profiler)
+
+    def _save(self, command: str, profiler):
+        if self._first_number is None:
+            # Number after the profiles of earlier runs, instead of overwriting them
+            os.makedirs(self.directory, exist_ok=True)
+            self._first_number = 1 + sum(
+                name.endswith(".prof") for name in os.listdir(self.directory)
+            )
+        number = self._first_number + self.commands
+        self.commands += 1
+        base = os.path.join(self.directory, f"{number:03d}-{command}")
+
+        profiler.dump_stats(f"{base}.prof")
+        stats = pstats.Stats(profiler)
+        with open(f"{base}.collapsed", "w") as file:
+            file.writelines(
+                f"{stack} {weight}\n" for stack, weight in collapse(stats.stats).items()
+            )
+
+        if self.stats is None:
+            self.stats = stats
+        else:
+            self.stats.add(stats)
+
+    def report(self, file=None):
+        """
+        Print the functions w/ the most own time across the profiled commands
+        :param file: Text stream to write to, defaults to sys.stdout
+        """
+        file = file or sys.stdout
+        if self.stats is None:
+            return
+        hot = sorted(self.stats.stats.items(), key=lambda item: -item[1][2])
+        lines = [
+            f"\nHot functions of {self.commands} profiled command(s), "
+            f"profiles in {self.directory}/:",
+            f"{'own ms':>10}{'cumul ms':>10}{'calls':>10}  function",
+        ]
+        for func, (_, calls, own, cumulative, _) in hot[: self.top]:
+            lines.append(
+                f"{own * 1000:>10.2f}{cumulative * 1000:>10.2f}{calls:>10,}  "
+                f"{label(func)}"
+            )
+        file.write("\n".join(lines) + "\n")
+
+
+def collapse(stats: dict) -> dict:
+    """
+    Expand a cProfile call graph into collapsed stacks
+    - cProfile only records caller -> callee pairs, not whole stacks, so the
+      time of a function reached through several paths is split between them
+      in proportion to the time of each call pair
+    - Recursion is cut where a function already is on the stack
+    :param stats: pstats.Stats().stats, mapping of function ->
+        (primitive calls, calls, own time, cumulative time, callers)
+    :return: Mapping of "root;...;function" -> own time in microseconds
+    """
+    children = {}  # Mapping of caller -> {callee: cumulative time of the pair}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, pair in callers.items():
+            children.setdefault(caller, {})[func] = pair[3]
+
+    stacks = {}
+
+    def visit(func, path, cumulative, on_path):
+        own, total = stats[func][2], stats[func][3]
+        # Share of the function's time spent along this path
+        share = min(cumulative / total, 1) if total else 0
+        path = f"{path};{label(func)}" if path else label(func)
+        weight = round(own * share * 1e6)
+        if weight:
+            stacks[path] = stacks.get(path, 0) + weight
+        for child, pair_cumulative in children.get(func, {}).items():
+            if child not in on_path and pair_cumulative * share * 1e6 >= 1:
+                visit(child, path, pair_cumulative * share, on_path | {child})
+
+    for func, (_, _, _, total, callers) in stats.items():
+        if not set(callers) - {func}:
+            visit(func, "", total, {func})
+    return stacks
+
+
+def label(func) -> str:
+    """
+    Name of a function in the profiles, ex. "add_todo (db_controller.py:74)"
+    :param func: (file, line, name) key of pstats
+    """
+    file, line, name = func
+    if file == "~":  # Built-in function
+        return name
+    return f"{name} ({os.path.basename(file)}:{line})"
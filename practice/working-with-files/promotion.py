@@ -0,0 +1,270 @@
+"""
+Automatic promotion of a file backed store to SQLite
+
+File backends (txt / csv / json) are simple, but most operations rewrite the
+whole file, so they slow down as the store grows. PromotingStore watches the
+row count and the latency of each operation, and once either goes past its
+threshold it migrates every todo into SQLite and transparently switches over.
+
+- The old store is left untouched, as a rollback point
+- The switch is recorded in a state file, so later runs open SQLite directly
+
+Usage:
+python promotion.py --backend json --max-rows 100000 --max-latency 0.5
+python promotion.py --rollback
+"""
+
+import argparse
+import json
+import os
+import time
+
+import backends
+import cli
+import migrate
+
+STATE_PATH = cli.PROMOTION_STATE  # Also read by the CLI, to open the promoted store
+TARGET_DB = "data.db"
+
+# Default thresholds
+MAX_ROWS = 100_000
+MAX_LATENCY = 0.5  # Seconds
+LATENCY_STRIKES = 3  # Consecutive slow operations needed to promote
+
+
+class PromotingStore:
+    """
+    Exposes the db_controller functions, promoting the store to SQLite when needed
+    """
+
+    def __init__(
+        self,
+        backend: str,
+        db_name: str = None,
+        max_rows: int = MAX_ROWS,
+        max_latency: float = MAX_LATENCY,
+        state_path: str = STATE_PATH,
+        target_db: str = TARGET_DB,
+    ):
+        """
+        :param backend: Name of the backend the store starts on
+        :param db_name: DB file of the store, defaults to the backend's own
+        :param max_rows: Promote once the store holds this many todos
+        :param max_latency: Promote once LATENCY_STRIKES consecutive operations
+            take longer than this (in seconds)
+        :param state_path: File recording a completed promotion
+        :param target_db: SQLite file the store is promoted into
+        """
+        self.max_rows = max_rows
+        self.max_latency = max_latency
+        self.state_path = state_path
+        self.target_db = target_db
+        self._slow_ops = 0
+        self._promotion_failed = False  # Stop trying once the target was refused
+
+        # An earlier run may already have promoted the store
+        self.backend, self.store = open_store(backend, db_name, state_path)
+        self.store.create_db_if_not_exists()
+        self.row_count = None if self.promoted else _count(self.store)
+
+    @property
+    def promoted(self):
+        return self.backend == "sqlite"
+
+    def __getattr__(self, name):
+        """
+        Forward the db_controller functions to the current store, timing each call
+        - Other attributes (DB_NAME, ...) are the current store's
+        """
+        if name == "store":
+            raise AttributeError(name)  # Not set yet, don't recurse
+        if name not in backends.CONTROLLER_API:
+            return getattr(self.store, name)
+
+        func = getattr(self.store, name)
+        if self.promoted or name == "iter_todos":
+            return func
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            self._record(name, time.perf_counter() - start, result, args)
+            return result
+
+        return timed
+
+    def promote(self):
+        """
+        Migrate every todo into SQLite and switch over to it
+        - Like migrate.py, refuses a target which already holds todos (ex. the
+          user's own SQLite store, or the target of a rolled back promotion),
+          the migration would mix them w/ the store's
+        :return: Number of todos migrated
+        :raises ValueError: If the target holds todos
+        """
+        target = backends.load_backend("sqlite", self.target_db)
+        target.create_db_if_not_exists()
+        if next(iter(target.iter_todos()), None) is not None:
+            raise ValueError(
+                f"Can't promote {self.store.DB_NAME}: {self.target_db} already holds "
+                "todos, remove it (or pick another target) first"
+            )
+        migrated = migrate.migrate(self.store, target)
+
+        write_state(
+            self.state_path,
+            {
+                "backend": "sqlite",
+                "db_name": self.target_db,
+                "previous": {
+                    "backend": self.backend,
+                    "db_name": self.store.DB_NAME,
+                    "shard_size": getattr(self.store, "SHARD_SIZE", None),
+                },
+                "promoted_at": time.time(),
+                "rows": migrated,
+            },
+        )
+        print(
+            f"Promoted {migrated} todos from {self.store.DB_NAME} to {self.target_db}"
+        )
+
+        self.backend = "sqlite"
+        self.store = target
+        return migrated
+
+    def _record(self, name: str, elapsed: float, result, args: tuple = ()):
+        """
+        Update the row count / latency figures and promote if a threshold is reached
+        """
+        if name == "add_todo" and result:
+            self.row_count += 1
+        elif name == "insert_todos":
+            self.row_count += result
+        elif name == "delete_todo" and result:
+            self.row_count -= 1
+        elif name == "execute_batch":
+            for (op, _), op_result in zip(args[0], result):
+                if op == "add_todo" and op_result:
+                    self.row_count += 1
+                elif op == "delete_todo" and op_result:
+                    self.row_count -= 1
+
+        self._slow_ops = self._slow_ops + 1 if elapsed > self.max_latency else 0
+
+        if self._promotion_failed:
+            return
+        if self.row_count >= self.max_rows or self._slow_ops >= LATENCY_STRIKES:
+            try:
+                self.promote()
+            except ValueError as e:
+                # Keep serving the file store rather than failing the write
+                print(e)
+                self._promotion_failed = True
+
+
+def open_store(backend: str, db_name: str = None, state_path: str = STATE_PATH):
+    """
+    Load a store, or the SQLite store it was promoted to
+    - The state file only applies to the store it promoted, another store
+      (ex. another --db) is loaded as is
+    :param backend: Name of the backend of the store
+    :param db_name: DB file of the store, defaults to the backend's own
+    :param state_path: File recording a completed promotion
+    :return: (name of the backend, db_controller module) tuple
+    """
+    store = backends.load_backend(backend, db_name)
+    state = read_state(state_path)
+    if state and state["previous"]["backend"] == backend:
+        if state["previous"]["db_name"] == store.DB_NAME:
+            return "sqlite", backends.load_backend("sqlite", state["db_name"])
+    return backend, store
+
+
+def rollback(state_path: str = STATE_PATH, copy_back: bool = False):
+    """
+    Switch back to the store used before the promotion
+    :param state_path: File recording the promotion
+    :param copy_back: Also copy the todos from SQLite back into the old store,
+        otherwise changes made after the promotion are not kept
+    :return: The state of the rolled back promotion, None if there was none
+    """
+    state = read_state(state_path)
+    if state is None:
+        return None
+
+    if copy_back:
+        previous = backends.load_backend(
+            state["previous"]["backend"], state["previous"]["db_name"]
+        )
+        previous.SHARD_SIZE = state["previous"].get("shard_size")
+        # Start from an empty store, the SQLite store holds every todo: remove
+        # every file of it (each shard) and its Bloom filter
+        for path in previous._paths() + [f"{previous.DB_NAME}.bloom"]:
+            if os.path.exists(path):
+                os.remove(path)
+        previous.create_db_if_not_exists()
+        migrate.migrate(backends.load_backend("sqlite", state["db_name"]), previous)
+
+    os.remove(state_path)
+    return state
+
+
+def read_state(state_path: str = STATE_PATH):
+    """
+    Return the recorded promotion state, None if the store was never promoted
+    """
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, "r") as file:
+        return json.load(file)
+
+
+def write_state(state_path: str, state: dict):
+    with open(state_path, "w") as file:
+        json.dump(state, file, indent=2)
+
+
+def _count(store):
+    return sum(1 for _ in store.iter_todos())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the todo CLI, promoting the store to SQLite once it outgrows its format"
+    )
+    parser.add_argument("--backend", choices=["txt", "csv", "json"], default="json")
+    parser.add_argument("--db", help="DB file of the store")
+    parser.add_argument("--max-rows", type=int, default=MAX_ROWS)
+    parser.add_argument("--max-latency", type=float, default=MAX_LATENCY)
+    parser.add_argument("--target-db", default=TARGET_DB)
+    parser.add_argument(
+        "--rollback", action="store_true", help="Switch back to the original store"
+    )
+    parser.add_argument(
+        "--copy-back",
+        action="store_true",
+        help="With --rollback, copy the SQLite todos back into the original store",
+    )
+    args = parser.parse_args()
+
+    if args.rollback:
+        state = rollback(copy_back=args.copy_back)
+        if state is None:
+            print("Store was never promoted, nothing to roll back")
+        else:
+            print(f"Rolled back to {state['previous']['db_name']}")
+        return
+
+    # The CLI wraps its store in a PromotingStore w/ these thresholds
+    argv = ["--backend", args.backend] + (["--db", args.db] if args.db else [])
+    cli.main(
+        argv
+        + ["--promote-max-rows", str(args.max_rows)]
+        + ["--promote-max-latency", str(args.max_latency)]
+        + ["--promote-to", args.target_db]
+    )
+
+
+if __name__ == "__main__":
+    main()
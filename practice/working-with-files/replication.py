@@ -0,0 +1,417 @@
+"""
+Primary / replica replication of the Todo stores, w/o a database server
+
+The primary is any store whose writes go through a changelog.LoggedStore (ex.
+the CLI run w/ --change-log), its change log is the stream of the mutations.
+Replicas are read-only stores (any backend) which apply that stream
+asynchronously, getting it either:
+- from a shared directory, by tailing the change log file itself
+- over a socket (unix:<path> or tcp:<host>:<port>), from `replication.py serve`
+  streaming the log to each replica from the seq it asks for
+A replica records the seq it applied in <DB_NAME>.seq, and resumes from it
+after a restart or a lost connection.
+
+Each replica reports how far behind it is (the seconds between a change being
+logged and applied) and its apply throughput (changes/sec). ReplicatedStore
+sends the reads to the replicas, and the writes to the primary.
+
+Usage:
+python cli.py --backend json --change-log shared/todos.changes
+python replication.py replica --backend sqlite --db replica.db --from shared/todos.changes
+python replication.py serve --log shared/todos.changes --listen tcp:0.0.0.0:7070
+python replication.py replica --backend txt --db replica.txt --from tcp:primary:7070
+python cli.py --backend json --change-log shared/todos.changes --read-replica sqlite:replica.db
+"""
+
+import argparse
+import itertools
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+import backends
+import changelog
+
+POLL_INTERVAL = 0.1  # Seconds between two checks of the log for new changes
+READ_SIZE = 64 * 1024  # Bytes of the log read (or received) at once
+RECONNECT_DELAY = 1.0  # Seconds before a replica reconnects to the primary
+REPORT_INTERVAL = 5.0  # Seconds between two status lines of a replica
+READS = ("get_todos", "iter_todos", "get_todo_by_id")  # Functions of the replicas
+
+
+class Replica:
+    """
+    Keeps a store in sync w/ the change log of a primary
+    """
+
+    def __init__(self, store, source: str, poll_interval: float = POLL_INTERVAL):
+        """
+        :param store: db_controller module (or store) the changes are applied to
+        :param source: Path of the primary's change log (shared directory), or
+            address of its `replication.py serve` (unix:<path>, tcp:<host>:<port>)
+        :param poll_interval: Seconds between two checks for new changes
+        """
+        self.store = store
+        self.source = source
+        self.poll_interval = poll_interval
+        self.seq = changelog.load_seq(store)  # Last change applied
+        self.applied = 0  # Changes applied since the replica started
+        self.apply_time = 0.0  # Seconds spent applying them
+        self.lag = 0.0  # Seconds the last change applied waited for it
+        self.started = time.monotonic()
+        self.stop_event = threading.Event()
+
+    def run(self, on_report=None, report_interval: float = REPORT_INTERVAL):
+        """
+        Apply the changes of the primary as they come, until stop() is called
+        - A lost connection to the primary is retried every RECONNECT_DELAY
+        :param on_report: Optional callback invoked w/ status() every
+            report_interval seconds
+        """
+        next_report = time.monotonic() + report_interval
+        while not self.stop_event.is_set():
+            stream = self._stream()
+            try:
+                for lines in stream:
+                    if lines:
+                        self.apply(lines)
+                    else:
+                        self.lag = 0.0  # Caught up
+                    if on_report and time.monotonic() >= next_report:
+                        on_report(self.status())
+                        next_report = time.monotonic() + report_interval
+                    if self.stop_event.is_set():
+                        break
+            except OSError:
+                self.stop_event.wait(RECONNECT_DELAY)
+            finally:
+                stream.close()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def apply(self, lines) -> int:
+        """
+        Apply changes received from the primary
+        :param lines: Lines of the change log (bytes), in seq order
+        :return: Number of changes applied
+        """
+        start = time.perf_counter()
+        # Changes sent again after a reconnection are already applied
+        changes = [json.loads(line) for line in lines]
+        changes = [change for change in changes if change["seq"] > self.seq]
+
+        def save(seq, applied):
+            # Recorded after each batch, so when a change fails to apply (see
+            # changelog.apply_changes()) the next run resumes right before it
+            changelog.save_seq(self.store, seq)
+            self.seq = seq
+
+        last_seq, applied = changelog.apply_changes(
+            self.store, changes, on_progress=save
+        )
+        if last_seq is None:
+            return 0
+
+        self.applied += applied
+        self.apply_time += time.perf_counter() - start
+        self.lag = max(time.time() - changes[-1].get("ts", time.time()), 0.0)
+        return applied
+
+    def status(self) -> dict:
+        """
+        Return the progress of the replica
+        """
+        return {
+            "seq": self.seq,
+            "applied": self.applied,
+            "lag_seconds": self.lag,
+            # Rate while applying, and averaged over the replica's uptime
+            "apply_rate": self.applied / self.apply_time if self.apply_time else 0,
+            "rate": self.applied / (time.monotonic() - self.started),
+        }
+
+    def _stream(self):
+        """
+        Yield batches of lines from the source, an empty batch when idle
+        """
+        address = parse_address(self.source)
+        if address is None:
+            return tail_log(self.source, self.seq, self.poll_interval, self.stop_event)
+        return receive_changes(address, self.seq, self.poll_interval)
+
+
+class ReplicatedStore:
+    """
+    Exposes the db_controller functions, sending the reads to replicas
+    """
+
+    def __init__(self, primary, replicas, max_lag: int = None):
+        """
+        :param primary: db_controller module (or store) taking the writes
+        :param replicas: db_controller modules (or stores) kept in sync w/ the
+            primary (see Replica), used in turn for the reads
+        :param max_lag: Number of changes a replica may be behind the primary
+            (a changelog.LoggedStore) to be read from, None for no limit
+        """
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self._next_replica = itertools.cycle(self.replicas)
+
+    def __getattr__(self, name):
+        if name not in READS or not self.replicas:
+            return getattr(self.primary, name)
+
+        def read(*args, **kwargs):
+            store = self._pick()
+            if name == "iter_todos":
+                return _locked_iter(store, store.iter_todos(*args, **kwargs))
+            with _read_lock(store):
+                return getattr(store, name)(*args, **kwargs)
+
+        # Later calls find the wrapper w/o going through __getattr__
+        self.__dict__[name] = read
+        return read
+
+    def _pick(self):
+        """
+        Return the next replica, or the primary when the replica is too far behind
+        """
+        replica = next(self._next_replica)
+        if self.max_lag is not None and hasattr(self.primary, "log"):
+            behind = self.primary.log.seq - changelog.load_seq(replica)
+            if behind > self.max_lag:
+                return self.primary
+        return replica
+
+
+def serve(log_path: str, listen: str, poll_interval: float = POLL_INTERVAL):
+    """
+    Create a server streaming a change log over a socket
+    - A replica sends the seq it applied, followed by a newline, then receives
+      the changes logged after it, and the new ones as they are logged
+    :param log_path: Change log of the primary
+    :param listen: Address to listen on, unix:<path> or tcp:<host>:<port>
+    :return: socketserver server, to run w/ serve_forever() and stop w/ shutdown()
+    """
+    address = parse_address(listen)
+    if address is None:
+        raise ValueError(f"Invalid address {listen!r}, expected unix: or tcp:")
+    family, address = address
+    if family == socket.AF_UNIX:
+        server_class = _UnixLogServer
+        if os.path.exists(address):
+            os.remove(address)  # Left over by a previous server
+    else:
+        server_class = _TCPLogServer
+    server = server_class(address, _LogHandler)
+    server.log_path = log_path
+    server.poll_interval = poll_interval
+    return server
+
+
+def tail_log(path: str, since: int = 0, poll_interval=POLL_INTERVAL, stop=None):
+    """
+    Follow a change log, like tail -f
+    :param path: Change log, waited for if it doesn't exist yet
+    :param since: seq of the last change already applied
+    :param stop: Optional threading.Event ending the generator once set
+    :return: Generator of lists of complete lines (bytes) logged after since,
+        an empty list each time there is nothing new
+    """
+    stop = stop or threading.Event()
+    while not os.path.exists(path):
+        if stop.wait(poll_interval):
+            return
+
+    with open(path, "rb") as file:
+        file.seek(changelog.offset_after(file, since) if since else 0)
+        pending = b""
+        while not stop.is_set():
+            data = file.read(READ_SIZE)
+            if not data:
+                yield []
+                stop.wait(poll_interval)
+                continue
+            # A line still being written is kept for the next read
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            if lines:
+                yield [line + b"\n" for line in lines]
+
+
+def receive_changes(address: tuple, since: int, poll_interval: float = POLL_INTERVAL):
+    """
+    Connect to a log server (see serve()) and yield the changes it streams
+    :param address: (socket family, address), see parse_address()
+    :param since: seq of the last change already applied
+    :return: Generator of lists of lines (bytes), an empty list each time
+        nothing came for poll_interval seconds
+    """
+    family, address = address
+    with socket.socket(family, socket.SOCK_STREAM) as connection:
+        connection.connect(address)
+        connection.sendall(f"{since}\n".encode())
+        connection.settimeout(poll_interval)
+        pending = b""
+        while True:
+            try:
+                data = connection.recv(READ_SIZE)
+            except socket.timeout:
+                yield []
+                continue
+            if not data:
+                raise ConnectionResetError("The primary closed the connection")
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            if lines:
+                yield [line + b"\n" for line in lines]
+
+
+def parse_address(address: str):
+    """
+    Parse unix:<path> or tcp:<host>:<port>
+    :return: (socket family, address) or None for a plain path
+    """
+    kind, _, rest = address.partition(":")
+    if kind == "unix":
+        return socket.AF_UNIX, rest
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return None
+
+
+def parse_replica(replica: str):
+    """
+    Load the store of a "backend:db" replica (ex. "sqlite:replica.db")
+    """
+    name, sep, db_name = replica.partition(":")
+    if not sep or name not in backends.BACKENDS:
+        raise ValueError(f"Invalid replica {replica!r}, expected backend:db")
+    return backends.load_backend(name, db_name)
+
+
+def format_status(status: dict) -> str:
+    return (
+        f"seq {status['seq']:,}, lag {status['lag_seconds']:.3f}s, "
+        f"{status['applied']:,} changes applied ({status['apply_rate']:,.0f}/sec "
+        f"while applying, {status['rate']:,.1f}/sec overall)"
+    )
+
+
+class _LogHandler(socketserver.StreamRequestHandler):
+    """
+    Streams the change log to a replica, from the seq it sent
+    """
+
+    def handle(self):
+        since = int(self.rfile.readline())
+        changes = tail_log(
+            self.server.log_path, since, self.server.poll_interval, self.server.stopping
+        )
+        try:
+            for lines in changes:
+                if lines:
+                    self.wfile.write(b"".join(lines))
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The replica went away, it resumes from its seq
+
+
+class _LogServerMixin:
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stopping = threading.Event()
+
+    def shutdown(self):
+        # The streams to the replicas never end by themselves
+        self.stopping.set()
+        super().shutdown()
+
+
+class _UnixLogServer(_LogServerMixin, socketserver.ThreadingUnixStreamServer):
+    pass
+
+
+class _TCPLogServer(_LogServerMixin, socketserver.ThreadingTCPServer):
+    pass
+
+
+class _read_lock:
+    """
+    Hold the shared lock of a file store (see lock() of the controllers), so
+    a read never sees a file the replica is rewriting
+    """
+
+    def __init__(self, store):
+        self.lock = store.lock(shared=True) if hasattr(store, "lock") else None
+
+    def __enter__(self):
+        if self.lock is not None:
+            self.lock.__enter__()
+
+    def __exit__(self, *exc_info):
+        if self.lock is not None:
+            self.lock.__exit__(*exc_info)
+
+
+def _locked_iter(store, todos):
+    with _read_lock(store):
+        yield from todos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replicate a store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Stream a change log")
+    serve_parser.add_argument("--log", required=True, help="Change log to stream")
+    serve_parser.add_argument(
+        "--listen", required=True, help="unix:<path> or tcp:<host>:<port>"
+    )
+
+    replica_parser = commands.add_parser("replica", help="Run a replica")
+    replica_parser.add_argument("--backend", choices=backends.BACKENDS, required=True)
+    replica_parser.add_argument("--db", help="DB file, defaults to the backend's")
+    replica_parser.add_argument(
+        "--from",
+        dest="source",
+        required=True,
+        help="Change log of the primary, or unix:<path> / tcp:<host>:<port>",
+    )
+    replica_parser.add_argument(
+        "--report-interval", type=float, default=REPORT_INTERVAL
+    )
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = serve(args.log, args.listen)
+        print(f"Streaming {args.log} on {args.listen}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    store = backends.load_backend(args.backend, args.db)
+    store.create_db_if_not_exists()
+    replica = Replica(store, args.source)
+    print(f"Replicating {args.source} into {store.DB_NAME} from seq {replica.seq:,}")
+    try:
+        replica.run(lambda status: print(format_status(status)), args.report_interval)
+    except KeyboardInterrupt:
+        pass
+    print(format_status(replica.status()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+"""
+Local HTTP/1.1 server exposing a todo store (stdlib only)
+
+A single process keeps the store loaded (and recently read todos cached), so
+many local clients can share it instead of each re-opening the DB files.
+- Connections are kept alive between requests
+- Bodies are JSON, the listing is streamed w/ chunked transfer encoding
+
+Routes:
+GET    /todos              -> list every todo (streamed)
+GET    /todos/<id>         -> a single todo
+POST   /todos              -> add a todo, body: {"msg": "..."}
+PATCH  /todos/<id>         -> update a todo, body: {"msg": "...", "complete": true}
+POST   /todos/<id>/toggle  -> toggle the completion status
+DELETE /todos/<id>         -> delete a todo
+
+Usage:
+python server.py serve --backend sqlite --port 8080
+python server.py bench --port 8080 --op get --concurrency 16 --requests 10000
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import traceback
+
+import async_store
+import backends
+
+HOST = "127.0.0.1"
+PORT = 8080
+CACHE_SIZE = 10_000  # Maximum number of todos kept in the read cache
+
+STATUS_REASONS = {
+    200: "OK",
+    201: "Created",
+    204: "No Content",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str = None):
+        super().__init__(message or STATUS_REASONS[status])
+        self.status = status
+
+
+class TodoServer:
+    """
+    Serves the db_controller functions of a store over HTTP
+    - The read cache assumes this server is the only process writing to the store
+    """
+
+    def __init__(self, store: async_store.AsyncStore, cache_size: int = CACHE_SIZE):
+        self.store = store
+        self.cache_size = cache_size
+        self._cache = {}  # Mapping of todo id -> todo, oldest first
+        self._writes = 0  # Number of writes so far, see get_todo()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve the requests of a single connection until the client closes it
+        """
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break  # Client closed the connection
+                except (HTTPError, asyncio.LimitOverrunError, ValueError) as e:
+                    status = e.status if isinstance(e, HTTPError) else 400
+                    await write_response(writer, status, {"error": str(e)}, False)
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    await self.dispatch(writer, method, path, body, keep_alive)
+                except HTTPError as e:
+                    await write_response(
+                        writer, e.status, {"error": str(e)}, keep_alive
+                    )
+                except Exception:
+                    # The store failed, answer (rather than drop the connection)
+                    # then close it, as a streamed response may be half sent
+                    traceback.print_exc()
+                    await write_response(writer, 500, {"error": "Store error"}, False)
+                    break
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def dispatch(self, writer, method: str, path: str, body: bytes, keep_alive):
+        parts = [part for part in path.split("?", 1)[0].split("/") if part]
+        if not parts or parts[0] != "todos" or len(parts) > 3:
+            raise HTTPError(404)
+
+        if len(parts) == 1:
+            if method == "GET":
+                return await self.stream_todos(writer, keep_alive)
+            if method == "POST":
+                msg = parse_msg(parse_json(body).get("msg"))
+                if not msg:
+                    raise HTTPError(400, "'msg' is required")
+                created = await self.store.add_todo(msg)
+                self._invalidate()
+                return await write_response(
+                    writer, 201, {"created": created}, keep_alive
+                )
+            raise HTTPError(405)
+
+        id = parse_id(parts[1])
+        if len(parts) == 3:
+            if parts[2] != "toggle":
+                raise HTTPError(404)
+            if method != "POST":
+                raise HTTPError(405)
+            complete = await self.store.toggle_complete(id)
+            self._invalidate(id)
+            if complete is None:
+                raise HTTPError(404)
+            return await write_response(writer, 200, {"complete": complete}, keep_alive)
+
+        if method == "GET":
+            todo = await self.get_todo(id)
+            if todo is None:
+                raise HTTPError(404)
+            return await write_response(writer, 200, todo, keep_alive)
+
+        if method == "PATCH":
+            fields = parse_json(body)
+            msg = parse_msg(fields.get("msg"))
+            complete = fields.get("complete")
+            if complete is not None and not isinstance(complete, bool):
+                raise HTTPError(400, "'complete' must be true, false or null")
+            if msg is None and complete is None:
+                raise HTTPError(400, "Nothing to update, give 'msg' and/or 'complete'")
+            updated = await self.store.update_todo(id, msg, complete)
+            self._invalidate(id)
+            if not updated:
+                raise HTTPError(404)
+            return await write_response(writer, 200, {"updated": True}, keep_alive)
+
+        if method == "DELETE":
+            deleted = await self.store.delete_todo(id)
+            self._invalidate(id)
+            if not deleted:
+                raise HTTPError(404)
+            return await write_response(writer, 204, None, keep_alive)
+
+        raise HTTPError(405)
+
+    async def get_todo(self, id: int):
+        """
+        Return a todo, from the cache when it was read recently
+        - A read which overlapped a write isn't cached, as it may be stale
+        """
+        if id in self._cache:
+            return self._cache[id]
+
+        writes = self._writes
+        todo = await self.store.get_todo_by_id(id)
+        if todo is not None and writes == self._writes:
+            if len(self._cache) >= self.cache_size:
+                del self._cache[next(iter(self._cache))]  # Evict the oldest
+            self._cache[id] = todo
+        return todo
+
+    def _invalidate(self, id: int = None):
+        """
+        Drop a todo from the cache after a write
+        :param id: Todo written to, None drops every todo (ex. after an add, as
+        the id it was given isn't known)
+        """
+        self._writes += 1
+        if id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(id, None)
+
+    async def stream_todos(self, writer, keep_alive: bool):
+        """
+        Send every todo as a JSON array, one chunk per batch of todos
+        """
+        write_head(writer, 200, keep_alive, {"Transfer-Encoding": "chunked"})
+        write_chunk(writer, b"[")
+        separator = b""
+        batch = []
+        async for todo in self.store.aiter_todos():
+            batch.append(separator + json.dumps(todo).encode())
+            separator = b", "
+            if len(batch) >= async_store.ITER_BATCH_SIZE:
+                write_chunk(writer, b"".join(batch))
+                batch = []
+                await writer.drain()
+        write_chunk(writer, b"".join(batch) + b"]")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def read_request(reader):
+    """
+    Read a single HTTP request from a connection
+    :return: (method, path, headers, body), None if the connection was closed
+    """
+    head = await reader.readuntil(b"\r\n\r\n")
+    if not head.strip():
+        return None
+
+    request_line, *header_lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, version = request_line.split(" ")
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = parse_headers(header_lines)
+    if version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive":
+        headers["connection"] = "close"
+
+    body = b""
+    if "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    return method, path, headers, body
+
+
+async def read_response(reader):
+    """
+    Read a single HTTP response (Content-Length or chunked) from a connection
+    :return: (status, body)
+    """
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    status = int(status_line.split(" ")[1])
+    headers = parse_headers(header_lines)
+
+    if headers.get("transfer-encoding") == "chunked":
+        chunks = []
+        while size := int((await reader.readuntil(b"\r\n"))[:-2], 16):
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)  # \r\n closing the chunk
+        await reader.readexactly(2)  # \r\n closing the last (empty) chunk
+        return status, b"".join(chunks)
+
+    return status, await reader.readexactly(int(headers.get("content-length", 0)))
+
+
+def parse_headers(header_lines):
+    headers = {}
+    for line in header_lines:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def parse_json(body: bytes):
+    try:
+        fields = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(400, "Body is not valid JSON")
+    if not isinstance(fields, dict):
+        raise HTTPError(400, "Body must be a JSON object")
+    return fields
+
+
+def parse_msg(value):
+    """
+    Validate a todo message from a request body
+    - The file backends store a todo per line w/ comma separated fields, so
+      newlines and commas would corrupt them
+    :return: The message, None if there's none
+    """
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise HTTPError(400, "'msg' must be a string")
+    if any(char in value for char in "\r\n,"):
+        raise HTTPError(400, "'msg' can't contain newlines or commas")
+    return value
+
+
+def parse_id(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPError(404)
+
+
+def write_head(writer, status: int, keep_alive: bool, headers: dict):
+    lines = [f"HTTP/1.1 {status} {STATUS_REASONS[status]}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+
+def write_chunk(writer, data: bytes):
+    if data:
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+async def write_response(writer, status: int, payload, keep_alive: bool):
+    body = b"" if payload is None else json.dumps(payload).encode()
+    headers = {"Content-Length": len(body)}
+    if body:
+        headers["Content-Type"] = "application/json"
+    write_head(writer, status, keep_alive, headers)
+    writer.write(body)
+    await writer.drain()
+
+
+async def serve(store: async_store.AsyncStore, host: str = HOST, port: int = PORT):
+    """
+    Start serving a store
+    :return: asyncio Server, already listening
+    """
+    await store.create_db_if_not_exists()
+    server = TodoServer(store)
+    return await asyncio.start_server(server.handle_connection, host, port)
+
+
+async def request(reader, writer, method: str, path: str, payload=None):
+    """
+    Send a request over an open (keep-alive) connection and read the response
+    :return: (status, decoded JSON body or None)
+    """
+    body = b"" if payload is None else json.dumps(payload).encode()
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {HOST}\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status, response = await read_response(reader)
+    return status, json.loads(response) if response else None
+
+
+async def bench(host: str, port: int, op: str, concurrency: int, requests: int):
+    """
+    Hammer a running server w/ concurrent keep-alive clients
+    :return: Dictionary of throughput and latency figures
+    """
+    latencies = []
+    per_client = requests // concurrency
+
+    async def client(number: int):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for i in range(per_client):
+                start = time.perf_counter()
+                if op == "get":
+                    await request(reader, writer, "GET", f"/todos/{i % 100}")
+                elif op == "add":
+                    await request(
+                        reader, writer, "POST", "/todos", {"msg": f"bench {number}"}
+                    )
+                else:
+                    await request(reader, writer, "GET", "/todos")
+                latencies.append(time.perf_counter() - start)
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP server for the todo store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Serve a store")
+    serve_parser.add_argument("--backend", choices=backends.BACKENDS, default="sqlite")
+    serve_parser.add_argument("--db", help="DB file, defaults to the backend's")
+    serve_parser.add_argument("--workers", type=int, default=async_store.MAX_WORKERS)
+
+    bench_parser = commands.add_parser("bench", help="Benchmark a running server")
+    bench_parser.add_argument("--op", choices=["get", "add", "list"], default="get")
+    bench_parser.add_argument("--concurrency", type=int, default=16)
+    bench_parser.add_argument("--requests", type=int, default=10_000)
+
+    for sub_parser in [serve_parser, bench_parser]:
+        sub_parser.add_argument("--host", default=HOST)
+        sub_parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        result = asyncio.run(
+            bench(args.host, args.port, args.op, args.concurrency, args.requests)
+        )
+        print(
+            f"{result['requests']:,} '{args.op}' requests in {result['seconds']:.2f}s: "
+            f"{result['requests_per_sec']:,.0f} req/sec, "
+            f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms"
+        )
+        return
+
+    async def run():
+        store = async_store.open_async_store(args.backend, args.db, args.workers)
+        server = await serve(store, args.host, args.port)
+        print(f"Serving {store.store.DB_NAME} on http://{args.host}:{args.port}")
+        async with store, server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Shutting down...")
+
+
+if __name__ == "__main__":
+    main()
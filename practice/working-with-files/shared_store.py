@@ -0,0 +1,497 @@
+"""
+Shared memory copy of a store, for many short-lived processes to read
+
+Worker processes which each parse db.json (or db.csv) again spend more time
+parsing than working. Publisher loads the store once into a
+multiprocessing.shared_memory segment, which any process of the machine
+attaches to by name w/ SharedTodos, and queries w/o parsing anything
+(importing only what reading needs, the publisher's imports are lazy):
+- Columnar layout, rows sorted by id: ids (int64), start and length of the
+  messages (uint32) in a heap of UTF-8 text, flags (uint8: complete, deleted)
+- The columns are read in place through memoryviews, get_todo_by_id()
+  bisects the ids and only builds the todo it returns
+- A generation counter in the header is odd while the publisher writes, a
+  reader retries when it changed during its read (a seqlock)
+
+refresh() updates the segment in place from the change log of the store (see
+changelog.py): updates overwrite the flags or append the new message to the
+heap, deletes flag their row, and new (higher) ids are appended, in the room
+kept free for them. The segment is only rebuilt from the store when it runs out
+of room or an id comes out of order, into a new segment of the same name that
+readers switch to by themselves. W/o a change log, the segment is rebuilt when
+the files of the store change.
+
+Usage:
+python shared_store.py --backend json --change-log todos.changes --name todos
+python -c "import shared_store; print(shared_store.SharedTodos('todos').get_todos())"
+"""
+
+import array
+import bisect
+import itertools
+import os
+import struct
+import sys
+import time
+
+NAME = "todos"  # Name of the shared memory segment
+HEADROOM = 1.5  # Room for rows and messages, relative to the store's size
+MIN_ROWS = 1024  # Rows of room kept at least
+MIN_HEAP = 64 * 1024  # Bytes of room for the messages kept at least
+REFRESH_INTERVAL = 0.5  # Seconds between two refresh() of the publisher
+ATTACH_TIMEOUT = 5.0  # Seconds a reader waits for a segment to be published
+
+# magic, generation, flags, rows, live rows, row capacity, heap used, heap capacity
+HEADER = struct.Struct("<8sQQQQQQQ")
+MAGIC = b"TODOSHM1"
+REPLACED = 1  # Header flag of a segment superseded by a rebuilt one
+COMPLETE = 1  # Row flags
+DELETED = 2
+
+
+class Publisher:
+    """
+    Publishes a store in a shared memory segment, and keeps it up to date
+    """
+
+    def __init__(self, store, name: str = NAME, log_path: str = None):
+        """
+        :param store: db_controller module (or store) to publish
+        :param name: Name of the segment, for the readers to attach to
+        :param log_path: Change log of the store (see changelog.py), to update
+            the segment from, None to rebuild it when the store's files change
+        """
+        self.store = store
+        self.name = name
+        self.log_path = log_path
+        self.seq = 0  # Last change of the log in the segment
+        self.generation = 0
+        self.rebuilds = 0
+        self._table = None
+        # (path, mtime, size) of the store's files at the last rebuild
+        self._files = None
+        self.rebuild()
+
+    def refresh(self) -> bool:
+        """
+        Bring the segment up to date w/ the store
+        :return: Whether the segment changed
+        """
+        if self.log_path is None:
+            if _file_stats(self.store) == self._files:
+                return False
+            self.rebuild()
+            return True
+
+        import changelog
+
+        changes = list(changelog.read_changes(self.log_path, self.seq))
+        if not changes:
+            return False
+        self._begin_write()
+        try:
+            applied = all(self._table.apply(change) for change in changes)
+        finally:
+            self._end_write()
+        if applied:
+            self.seq = changes[-1]["seq"]
+        else:
+            # Out of room, or an id lower than the last one
+            self.rebuild()
+        return True
+
+    def rebuild(self):
+        """
+        Load the whole store into a new segment, replacing the current one
+        """
+        import changelog
+
+        # Read before the store, changes made while loading it are applied again
+        # by the next refresh(), which is harmless
+        seq = changelog.last_seq(self.log_path) if self.log_path else 0
+        files = _file_stats(self.store)
+        todos = sorted(self.store.iter_todos(), key=lambda todo: todo["id"])
+        messages = [todo["msg"].encode() for todo in todos]
+        heap_used = sum(len(message) for message in messages)
+        row_capacity = max(int(len(todos) * HEADROOM), MIN_ROWS)
+        heap_capacity = max(int(heap_used * HEADROOM), MIN_HEAP)
+
+        old = self._table
+        if old is not None:
+            # Readers still attached to it switch to the new segment
+            self._begin_write()
+            old.flags_field = REPLACED
+            self._end_write()
+            old.segment.unlink()
+        segment = _create_segment(self.name, _layout(row_capacity)[-1] + heap_capacity)
+        table = _Table(segment, row_capacity)
+        table.fill(todos, messages)
+        self._table = table
+        # The header goes last, a reader waits for the magic
+        table.write_header(self.generation)
+        if old is not None:
+            old.close()
+
+        self.seq = seq
+        self._files = files
+        self.rebuilds += 1
+
+    def close(self, unlink: bool = True):
+        """
+        Stop publishing, removing the segment unless unlink is False
+        """
+        if unlink:
+            self._table.segment.unlink()
+        self._table.close()
+
+    def _begin_write(self):
+        self.generation += 1
+        self._table.write_header(self.generation)
+
+    def _end_write(self):
+        self.generation += 1
+        self._table.write_header(self.generation)
+
+
+class SharedTodos:
+    """
+    Reads the todos of a segment published by Publisher, from any process
+    """
+
+    def __init__(self, name: str = NAME, timeout: float = ATTACH_TIMEOUT):
+        """
+        :param name: Name of the segment
+        :param timeout: Seconds to wait for the segment to be published
+        """
+        self.name = name
+        self.timeout = timeout
+        self._table = self._attach()
+
+    @property
+    def generation(self) -> int:
+        """
+        Version of the todos, increasing each time the publisher changes them
+        """
+        return self._read(lambda table, rows: table.read_header()[1])
+
+    def get_todos(self):
+        return self._read(_read_todos)
+
+    def iter_todos(self):
+        """
+        Yield the todos of a single generation (read at once)
+        """
+        return iter(self.get_todos())
+
+    def get_todo_by_id(self, id: int):
+        return self._read(lambda table, rows: _find_todo(table, rows, id))
+
+    def close(self):
+        self._table.close()
+
+    def _read(self, func):
+        """
+        Run func(table, rows) until it ran w/o the publisher writing meanwhile
+        """
+        while True:
+            table = self._table
+            generation, flags, rows = table.read_header()[1:4]
+            if flags & REPLACED:
+                table.close()
+                self._table = self._attach()
+                continue
+            if generation % 2:  # Being written
+                time.sleep(0)
+                continue
+            try:
+                result = func(table, rows)
+            except (IndexError, UnicodeDecodeError):
+                # Columns changed under the read, retried below
+                if table.read_header()[1] == generation:
+                    raise
+                continue
+            if table.read_header()[1] == generation:
+                return result
+
+    def _attach(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                table = _Table.attach(_open_segment(self.name))
+            except (FileNotFoundError, ValueError):
+                # Not published yet, or being rebuilt
+                table = None
+            if table is not None:
+                return table
+            if time.monotonic() > deadline:
+                raise FileNotFoundError(f"No todos published as '{self.name}'")
+            time.sleep(0.01)
+
+
+class _Table:
+    """
+    Columns of a segment, see the module's docstring
+    """
+
+    def __init__(self, segment, row_capacity: int):
+        self.segment = segment
+        self.buf = segment.buf
+        self.row_capacity = row_capacity
+        ids, starts, lengths, flags, heap = _layout(row_capacity)
+        self.ids = self.buf[ids:starts].cast("q")
+        self.starts = self.buf[starts:lengths].cast("I")
+        self.lengths = self.buf[lengths:flags].cast("I")
+        self.flags = self.buf[flags:heap]
+        self.heap = self.buf[heap:]
+        self.generation = 0
+        self.flags_field = 0
+        self.rows = self.live = self.heap_used = 0
+
+    @classmethod
+    def attach(cls, segment):
+        """
+        :return: _Table of a published segment
+        :raise ValueError: When the segment isn't published yet
+        """
+        header = HEADER.unpack_from(segment.buf)
+        if header[0] != MAGIC:
+            segment.close()
+            raise ValueError("Segment not published yet")
+        return cls(segment, header[5])
+
+    def read_header(self) -> tuple:
+        return HEADER.unpack_from(self.buf)
+
+    def write_header(self, generation: int):
+        self.generation = generation
+        HEADER.pack_into(
+            self.buf,
+            0,
+            MAGIC,
+            generation,
+            self.flags_field,
+            self.rows,
+            self.live,
+            self.row_capacity,
+            self.heap_used,
+            len(self.heap),
+        )
+
+    def fill(self, todos: list, messages: list):
+        rows = len(todos)
+        lengths = array.array("I", map(len, messages))
+        self.ids[:rows] = array.array("q", [todo["id"] for todo in todos])
+        self.starts[:rows] = array.array("I", itertools.accumulate(lengths, initial=0))[
+            :-1
+        ]
+        self.lengths[:rows] = lengths
+        self.flags[:rows] = bytes(COMPLETE if todo["complete"] else 0 for todo in todos)
+        self.heap_used = sum(lengths)
+        self.heap[: self.heap_used] = b"".join(messages)
+        self.rows = self.live = rows
+
+    def apply(self, change: dict) -> bool:
+        """
+        Apply a change (see changelog.py) in place
+        :return: False if it needs a rebuild (out of room, or an id lower than
+            the last one added)
+        """
+        id, fields = change["id"], change.get("fields", {})
+        row = _find_row(self, self.rows, id)
+        if change["op"] == "delete":
+            if row is not None and not self.flags[row] & DELETED:
+                self.flags[row] |= DELETED
+                self.live -= 1
+            return True
+        if row is None and change["op"] == "update":
+            return True  # Deleted since
+
+        message = fields["msg"].encode() if "msg" in fields else None
+        if message is not None and self.heap_used + len(message) > len(self.heap):
+            return False
+        if row is None:
+            if self.rows == self.row_capacity or (
+                self.rows and id <= self.ids[self.rows - 1]
+            ):
+                return False
+            row = self.rows
+            self.ids[row] = id
+            self.flags[row] = DELETED
+            self.rows += 1
+        if self.flags[row] & DELETED:  # Added (again)
+            self.flags[row] &= ~DELETED
+            self.live += 1
+
+        if message is not None:
+            self.heap[self.heap_used : self.heap_used + len(message)] = message
+            self.starts[row] = self.heap_used
+            self.lengths[row] = len(message)
+            self.heap_used += len(message)
+        if "complete" in fields:
+            self.flags[row] = COMPLETE if fields["complete"] else 0
+        return True
+
+    def close(self):
+        # The views have to go before the memory they point to
+        for view in (self.ids, self.starts, self.lengths, self.flags, self.heap):
+            view.release()
+        self.segment.close()
+
+
+def _layout(row_capacity: int) -> tuple:
+    """
+    Return the offsets of the columns and of the heap in a segment
+    """
+    ids = HEADER.size
+    starts = ids + 8 * row_capacity
+    lengths = starts + 4 * row_capacity
+    flags = lengths + 4 * row_capacity
+    heap = flags + row_capacity
+    return ids, starts, lengths, flags, heap
+
+
+def _find_row(table: _Table, rows: int, id: int):
+    row = bisect.bisect_left(table.ids, id, 0, rows)
+    return row if row < rows and table.ids[row] == id else None
+
+
+def _find_todo(table: _Table, rows: int, id: int):
+    row = _find_row(table, rows, id)
+    if row is None or table.flags[row] & DELETED:
+        return None
+    start = table.starts[row]
+    return {
+        "id": id,
+        "msg": str(table.heap[start : start + table.lengths[row]], "utf-8"),
+        "complete": bool(table.flags[row] & COMPLETE),
+    }
+
+
+def _read_todos(table: _Table, rows: int) -> list:
+    heap = table.heap
+    return [
+        {
+            "id": id,
+            "msg": str(heap[start : start + length], "utf-8"),
+            "complete": bool(flags & COMPLETE),
+        }
+        for id, start, length, flags in zip(
+            table.ids[:rows].tolist(),
+            table.starts[:rows].tolist(),
+            table.lengths[:rows].tolist(),
+            table.flags[:rows].tolist(),
+        )
+        if not flags & DELETED
+    ]
+
+
+def _file_stats(store) -> list:
+    """
+    Return the (path, mtime, size) of the files of a store, to tell a change
+    """
+    paths = store._paths() if hasattr(store, "_paths") else [store.DB_NAME]
+    paths += [f"{store.DB_NAME}-wal"]  # SQLite's write-ahead log
+    stats = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        stats.append((path, stat.st_mtime_ns, stat.st_size))
+    return stats
+
+
+def _create_segment(name: str, size: int):
+    from multiprocessing import shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name, create=True, size=size)
+    except FileExistsError:
+        # Left over by a publisher which didn't close it
+        stale = shared_memory.SharedMemory(name)
+        stale.close()
+        stale.unlink()
+        return shared_memory.SharedMemory(name, create=True, size=size)
+
+
+class _MappedSegment:
+    """
+    Segment opened from /dev/shm, w/ the same buf / close() as SharedMemory
+    """
+
+    def __init__(self, path: str):
+        import mmap
+
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            self._mmap = mmap.mmap(fd, 0, prot=mmap.PROT_READ)
+        finally:
+            os.close(fd)
+        self.buf = memoryview(self._mmap)
+
+    def close(self):
+        self.buf.release()
+        self._mmap.close()
+
+
+def _open_segment(name: str):
+    """
+    Attach to a segment as a reader
+    - SharedMemory() registers the segment w/ the resource tracker before
+      Python 3.13 (track=False), starting a tracker process (~100 ms) which
+      would also remove the segment once the reader exits; on Linux the
+      segment is mapped from /dev/shm instead, w/o importing multiprocessing
+    """
+    if os.path.isdir("/dev/shm"):
+        return _MappedSegment(os.path.join("/dev/shm", name.lstrip("/")))
+    from multiprocessing import resource_tracker, shared_memory
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+
+    segment = shared_memory.SharedMemory(name)
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def main():
+    import argparse
+
+    import backends
+
+    parser = argparse.ArgumentParser(description="Publish a store in shared memory")
+    parser.add_argument("--backend", choices=backends.BACKENDS, required=True)
+    parser.add_argument("--db", help="DB file, defaults to the backend's")
+    parser.add_argument("--name", default=NAME, help="Name of the segment")
+    parser.add_argument(
+        "--change-log",
+        help="Change log of the store, to update the segment in place "
+        "(see cli.py --change-log)",
+    )
+    parser.add_argument("--interval", type=float, default=REFRESH_INTERVAL)
+    args = parser.parse_args()
+
+    store = backends.load_backend(args.backend, args.db)
+    store.create_db_if_not_exists()
+    start = time.perf_counter()
+    publisher = Publisher(store, args.name, args.change_log)
+    print(
+        f"Published {publisher._table.live:,} todos of {store.DB_NAME} as "
+        f"'{args.name}' in {time.perf_counter() - start:.2f}s"
+    )
+    try:
+        while True:
+            time.sleep(args.interval)
+            if publisher.refresh():
+                print(
+                    f"Generation {publisher.generation:,}, "
+                    f"{publisher._table.live:,} todos, {publisher.rebuilds} rebuild(s)"
+                )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,28 @@
 Responsible for Interfacing with the DB (SQLite file)
 """
 
+import queue
 import sqlite3
+import threading
+import time
+from collections.abc import Iterable, Iterator
 
 DB_NAME = "data.db"
 
+# Defaults of the optional group commit writer thread (see start_writer)
+WRITER_MAX_BATCH = 256  # Maximum number of writes committed together
+WRITER_MAX_DELAY = 0.002  # Maximum seconds to wait for more writes to group
+
+_writer = None  # Running GroupCommitWriter, if any
+
+# Defaults of the optional slow query log (see enable_slow_query_log)
+SLOW_QUERY_LOG = "slow_queries.log"
+SLOW_QUERY_THRESHOLD = 0.05  # Statements taking longer (in seconds) are logged
+SLOW_QUERY_LOG_MAX_BYTES = 1024 * 1024  # Size at which the log is rotated
+SLOW_QUERY_LOG_BACKUPS = 3  # Number of rotated logs kept
+
+_slow_query_log = None  # SlowQueryLog in use, if any
+
 
 def create_db_if_not_exists() -> None:
     """
@@ -23,7 +41,7 @@ def get_todos() -> list[dict[str, any]]:
     todos = []
 
     # Connect to SQLite DB
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
 
         # Execute the SELECT query to fetch all records from the todos table
@@ -40,13 +58,31 @@ def get_todos() -> list[dict[str, any]]:
     return todos
 
 
+def iter_todos(batch_size: int = 1000) -> Iterator[dict[str, any]]:
+    """
+    Lazily yield every Todo in the DB, fetching rows in batches
+    :param batch_size: Number of rows to fetch from the cursor at a time
+    :return: Generator of Todo Dictionaries
+    """
+    # The generator may be resumed from different threads (ex. an executor pool),
+    # which is safe as long as they take turns, so the thread check is disabled
+    with _connect(check_same_thread=False) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM todos")
+
+        # fetchmany() keeps at most batch_size rows in memory at once
+        while rows := cursor.fetchmany(batch_size):
+            for row in rows:
+                yield {"id": row[0], "msg": row[1], "complete": bool(row[2])}
+
+
 def get_todo_by_id(id: int) -> dict[str, any] | None:
     """
     Retrieve a Todo of specified ID from the DB
     :param id: The ID of the Todo to return
     :return: Todo of specified ID or None if not found
     """
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
 
         # Execute a SELECT query to fetch a record with the specified id
@@ -69,21 +105,28 @@ def add_todo(msg: str) -> bool:
     :return: Boolean representing if the book was updated or not
     """
     try:
-        # Connect to the SQLite database
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-
-            # Insert the new todo item with the given message and complete set to 0
-            cursor.execute("INSERT INTO todos (msg, complete) VALUES (?, ?)", (msg, 0))
-
-        # Return True if the operation is successful
-        return True
+        return _execute_write(_add_todo, msg)
     except sqlite3.Error as e:
         # Print the error and return False if the operation fails
         print(f"SQLite error: {e}")
         return False
 
 
+def insert_todos(todos: Iterable[dict[str, any]]) -> int:
+    """
+    Add Todos which already have an ID (ex. when moving todos between DBs)
+    - All todos are inserted in a single transaction
+    - An existing todo w/ the same id is replaced
+    - Unlike the other writes, errors are raised: callers (migrations,
+      tiering, the change log) delete or log the todos once they are inserted
+    :param todos: Iterable of Todo Dictionaries
+    :return: Number of todos inserted
+    :raises sqlite3.Error: If the todos couldn't be inserted
+    """
+    rows = [(todo["id"], todo["msg"], int(todo["complete"])) for todo in todos]
+    return _execute_write(_insert_todos, rows)
+
+
 def update_todo(id: int, new_msg: str = None, new_complete: bool = None) -> bool:
     """
     Update a Todo Item in the DB
@@ -93,37 +136,7 @@ def update_todo(id: int, new_msg: str = None, new_complete: bool = None) -> bool
     :return: Boolean representing if book was updated or not
     """
     try:
-        # Connect to the SQLite database
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-
-            # Prepare the update query
-            query = "UPDATE todos SET "
-            params = []
-
-            if new_msg is not None:
-                query += "msg = ?, "
-                params.append(new_msg)
-
-            if new_complete is not None:
-                query += "complete = ?, "
-                params.append(int(new_complete))
-
-            # Remove trailing comma and space
-            query = query.rstrip(", ")
-            query += " WHERE id = ?"
-            params.append(id)
-
-            # Execute the update query
-            cursor.execute(query, params)
-
-            # Check if any rows were affected (meaning the update was successful)
-            if cursor.rowcount == 0:
-                return False
-
-        # Return True if the operation is successful
-        return True
-
+        return _execute_write(_update_todo, id, new_msg, new_complete)
     except sqlite3.Error as e:
         # Print the error and return False if the operation fails
         print(f"SQLite error: {e}")
@@ -137,34 +150,12 @@ def toggle_complete(id: int) -> bool | None:
     :return: Boolean value representing completion status after toggle
     """
     try:
-        # Connect to the SQLite database
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-
-            # Fetch the current completion status of the todo with the given id
-            cursor.execute("SELECT complete FROM todos WHERE id = ?", (id,))
-            row = cursor.fetchone()
-
-            # If there's no todo with the given id, return None
-            if row is None:
-                return None
-
-            # Toggle the completion status
-            current_complete = row[0]
-            new_complete = not bool(current_complete)
-
-            # Update the todo using update_todo function
-            updated = update_todo(id, new_complete=new_complete)
-
-            # If the update is successful, return the new completion status
-            if updated:
-                return new_complete
-
+        return _execute_write(_toggle_complete, id)
     except sqlite3.Error as e:
         # Print the error
         print(f"SQLite error: {e}")
 
-    # Return None in case of any errors or if the todo was not found
+    # Return None in case of any errors
     return None
 
 
@@ -175,28 +166,495 @@ def delete_todo(id: int) -> bool:
     :return: Boolean value representing success or failure of todo deletion
     """
     try:
-        # Connect to the SQLite database
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-
-            # Delete the todo with the given id
-            cursor.execute("DELETE FROM todos WHERE id = ?", (id,))
+        return _execute_write(_delete_todo, id)
+    except sqlite3.Error as e:
+        # Print the error and return False if the operation fails
+        print(f"SQLite error: {e}")
+        return False
 
-            # Check if any rows were affected (meaning delete was successful)
-            if cursor.rowcount == 0:
-                return False
 
-        # Return True if the operation is successful
-        return True
+def execute_batch(ops: Iterable[tuple[str, tuple]]) -> list:
+    """
+    Run many operations in a single transaction (one commit instead of one each)
+    - Results are the same as calling the functions one after the other
+    :param ops: List of (function name, args) tuples, the supported functions being
+        ("add_todo", (msg,)), ("update_todo", (id, new_msg, new_complete)),
+        ("toggle_complete", (id,)) and ("delete_todo", (id,))
+    :return: List of results, one per operation
+    """
+    ops = list(ops)
+    for name, _ in ops:
+        if name not in _BATCH_OPS:
+            raise ValueError(f"Unsupported batch operation '{name}'")
 
+    try:
+        return _execute_write(_execute_batch, ops)
     except sqlite3.Error as e:
-        # Print the error and return False if the operation fails
+        # Print the error, none of the operations were applied
         print(f"SQLite error: {e}")
-        return False
+        return [False] * len(ops)
+
+
+def start_writer(max_batch: int = None, max_delay: float = None) -> None:
+    """
+    Route every write through a background writer thread using group commit
+    - Concurrent add / insert / update / toggle / delete calls are committed
+      together in one transaction (one fsync) instead of one each
+    - The functions keep their synchronous signatures, each call blocks until
+      the transaction holding its write is committed
+    :param max_batch: Maximum number of writes committed together
+    :param max_delay: Maximum seconds to wait for more writes before committing
+    :return: None
+    """
+    global _writer
+    if _writer is None:
+        _writer = GroupCommitWriter(
+            DB_NAME,
+            max_batch if max_batch is not None else WRITER_MAX_BATCH,
+            max_delay if max_delay is not None else WRITER_MAX_DELAY,
+        )
+        _writer.start()
+
+
+def stop_writer() -> None:
+    """
+    Commit the pending writes and stop the background writer thread
+    :return: None
+    """
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+def enable_slow_query_log(
+    path: str = None,
+    threshold: float = None,
+    max_bytes: int = None,
+    backups: int = None,
+) -> None:
+    """
+    Log the statements slower than threshold, w/ their query plan
+    - Connections opened from now on trace their statements (the trace
+      callback gives the SQL w/ its parameters bound) and time each one from
+      execute() until its last row is fetched, commits included
+    - The EXPLAIN QUERY PLAN of each logged statement shows whether it scanned
+      the table ("SCAN todos") or used an index ("SEARCH todos USING ...")
+    - The log is rotated once it reaches max_bytes (path.1, path.2, ...)
+    :param path: Log file, defaults to SLOW_QUERY_LOG
+    :param threshold: Minimum duration (in seconds) of a logged statement
+    :param max_bytes: Size at which the log is rotated
+    :param backups: Number of rotated logs kept
+    :return: None
+    """
+    global _slow_query_log
+    disable_slow_query_log()
+    _slow_query_log = SlowQueryLog(
+        path or SLOW_QUERY_LOG,
+        threshold if threshold is not None else SLOW_QUERY_THRESHOLD,
+        max_bytes if max_bytes is not None else SLOW_QUERY_LOG_MAX_BYTES,
+        backups if backups is not None else SLOW_QUERY_LOG_BACKUPS,
+    )
+
+
+def disable_slow_query_log() -> None:
+    """
+    Stop logging slow statements (connections already open keep tracing)
+    :return: None
+    """
+    global _slow_query_log
+    if _slow_query_log is not None:
+        _slow_query_log.close()
+        _slow_query_log = None
+
+
+class GroupCommitWriter(threading.Thread):
+    """
+    Background thread applying queued writes to the DB in groups
+    """
+
+    def __init__(self, db_name: str, max_batch: int, max_delay: float):
+        super().__init__(name="sqlite-group-commit", daemon=True)
+        self.db_name = db_name
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = queue.Queue()
+
+    def submit(self, func, *args) -> "Future":
+        """
+        Queue a write
+        :param func: Function applying the write, called w/ (cursor, *args)
+        :return: Future resolved w/ the function's result once committed
+        """
+        # Imported here as concurrent.futures pulls in logging, which would
+        # slow down the start of every command, not only the ones using the writer
+        from concurrent.futures import Future
+
+        future = Future()
+        self.queue.put((future, func, args))
+        return future
+
+    def stop(self) -> None:
+        self.queue.put(None)
+        self.join()
+
+    def run(self) -> None:
+        # isolation_level=None lets the thread manage the transactions itself
+        conn = _connect(self.db_name, isolation_level=None)
+        # WAL mode lets readers on other connections run during a commit
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self.queue.get()]
+                if batch[0] is None:
+                    break
+
+                # Take every write already waiting, then linger up to max_delay
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    try:
+                        timeout = deadline - time.monotonic()
+                        if timeout > 0:
+                            item = self.queue.get(timeout=timeout)
+                        else:
+                            item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                self._commit(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: list) -> None:
+        """
+        Apply a group of writes in a single transaction
+        - Each write runs in its own savepoint, so a failing write (whatever
+          the exception) is rolled back without affecting the others in the group
+        - Every future of the group is resolved, and nothing is raised, so the
+          thread keeps serving the next groups
+        """
+        cursor = conn.cursor()
+        outcomes = []  # (future, result or exception, succeeded)
+        try:
+            cursor.execute("BEGIN")
+            for future, func, args in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                cursor.execute("SAVEPOINT write")
+                try:
+                    outcomes.append((future, func(cursor, *args), True))
+                    cursor.execute("RELEASE write")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write")
+                    cursor.execute("RELEASE write")
+                    outcomes.append((future, e, False))
+            cursor.execute("COMMIT")
+        except Exception as e:
+            # The whole group failed to commit, including the writes not run yet
+            if conn.in_transaction:
+                try:
+                    cursor.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass  # Already rolled back by SQLite
+            for future, *_ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, outcome, succeeded in outcomes:
+            if succeeded:
+                future.set_result(outcome)
+            else:
+                future.set_exception(outcome)
+
+
+class SlowQueryLog:
+    """
+    Rotating log of the statements slower than a threshold
+    """
+
+    # Statements EXPLAIN QUERY PLAN has a plan for
+    EXPLAINED = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+    def __init__(self, path: str, threshold: float, max_bytes: int, backups: int):
+        # Imported here as logging is slow to import and the log is opt-in
+        import logging
+        import logging.handlers
+
+        self.threshold = threshold
+        self.handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups
+        )
+        self.handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        # Not registered in the logging module, so each copy of the controller
+        # (see backends.load_backend) has its own
+        self.logger = logging.Logger("sqlite.slow_queries")
+        self.logger.addHandler(self.handler)
+
+    def record(self, conn: sqlite3.Connection, sql: str, elapsed: float) -> None:
+        """
+        Log a statement if it took longer than the threshold
+        :param conn: Connection which ran the statement, to explain it
+        :param sql: Statement, w/ its parameters bound
+        :param elapsed: Duration of the statement, in seconds
+        """
+        if elapsed < self.threshold:
+            return
+        lines = [f"{elapsed * 1000:.1f} ms {sql.strip()}"]
+        if sql.lstrip().upper().startswith(self.EXPLAINED):
+            lines += [f"    {line}" for line in self._explain(conn, sql)]
+        self.logger.warning("\n".join(lines))
+
+    def _explain(self, conn: sqlite3.Connection, sql: str) -> list[str]:
+        try:
+            # A plain cursor, so explaining isn't traced itself
+            rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        except sqlite3.Error as e:
+            return [f"(no query plan: {e})"]
+        # Rows are (id, parent id, unused, detail), indent the children
+        depths = {0: -1}
+        lines = []
+        for id, parent, _, detail in rows:
+            depths[id] = depths.get(parent, -1) + 1
+            lines.append(f"{'  ' * depths[id]}{detail}")
+        return lines
+
+    def close(self) -> None:
+        self.handler.close()
+
+
+class _TracedConnection(sqlite3.Connection):
+    """
+    Connection timing its statements for the slow query log
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slow_query_log = None
+        self.cursors = set()  # Cursors w/ a statement in progress
+        # The callback only holds the list, not the connection
+        statement = self.statement = [None]
+
+        def trace(sql):
+            statement[0] = sql
+
+        self.set_trace_callback(trace)
+
+    def cursor(self, factory=None) -> sqlite3.Cursor:
+        return super().cursor(factory or _TracedCursor)
+
+    def commit(self) -> None:
+        self._finish_cursors()
+        committing = self.in_transaction
+        start = time.perf_counter()
+        super().commit()
+        if committing:
+            self.slow_query_log.record(self, "COMMIT", time.perf_counter() - start)
+
+    def __exit__(self, *exc_info):
+        # Commits (or rolls back) w/o going through commit()
+        self._finish_cursors()
+        committing = self.in_transaction and exc_info[0] is None
+        start = time.perf_counter()
+        result = super().__exit__(*exc_info)
+        if committing:
+            self.slow_query_log.record(self, "COMMIT", time.perf_counter() - start)
+        return result
+
+    def close(self) -> None:
+        self._finish_cursors()
+        super().close()
+
+    def _finish_cursors(self) -> None:
+        # Statements whose rows weren't all fetched end w/ the transaction
+        for cursor in list(self.cursors):
+            cursor.finish()
+
+
+class _TracedCursor(sqlite3.Cursor):
+    """
+    Cursor timing each statement, from execute() until its last row is fetched
+    (the time spent between two fetches isn't the statement's)
+    """
+
+    sql = None
+    elapsed = 0.0
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(super().executemany, sql, seq_of_parameters, many=True)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self.finish()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        if len(rows) < size:
+            self.finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self.finish()
+        return rows
+
+    def close(self):
+        self.finish()
+        super().close()
+
+    def finish(self) -> None:
+        """
+        Record the statement in progress, if any
+        """
+        if self.sql is not None:
+            sql, self.sql = self.sql, None
+            self.connection.cursors.discard(self)
+            self.connection.slow_query_log.record(self.connection, sql, self.elapsed)
+
+    def _run(self, func, sql, parameters, many=False):
+        self.finish()
+        self.connection.statement[0] = None
+        self.elapsed = 0.0
+        try:
+            return self._timed(func, sql, parameters)
+        finally:
+            # The traced SQL has the parameters bound
+            self.sql = self.connection.statement[0] or sql
+            if many:
+                self.sql += f" -- executemany of {self.rowcount} rows, last one shown"
+            self.connection.cursors.add(self)
+            if self.description is None:
+                # No rows to fetch, the statement is done
+                self.finish()
+
+    def _timed(self, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+
+def _connect(db_name: str = None, **kwargs) -> sqlite3.Connection:
+    """
+    Open a connection to the DB, timing its statements if the slow query log is on
+    :param db_name: DB file, defaults to DB_NAME
+    :param kwargs: Arguments of sqlite3.connect()
+    :return: Connection
+    """
+    if _slow_query_log is None:
+        return sqlite3.connect(db_name or DB_NAME, **kwargs)
+    conn = sqlite3.connect(db_name or DB_NAME, factory=_TracedConnection, **kwargs)
+    conn.slow_query_log = _slow_query_log
+    return conn
+
+
+def _execute_write(func, *args):
+    """
+    Run a write function, through the writer thread if one is running
+    :param func: Function applying the write, called w/ (cursor, *args)
+    :return: The function's result
+    """
+    if _writer is not None:
+        return _writer.submit(func, *args).result()
+
+    # Connect to the SQLite database, the connection commits on exit
+    with _connect() as conn:
+        return func(conn.cursor(), *args)
+
+
+def _add_todo(cursor: sqlite3.Cursor, msg: str) -> bool:
+    # Insert the new todo item with the given message and complete set to 0
+    cursor.execute("INSERT INTO todos (msg, complete) VALUES (?, ?)", (msg, 0))
+    return True
+
+
+def _insert_todos(cursor: sqlite3.Cursor, rows: list[tuple]) -> int:
+    # Insert every row w/ its original id
+    cursor.executemany(
+        "INSERT OR REPLACE INTO todos (id, msg, complete) VALUES (?, ?, ?)",
+        rows,
+    )
+    return len(rows)
+
+
+def _update_todo(
+    cursor: sqlite3.Cursor, id: int, new_msg: str = None, new_complete: bool = None
+) -> bool:
+    # Prepare the update query
+    query = "UPDATE todos SET "
+    params = []
+
+    if new_msg is not None:
+        query += "msg = ?, "
+        params.append(new_msg)
+
+    if new_complete is not None:
+        query += "complete = ?, "
+        params.append(int(new_complete))
+
+    # Remove trailing comma and space
+    query = query.rstrip(", ")
+    query += " WHERE id = ?"
+    params.append(id)
+
+    # Execute the update query
+    cursor.execute(query, params)
+
+    # Check if any rows were affected (meaning the update was successful)
+    return cursor.rowcount > 0
+
+
+def _toggle_complete(cursor: sqlite3.Cursor, id: int) -> bool | None:
+    # Fetch the current completion status of the todo with the given id
+    cursor.execute("SELECT complete FROM todos WHERE id = ?", (id,))
+    row = cursor.fetchone()
+
+    # If there's no todo with the given id, return None
+    if row is None:
+        return None
+
+    # Toggle the completion status, within the same transaction as the read
+    new_complete = not bool(row[0])
+    if _update_todo(cursor, id, new_complete=new_complete):
+        return new_complete
+    return None
+
+
+def _delete_todo(cursor: sqlite3.Cursor, id: int) -> bool:
+    # Delete the todo with the given id
+    cursor.execute("DELETE FROM todos WHERE id = ?", (id,))
+
+    # Check if any rows were affected (meaning delete was successful)
+    return cursor.rowcount > 0
+
+
+def _execute_batch(cursor: sqlite3.Cursor, ops: list[tuple[str, tuple]]) -> list:
+    return [_BATCH_OPS[name](cursor, *args) for name, args in ops]
+
+
+# Mapping of the operations supported by execute_batch() to their write function
+_BATCH_OPS = {
+    "add_todo": _add_todo,
+    "update_todo": _update_todo,
+    "toggle_complete": _toggle_complete,
+    "delete_todo": _delete_todo,
+}
 
 
 def _create_table_todos() -> None:
-    with sqlite3.connect(DB_NAME) as conn:
+    with _connect() as conn:
         cursor = conn.cursor()
 
         create_table_query = """
@@ -0,0 +1,186 @@
+import unittest
+import sqlite3
+import db_controller as controller
+import os
+import threading
+
+
+class TestDBController(unittest.TestCase):
+    def setUp(self):
+        """
+        - Invoked before the execution of each test method
+        - Setup resources / state needed for tests
+        - Works just like beforeEach in Jest
+        """
+        self.db_name = "test_data.db"
+        self.slow_query_log = "test_slow_queries.log"
+        controller.DB_NAME = self.db_name
+
+        self.test_todo_dict = {"id": 1, "msg": "test todo message", "complete": False}
+
+        controller.create_db_if_not_exists()
+        controller.add_todo(self.test_todo_dict["msg"])
+
+    def tearDown(self):
+        """
+        - Invoked immediately after each test method
+        - Clean up any resources / state created by setUp
+        - Works just like afterEach in Jest
+        """
+        controller.stop_writer()
+        controller.disable_slow_query_log()
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(self.db_name + suffix):
+                os.remove(self.db_name + suffix)
+        for suffix in ["", ".1", ".2"]:
+            if os.path.exists(self.slow_query_log + suffix):
+                os.remove(self.slow_query_log + suffix)
+
+    def test_get_todos(self):
+        # ACT -- Run the code that is being tested
+        todos = controller.get_todos()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(todos, [self.test_todo_dict])
+
+    def test_update_todo(self):
+        # ACT -- Run the code that is being tested
+        updated = controller.update_todo(1, "Updated Todo", True)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(updated)
+        self.assertEqual(
+            controller.get_todo_by_id(1),
+            {"id": 1, "msg": "Updated Todo", "complete": True},
+        )
+        self.assertFalse(controller.update_todo(2, "Nonexistent Todo"))
+
+    def test_toggle_complete(self):
+        # ACT + ASSERT -- Run the code that is being tested, Evaluate result and compare to expected value
+        self.assertTrue(controller.toggle_complete(1))
+        self.assertFalse(controller.toggle_complete(1))
+        self.assertIsNone(controller.toggle_complete(2))
+
+    def test_delete_todo(self):
+        # ACT -- Run the code that is being tested
+        deleted = controller.delete_todo(1)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(deleted)
+        self.assertEqual(controller.get_todos(), [])
+        self.assertFalse(controller.delete_todo(1))
+
+    def test_execute_batch(self):
+        # ACT -- Run the code that is being tested
+        results = controller.execute_batch(
+            [
+                ("add_todo", ("second",)),
+                ("update_todo", (1, "first updated", None)),
+                ("toggle_complete", (2,)),
+                ("delete_todo", (3,)),
+                ("toggle_complete", (3,)),
+            ]
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(results, [True, True, True, False, None])
+        self.assertEqual(
+            controller.get_todos(),
+            [
+                {"id": 1, "msg": "first updated", "complete": False},
+                {"id": 2, "msg": "second", "complete": True},
+            ],
+        )
+        with self.assertRaises(ValueError):
+            controller.execute_batch([("get_todos", ())])
+
+    def test_writer_thread_groups_concurrent_writes(self):
+        # ARRANGE -- Linger long enough for every thread's write to be grouped
+        controller.start_writer(max_delay=0.05)
+        results = []
+
+        def add():
+            results.append(controller.add_todo("from thread"))
+
+        threads = [threading.Thread(target=add) for _ in range(20)]
+
+        # ACT -- Run the code that is being tested
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # ASSERT -- Every call got its own result once committed
+        self.assertEqual(results, [True] * 20)
+        self.assertEqual(len(controller.get_todos()), 21)
+
+    def test_writer_thread_keeps_results_of_each_write(self):
+        # ARRANGE -- Define testing environments & values
+        controller.start_writer()
+
+        # ACT + ASSERT -- Run the code that is being tested, Evaluate result and compare to expected value
+        self.assertTrue(controller.toggle_complete(1))
+        self.assertFalse(controller.update_todo(2, "Nonexistent Todo"))
+        self.assertEqual(
+            controller.insert_todos([{"id": 5, "msg": "five", "complete": False}]), 1
+        )
+        self.assertTrue(controller.delete_todo(5))
+        self.assertEqual(
+            controller.get_todos(),
+            [{"id": 1, "msg": "test todo message", "complete": True}],
+        )
+
+    def test_writer_thread_survives_a_failing_write(self):
+        # ARRANGE -- Define testing environments & values
+        controller.start_writer()
+
+        # ACT + ASSERT -- A write raising something else than sqlite3.Error
+        with self.assertRaises(ValueError):
+            controller.update_todo(1, None, "yes")
+        with self.assertRaises(sqlite3.Error):
+            controller.insert_todos([{"id": "x", "msg": "bad id", "complete": False}])
+
+        # ASSERT -- The thread keeps committing the next writes
+        self.assertTrue(controller.add_todo("after the errors"))
+        self.assertEqual([todo["id"] for todo in controller.get_todos()], [1, 2])
+
+    def test_slow_query_log_records_statements_w_their_plan(self):
+        # ARRANGE -- Log every statement
+        controller.enable_slow_query_log(self.slow_query_log, threshold=0)
+
+        # ACT -- Run the code that is being tested
+        controller.update_todo(1, "Updated Todo", True)
+        controller.get_todos()
+        controller.disable_slow_query_log()
+
+        # ASSERT -- Statements are logged w/ their parameters and query plan
+        with open(self.slow_query_log, "r") as file:
+            log = file.read()
+        self.assertIn(
+            "UPDATE todos SET msg = 'Updated Todo', complete = 1 WHERE id = 1", log
+        )
+        self.assertIn("SEARCH todos USING INTEGER PRIMARY KEY", log)
+        self.assertIn("SELECT * FROM todos\n    SCAN todos", log)
+        self.assertIn("COMMIT", log)
+
+    def test_slow_query_log_skips_fast_statements_and_rotates(self):
+        # ARRANGE -- Define testing environments & values
+        controller.enable_slow_query_log(self.slow_query_log, threshold=60)
+        controller.get_todos()
+        controller.enable_slow_query_log(
+            self.slow_query_log, threshold=0, max_bytes=300, backups=1
+        )
+
+        # ACT -- Run the code that is being tested
+        for _ in range(10):
+            controller.get_todo_by_id(1)
+        controller.disable_slow_query_log()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(os.path.exists(self.slow_query_log + ".1"))
+        self.assertFalse(os.path.exists(self.slow_query_log + ".2"))
+        self.assertLessEqual(os.path.getsize(self.slow_query_log), 300)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import asyncio
+import os
+import threading
+
+import async_store
+
+
+class TestAsyncStore(unittest.TestCase):
+    def setUp(self):
+        """
+        - Every test runs against a json store, the slowest one to rewrite
+        """
+        self.db_name = "test_async_store.json"
+        self.store = async_store.open_async_store("json", self.db_name)
+        asyncio.run(self.store.create_db_if_not_exists())
+
+    def tearDown(self):
+        self.store.close()
+        for path in [self.db_name, f"{self.db_name}.bloom"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_concurrent_writes_are_serialized(self):
+        # ARRANGE -- Define testing environments & values
+        async def add_many():
+            return await asyncio.gather(
+                *(self.store.add_todo(f"todo {i}") for i in range(20)),
+                *(self.store.get_todos() for _ in range(5)),
+            )
+
+        # ACT -- Run the code that is being tested
+        asyncio.run(add_many())
+        todos = asyncio.run(self.store.get_todos())
+
+        # ASSERT -- No write was lost and every id is unique
+        self.assertEqual(len(todos), 20)
+        self.assertEqual(sorted(todo["id"] for todo in todos), list(range(20)))
+
+    def test_aiter_todos_streams_in_batches(self):
+        # ARRANGE -- Define testing environments & values
+        asyncio.run(
+            self.store.insert_todos(
+                {"id": i, "msg": f"todo {i}", "complete": False} for i in range(7)
+            )
+        )
+
+        async def collect():
+            return [todo["id"] async for todo in self.store.aiter_todos(batch_size=3)]
+
+        # ACT -- Run the code that is being tested
+        ids = asyncio.run(collect())
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(ids, list(range(7)))
+
+    def test_slow_iteration_doesnt_block_writes(self):
+        # ARRANGE -- Define testing environments & values
+        asyncio.run(
+            self.store.insert_todos(
+                {"id": i, "msg": f"todo {i}", "complete": False} for i in range(7)
+            )
+        )
+
+        async def write_while_iterating():
+            todos = self.store.aiter_todos(batch_size=2)
+            first = await anext(todos)
+            # The caller is still busy w/ the first todo while the write happens
+            added = await asyncio.wait_for(self.store.add_todo("new todo"), 5)
+            rest = [todo async for todo in todos]
+            return [first] + rest, added
+
+        # ACT -- Run the code that is being tested
+        todos, added = asyncio.run(write_while_iterating())
+
+        # ASSERT -- The iteration saw the todos as they were before the write
+        self.assertTrue(added)
+        self.assertEqual([todo["id"] for todo in todos], list(range(7)))
+
+    def test_aclose_doesnt_block_the_event_loop(self):
+        # ARRANGE -- A call is still running in the thread pool when the store closes
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_call():
+            started.set()
+            # Only released by the event loop, while aclose() waits for this call
+            return release.wait(5)
+
+        async def close_while_running():
+            running = asyncio.ensure_future(self.store._run(slow_call))
+            await asyncio.to_thread(started.wait, 5)
+            closing = asyncio.ensure_future(self.store.aclose())
+            await asyncio.sleep(0.05)
+            release.set()
+            await closing
+            return await running
+
+        # ACT -- Run the code that is being tested
+        released = asyncio.run(close_while_running())
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(released)
+
+    def test_toggle_and_delete(self):
+        # ARRANGE -- Define testing environments & values
+        asyncio.run(self.store.add_todo("todo"))
+
+        # ACT -- Run the code that is being tested
+        completed = asyncio.run(self.store.toggle_complete(0))
+        deleted = asyncio.run(self.store.delete_todo(0))
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(completed)
+        self.assertTrue(deleted)
+        self.assertIsNone(asyncio.run(self.store.get_todo_by_id(0)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import fcntl
+import os
+import tempfile
+from unittest import mock
+
+import backends
+import backup
+
+
+def make_todos(count):
+    return [
+        {"id": id, "msg": f"todo {id}", "complete": id % 2 == 0} for id in range(count)
+    ]
+
+
+class TestBackup(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_sqlite_backup_copies_the_db_in_steps(self):
+        # ARRANGE -- Define testing environments & values
+        store = backends.load_backend("sqlite", self.path("data.db"))
+        store.create_db_if_not_exists()
+        store.insert_todos(make_todos(5000))
+        steps = []
+
+        # ACT -- Run the code that is being tested
+        copied = backup.backup(
+            store,
+            self.path("backup.db"),
+            pages=10,
+            on_progress=lambda *step: steps.append(step),
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        copy = backends.load_backend("sqlite", self.path("backup.db"))
+        self.assertEqual(copy.get_todos(), store.get_todos())
+        self.assertGreater(len(steps), 1)
+        self.assertEqual(steps[-1][:2], (copied, copied))
+
+    def test_file_backup_copies_every_shard_under_a_shared_lock(self):
+        # ARRANGE -- Define testing environments & values
+        store = backends.load_backend("txt", self.path("db.txt"))
+        store.SHARD_SIZE = 100
+        store.insert_todos(make_todos(350))
+        locked = []
+
+        def writers_locked_out(copied, total, elapsed):
+            # A writer (another file descriptor) can't take the lock during the copy
+            fd = os.open(store._shard_dir(), os.O_RDONLY)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                locked.append(True)
+            finally:
+                os.close(fd)
+
+        # ACT -- Run the code that is being tested
+        copied = backup.backup(
+            store, self.path("copy.txt"), on_progress=writers_locked_out
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        copy = backends.load_backend("txt", self.path("copy.txt"))
+        copy.SHARD_SIZE = 100
+        self.assertEqual(copy.get_todos(), store.get_todos())
+        self.assertEqual(len(os.listdir(copy._shard_dir())), 4)
+        self.assertEqual(locked, [True] * 4)
+        self.assertEqual(copied, sum(os.path.getsize(p) for p in copy._paths()))
+
+    def test_sharded_backup_replaces_the_shards_of_an_older_one(self):
+        # ARRANGE -- An older backup, w/ more shards than the store has now
+        store = backends.load_backend("csv", self.path("db.csv"))
+        store.SHARD_SIZE = 100
+        store.insert_todos(make_todos(350))
+        backup.backup(store, self.path("copy.csv"))
+        for id in range(200, 350):
+            store.delete_todo(id)
+        os.remove(os.path.join(store._shard_dir(), "shard-000003.csv"))
+
+        # ACT -- Run the code that is being tested
+        backup.backup(store, self.path("copy.csv"))
+
+        # ASSERT -- Evaluate result and compare to expected value
+        copy = backends.load_backend("csv", self.path("copy.csv"))
+        copy.SHARD_SIZE = 100
+        self.assertEqual(copy.get_todos(), store.get_todos())
+        self.assertEqual(
+            sorted(os.listdir(copy._shard_dir())),
+            sorted(os.listdir(store._shard_dir())),
+        )
+        self.assertEqual(
+            sorted(os.listdir(self.directory.name)),
+            ["copy.csv.d", "db.csv.d"],
+        )
+
+    def test_file_backup_falls_back_to_reading_and_writing(self):
+        # ARRANGE -- Define testing environments & values
+        store = backends.load_backend("json", self.path("db.json"))
+        store.create_db_if_not_exists()
+        store.insert_todos(make_todos(1000))
+
+        # ACT -- Run the code that is being tested
+        with mock.patch("os.copy_file_range", side_effect=OSError), mock.patch(
+            "os.sendfile", side_effect=OSError
+        ):
+            backup.backup(store, self.path("copy.json"), chunk_size=1000)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        copy = backends.load_backend("json", self.path("copy.json"))
+        self.assertEqual(copy.get_todos(), store.get_todos())
+        with self.assertRaises(ValueError):
+            backup.backup(store, self.path("copy.csv"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+import build_zipapp
+
+
+class TestBuildZipapp(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_bundle_holds_only_bytecode_of_one_backend(self):
+        # ACT -- Run the code that is being tested
+        archive = build_zipapp.build(
+            "json", os.path.join(self.directory.name, "todo.pyz")
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        with zipfile.ZipFile(archive) as bundle:
+            self.assertEqual(
+                sorted(bundle.namelist()),
+                [
+                    "__main__.pyc",
+                    "backends.pyc",
+                    "bloom_filter.pyc",
+                    "changelog.pyc",
+                    "cli.pyc",
+                    "file_store.pyc",
+                    "json-files/database/db_controller.pyc",
+                    "memory.pyc",
+                    "metrics.pyc",
+                    "migrate.pyc",
+                    "profiling.pyc",
+                    "promotion.pyc",
+                    "replication.pyc",
+                    "tiering.pyc",
+                ],
+            )
+        with open(archive, "rb") as file:
+            self.assertTrue(file.readline().startswith(b"#!"))
+
+    def test_bundle_runs_the_cli(self):
+        # ARRANGE -- Define testing environments & values
+        archive = build_zipapp.build(
+            "txt", os.path.join(self.directory.name, "todo.pyz")
+        )
+
+        # ACT -- Run the code that is being tested
+        for args, stdin in [(["--batch", "-"], "a bundled\n"), (["--list"], "")]:
+            result = subprocess.run(
+                [sys.executable, "-I", archive, *args],
+                input=stdin,
+                cwd=self.directory.name,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertIn("[ ]  bundled", result.stdout)
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, "db.txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()
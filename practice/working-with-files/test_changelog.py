@@ -0,0 +1,167 @@
+import unittest
+from unittest import mock
+import io
+import os
+import sqlite3
+import tempfile
+import time
+
+import backends
+import changelog
+
+
+class TestChangeLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.log_path = self.path("todos.changes")
+        self.store = backends.load_backend("json", self.path("db.json"))
+        self.store.create_db_if_not_exists()
+        self.store.insert_todos(
+            [{"id": id, "msg": f"todo {id}", "complete": False} for id in range(5)]
+        )
+        self.log = changelog.ChangeLog(self.log_path)
+        self.db = changelog.LoggedStore(self.store, self.log)
+
+    def tearDown(self):
+        self.log.close()
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_logs_each_change_w_its_seq(self):
+        # ACT -- Run the code that is being tested
+        self.db.add_todo("new todo")
+        self.db.update_todo(1, "updated todo")
+        self.db.toggle_complete(2)
+        self.db.delete_todo(3)
+        self.db.delete_todo(42)  # Changes nothing, not logged
+        changes = list(changelog.read_changes(self.log_path))
+
+        # ASSERT -- Evaluate result and compare to expected value
+        for change in changes:
+            self.assertAlmostEqual(change.pop("ts"), time.time(), delta=60)
+        self.assertEqual(
+            changes,
+            [
+                {
+                    "seq": 1,
+                    "op": "add",
+                    "id": 5,
+                    "fields": {"msg": "new todo", "complete": False},
+                },
+                {"seq": 2, "op": "update", "id": 1, "fields": {"msg": "updated todo"}},
+                {"seq": 3, "op": "update", "id": 2, "fields": {"complete": True}},
+                {"seq": 4, "op": "delete", "id": 3},
+            ],
+        )
+        self.assertEqual(self.store.get_todo_by_id(5)["msg"], "new todo")
+
+    def test_applies_the_changes_since_a_seq_to_another_backend(self):
+        # ARRANGE -- Define testing environments & values
+        copy = backends.load_backend("sqlite", self.path("copy.db"))
+        copy.create_db_if_not_exists()
+        copy.insert_todos(self.store.get_todos())
+        self.db.update_todo(0, "already applied")
+        copy.update_todo(0, "already applied")
+        self.db.execute_batch(
+            [
+                ("add_todo", ("first",)),
+                ("add_todo", ("second",)),
+                ("toggle_complete", (5,)),
+                ("delete_todo", (1,)),
+                ("add_todo", ("third",)),
+            ]
+        )
+
+        # ACT -- Run the code that is being tested
+        last_seq, applied = changelog.apply_changes(
+            copy, changelog.read_changes(self.log_path, since=1), batch_size=2
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual((last_seq, applied), (6, 5))
+        self.assertEqual(copy.get_todos(), self.store.get_todos())
+
+    def test_seq_stops_before_a_change_the_target_failed_to_apply(self):
+        # ARRANGE -- The target's execute_batch() hits a SQLite error
+        copy = backends.load_backend("sqlite", self.path("copy.db"))
+        copy.create_db_if_not_exists()
+        copy.insert_todos(self.store.get_todos())
+        self.db.add_todo("new todo")
+        self.db.update_todo(1, "updated todo")
+        self.db.delete_todo(2)
+        progress = []
+
+        # ACT -- Run the code that is being tested
+        with mock.patch.object(
+            copy, "_execute_batch", side_effect=sqlite3.OperationalError("locked")
+        ), mock.patch("sys.stdout", io.StringIO()):
+            with self.assertRaises(RuntimeError) as raised:
+                changelog.apply_changes(
+                    copy,
+                    changelog.read_changes(self.log_path),
+                    on_progress=lambda *step: progress.append(step),
+                )
+
+        # ASSERT -- Only the add was applied, the seq goes no further
+        self.assertIn("Change 2", str(raised.exception))
+        self.assertEqual(progress, [(1, 1)])
+        self.assertEqual(copy.get_todo_by_id(5)["msg"], "new todo")
+        self.assertEqual(copy.get_todo_by_id(1)["msg"], "todo 1")
+
+    def test_seq_continues_after_a_cut_last_line(self):
+        # ARRANGE -- Define testing environments & values
+        for id in range(5):
+            self.db.toggle_complete(id)
+        self.log.close()
+        with open(self.log_path, "ab") as file:
+            file.write(b'{"seq":6,"op":"upd')  # Crashed while logging
+
+        # ACT -- Run the code that is being tested
+        self.log = changelog.ChangeLog(self.log_path)
+        changelog.LoggedStore(self.store, self.log).delete_todo(0)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        changes = list(changelog.read_changes(self.log_path))
+        self.assertEqual([change["seq"] for change in changes], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(changes[-1]["op"], "delete")
+        for since in range(8):
+            self.assertEqual(
+                [
+                    change["seq"]
+                    for change in changelog.read_changes(self.log_path, since)
+                ],
+                list(range(since + 1, 7)),
+            )
+
+    def test_todos_the_store_didnt_insert_are_not_logged(self):
+        # ARRANGE -- A store inserting nothing
+        self.db.update_todo(1, "updated todo")
+
+        # ACT + ASSERT -- The update before the failing add is still logged
+        with mock.patch.object(self.store, "insert_todos", return_value=0):
+            with self.assertRaises(RuntimeError):
+                self.db.add_todo("lost todo")
+            with self.assertRaises(RuntimeError):
+                self.db.execute_batch(
+                    [("toggle_complete", (2,)), ("add_todo", ("lost todo",))]
+                )
+        self.assertEqual(
+            [
+                (change["op"], change["id"])
+                for change in changelog.read_changes(self.log_path)
+            ],
+            [("update", 1), ("update", 2)],
+        )
+
+    def test_log_has_a_single_owner(self):
+        # ACT + ASSERT -- The log is already open in setUp()
+        with self.assertRaises(RuntimeError):
+            changelog.ChangeLog(self.log_path)
+        self.log.close()
+        self.log = changelog.ChangeLog(self.log_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
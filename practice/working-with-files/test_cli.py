@@ -0,0 +1,139 @@
+import unittest
+import io
+import json
+import os
+import subprocess
+import sys
+from unittest import mock
+
+import backends
+import cli
+import tiering
+
+
+class TestCLI(unittest.TestCase):
+    def setUp(self):
+        self.db_name = "test_cli.txt"
+
+    def tearDown(self):
+        cli.db = None
+        if os.path.exists(self.db_name):
+            os.remove(self.db_name)
+
+    def test_resolve_backend(self):
+        # ACT + ASSERT -- An explicit name wins over the env var, then the default
+        with mock.patch.dict(os.environ, {backends.BACKEND_ENV_VAR: "json"}):
+            self.assertEqual(backends.resolve_backend("csv"), "csv")
+            self.assertEqual(backends.resolve_backend(), "json")
+        with mock.patch.dict(os.environ, {backends.BACKEND_ENV_VAR: ""}):
+            self.assertEqual(backends.resolve_backend(), backends.DEFAULT_BACKEND)
+        with self.assertRaises(ValueError):
+            backends.resolve_backend("xml")
+
+    def test_main_runs_a_batch_on_the_selected_backend(self):
+        # ARRANGE -- Define testing environments & values
+        batch = io.StringIO("a first\na second\n# comment\n\nc 1\nd 0\n")
+
+        # ACT -- Run the code that is being tested
+        with mock.patch("sys.stdin", batch), mock.patch("sys.stdout", io.StringIO()):
+            cli.main(["--backend", "txt", "--db", self.db_name, "--batch", "-"])
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(cli.db.DB_NAME, self.db_name)
+        self.assertEqual(
+            cli.db.get_todos(), [{"id": 1, "msg": "second", "complete": True}]
+        )
+
+    def test_archive_is_read_and_written_along_w_the_store(self):
+        # ARRANGE -- Archive todo 0 w/ tiering.py, the way the cron job does
+        db_name, archive_db = "test_cli.json", "test_cli_archive.db"
+        for path in [db_name, f"{db_name}.touched.json", archive_db]:
+            self.addCleanup(lambda path=path: os.path.exists(path) and os.remove(path))
+        with mock.patch("sys.stdin", io.StringIO("a one\na two\nc 0\n")):
+            with mock.patch("sys.stdout", io.StringIO()):
+                cli.main(["--backend", "json", "--db", db_name, "--batch", "-"])
+        store = tiering.open_tiered_store("json", db_name, archive_db, archive_after=0)
+        store.archive_completed()
+        self.assertEqual(store.archive_completed(), 1)
+
+        # ACT -- Add a todo, then list the store through the CLI
+        argv = ["--backend", "json", "--db", db_name, "--archive", archive_db]
+        with mock.patch("sys.stdin", io.StringIO("a three\n")):
+            with mock.patch("sys.stdout", io.StringIO()):
+                cli.main(argv + ["--batch", "-"])
+        with mock.patch("sys.stdout", io.StringIO()) as stdout:
+            cli.main(argv + ["--list"])
+
+        # ASSERT -- The archived todo is listed and its id wasn't reused
+        ids = [int(line.split()[0]) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(ids, [0, 1, 2])
+        self.assertEqual(cli.db.get_todo_by_id(0)["msg"], "one")
+        with open(f"{db_name}.touched.json") as file:
+            self.assertIn("2", json.load(file))
+
+    def test_invalid_batch_applies_nothing(self):
+        # ARRANGE -- Define testing environments & values
+        batch = io.StringIO("a first\na second\nd three\n")
+
+        # ACT -- Run the code that is being tested
+        with mock.patch("sys.stdin", batch), mock.patch("sys.stdout", io.StringIO()):
+            with self.assertRaises(SystemExit) as exited:
+                cli.main(
+                    ["--backend", "txt", "--db", self.db_name]
+                    + ["--batch", "-", "--batch-size", "1"]
+                )
+
+        # ASSERT -- The invalid 3rd line is reported before the DB was touched
+        self.assertIn("Line 3", str(exited.exception))
+        self.assertFalse(os.path.exists(self.db_name))
+
+    def test_read_replica_needs_a_change_log(self):
+        # ARRANGE -- Define testing environments & values
+        argv = ["--backend", "txt", "--db", self.db_name, "--list"]
+
+        # ACT + ASSERT -- W/o a change log, the replicas would never catch up
+        for extra in (
+            ["--read-replica", "sqlite:replica.db"],
+            ["--read-replica", "sqlite:replica.db", "--max-replica-lag", "10"],
+            ["--max-replica-lag", "10"],
+        ):
+            with mock.patch("sys.stderr", io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit):
+                    cli.main(argv + extra)
+            self.assertIn("needs", stderr.getvalue())
+
+    def test_parse_batch_command(self):
+        # ACT + ASSERT -- Run the code that is being tested, Evaluate result
+        self.assertEqual(
+            cli.parse_batch_command("a buy milk"), ("add_todo", ("buy milk",))
+        )
+        self.assertEqual(
+            cli.parse_batch_command("e 3 new msg"),
+            ("update_todo", (3, "new msg", None)),
+        )
+        self.assertIsNone(cli.parse_batch_command("  # comment"))
+        with self.assertRaises(ValueError):
+            cli.parse_batch_command("d three")
+
+    def test_only_the_selected_backend_is_imported(self):
+        # ARRANGE -- Start from a fresh interpreter, nothing imported yet
+        code = (
+            "import sys, cli; cli.main(['--backend', 'txt', '--db', sys.argv[1], "
+            "'--list']); print(sorted({'sqlite3', 'json', 'csv'} & set(sys.modules)))"
+        )
+
+        # ACT -- Run the code that is being tested
+        result = subprocess.run(
+            [sys.executable, "-c", code, os.path.abspath(self.db_name)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
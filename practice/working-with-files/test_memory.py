@@ -0,0 +1,95 @@
+import unittest
+import os
+import tracemalloc
+
+import backends
+import memory
+
+
+class FakeStore:
+    """
+    Store whose get_todos() allocates about 1 MB
+    """
+
+    def get_todos(self):
+        return [bytes(1024) for _ in range(1024)]
+
+    def iter_todos(self):
+        yield from range(3)
+
+
+class TestMemoryTracker(unittest.TestCase):
+    def setUp(self):
+        self.db_name = "test_memory.txt"
+        store = backends.load_backend("txt", self.db_name)
+        store.create_db_if_not_exists()
+        store.insert_todos(
+            [{"id": id, "msg": f"todo {id}", "complete": False} for id in range(2000)]
+        )
+        self.store = store
+
+    def tearDown(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if os.path.exists(self.db_name):
+            os.remove(self.db_name)
+
+    def test_records_the_peak_per_call_and_per_row(self):
+        # ARRANGE -- Define testing environments & values
+        tracker = memory.MemoryTracker(self.store)
+
+        # ACT -- Run the code that is being tested
+        tracker.get_todos()
+        for _ in tracker.iter_todos():
+            pass
+        peaks = tracker.peaks()
+
+        # ASSERT -- Listing streams the todos, getting them loads them all
+        self.assertEqual(peaks["get_todos"]["rows"], 2000)
+        self.assertEqual(peaks["iter_todos"]["rows"], 2000)
+        self.assertGreater(peaks["get_todos"]["bytes_per_row"], 100)
+        self.assertLess(
+            peaks["iter_todos"]["peak_bytes"], peaks["get_todos"]["peak_bytes"] / 10
+        )
+        self.assertNotIn("add_todo", peaks)
+
+    def test_calls_during_a_listing_count_in_its_peak(self):
+        # ARRANGE -- Define testing environments & values
+        tracker = memory.MemoryTracker(FakeStore())
+
+        # ACT -- Run the code that is being tested
+        for _ in tracker.iter_todos():
+            tracker.get_todos()
+        peaks = tracker.peaks()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertGreater(peaks["get_todos"]["peak_bytes"], 1024 * 1024)
+        self.assertGreaterEqual(
+            peaks["iter_todos"]["peak_bytes"], peaks["get_todos"]["peak_bytes"]
+        )
+
+    def test_budgets_warn_or_fail(self):
+        # ARRANGE -- Define testing environments & values
+        budgets = memory.parse_budgets(["get_todos=10KB"])
+        warning = memory.MemoryTracker(self.store, budgets, "warn")
+        failing = memory.MemoryTracker(self.store, budgets, "fail")
+
+        # ACT + ASSERT -- Run the code that is being tested, Evaluate result
+        with self.assertWarns(memory.MemoryBudgetWarning):
+            self.assertEqual(len(warning.get_todos()), 2000)
+        with self.assertRaises(memory.MemoryBudgetError):
+            failing.get_todos()
+        with self.assertRaises(ValueError):
+            memory.MemoryTracker(self.store, {"get_all": 1})
+
+    def test_parse_size(self):
+        # ACT + ASSERT -- Run the code that is being tested, Evaluate result
+        self.assertEqual(memory.parse_size("512"), 512)
+        self.assertEqual(memory.parse_size("1.5kb"), 1536)
+        self.assertEqual(memory.parse_size("2 MB"), 2 * 1024**2)
+        with self.assertRaises(ValueError):
+            memory.parse_size("lots")
+
+
+if __name__ == "__main__":
+    unittest.main()
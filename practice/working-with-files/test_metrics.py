@@ -0,0 +1,160 @@
+import unittest
+import io
+import json
+import os
+import threading
+from unittest import mock
+
+import backends
+import cli
+import metrics
+
+
+class TestMeteredStore(unittest.TestCase):
+    def setUp(self):
+        self.db_name = "test_metrics.txt"
+        self.metrics_path = "test_metrics.json"
+        self.store = metrics.MeteredStore(backends.load_backend("txt", self.db_name))
+        self.store.create_db_if_not_exists()
+
+    def tearDown(self):
+        cli.db = None
+        for path in [self.db_name, self.metrics_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_counts_calls_and_file_bytes(self):
+        # ARRANGE -- Define testing environments & values
+        self.store.add_todo("first")
+        self.store.add_todo("second")
+
+        # ACT -- Run the code that is being tested
+        todos = list(self.store.iter_todos())
+        ops = self.store.snapshot()["ops"]
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(len(todos), 2)
+        self.assertEqual(ops["add_todo"]["calls"], 2)
+        self.assertEqual(ops["add_todo"]["errors"], 0)
+        self.assertGreater(ops["add_todo"]["bytes_written"], 0)
+        self.assertEqual(ops["iter_todos"]["rows"], 2)
+        self.assertEqual(ops["iter_todos"]["bytes_read"], os.path.getsize(self.db_name))
+        self.assertNotIn("delete_todo", ops)
+
+    def test_counts_compressed_bytes(self):
+        # ARRANGE -- Define testing environments & values
+        db_name = "test_metrics.json.gz"
+        self.addCleanup(os.remove, db_name)
+        store = metrics.MeteredStore(backends.load_backend("json", db_name))
+        store.create_db_if_not_exists()
+        store.insert_todos(
+            [{"id": id, "msg": f"todo {id}", "complete": False} for id in range(1000)]
+        )
+
+        # ACT -- Run the code that is being tested
+        store.add_todo("new todo")
+        todos = store.get_todos()
+        ops = store.snapshot()["ops"]
+
+        # ASSERT -- The gzipped bytes, not the decompressed ones
+        self.assertEqual(len(todos), 1001)
+        self.assertEqual(ops["add_todo"]["bytes_written"], os.path.getsize(db_name))
+        self.assertEqual(ops["get_todos"]["bytes_read"], os.path.getsize(db_name))
+
+    def test_counts_the_blocks_read_by_a_lookup(self):
+        # ARRANGE -- Define testing environments & values
+        self.store.insert_todos(
+            [{"id": id, "msg": f"todo {id}", "complete": False} for id in range(10_000)]
+        )
+
+        # ACT -- Run the code that is being tested
+        todo = self.store.get_todo_by_id(5000)
+        stats = self.store.snapshot()["ops"]["get_todo_by_id"]
+
+        # ASSERT -- The binary search reads a few blocks, not the whole file
+        self.assertEqual(todo["id"], 5000)
+        self.assertGreater(stats["bytes_read"], 0)
+        self.assertLess(stats["bytes_read"], os.path.getsize(self.db_name) / 4)
+
+    def test_concurrent_calls_count_their_own_bytes(self):
+        # ARRANGE -- Another thread is in the middle of an update_todo() call
+        self.store.add_todo("first")
+        entered, done = threading.Event(), threading.Event()
+
+        def blocked_update(*args):
+            entered.set()
+            done.wait(5)
+            return True
+
+        self.store.store.update_todo = blocked_update
+        writer = threading.Thread(target=self.store.update_todo, args=(0, "new"))
+        writer.start()
+        entered.wait(5)
+
+        # ACT -- Run the code that is being tested
+        try:
+            todos = list(self.store.iter_todos())
+        finally:
+            done.set()
+            writer.join()
+        ops = self.store.snapshot()["ops"]
+
+        # ASSERT -- The listing's reads aren't counted in the other thread's call
+        self.assertEqual(len(todos), 1)
+        self.assertEqual(ops["iter_todos"]["bytes_read"], os.path.getsize(self.db_name))
+        self.assertEqual(ops["update_todo"]["bytes_read"], 0)
+
+    def test_counts_errors(self):
+        # ACT -- Run the code that is being tested
+        with self.assertRaises(ValueError):
+            self.store.execute_batch([("drop_table", ())])
+
+        # ASSERT -- Evaluate result and compare to expected value
+        stats = self.store.snapshot()["ops"]["execute_batch"]
+        self.assertEqual((stats["calls"], stats["errors"]), (1, 1))
+
+    def test_percentiles_come_from_the_histogram(self):
+        # ARRANGE -- 98 calls of 3us, 2 calls of 5ms
+        stats = metrics.OpStats()
+        for _ in range(98):
+            stats.record(3_000)
+        for _ in range(2):
+            stats.record(5_000_000)
+
+        # ACT -- Run the code that is being tested
+        p50, p99 = stats.percentile(0.5), stats.percentile(0.99)
+
+        # ASSERT -- Upper bound of the bucket, capped at the slowest call
+        self.assertEqual(stats.calls, 100)
+        self.assertEqual(p50, 4e-6)
+        self.assertEqual(p99, 5e-3)
+
+    def test_cli_dumps_the_metrics_on_exit(self):
+        # ARRANGE -- Define testing environments & values
+        batch = io.StringIO("a first\na second\nd 0\n")
+
+        # ACT -- Run the code that is being tested
+        with mock.patch("sys.stdin", batch), mock.patch("sys.stdout", io.StringIO()):
+            cli.main(
+                [
+                    "--backend",
+                    "txt",
+                    "--db",
+                    self.db_name,
+                    "--batch",
+                    "-",
+                    "--metrics-file",
+                    self.metrics_path,
+                ]
+            )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        with open(self.metrics_path, "r") as file:
+            ops = json.load(file)["ops"]
+        self.assertEqual(ops["execute_batch"]["calls"], 1)
+        self.assertGreater(ops["execute_batch"]["bytes_written"], 0)
+        self.assertIn("execute_batch", metrics.format_stats(cli.db.snapshot()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import os
+
+import backends
+import migrate
+
+
+class TestMigrate(unittest.TestCase):
+    def setUp(self):
+        """
+        - Source is a csv store w/ a gap in its ids (todo 1 was deleted)
+        """
+        self.paths = ["test_migrate.csv"]
+        self.source = backends.load_backend("csv", "test_migrate.csv")
+        self.source.create_db_if_not_exists()
+        for msg in ["first", "second", "third", "fourth"]:
+            self.source.add_todo(msg)
+        self.source.update_todo(2, None, True)
+        self.source.delete_todo(1)
+
+    def tearDown(self):
+        for path in self.paths + [f"{path}.bloom" for path in self.paths]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_migrate_preserves_todos_through_every_backend(self):
+        # ARRANGE -- Chain csv -> sqlite -> json -> txt
+        expected = self.source.get_todos()
+        store = self.source
+
+        for name, db_name in [
+            ("sqlite", "test_migrate.db"),
+            ("json", "test_migrate.json"),
+            ("txt", "test_migrate.txt"),
+        ]:
+            self.paths.append(db_name)
+            target = backends.load_backend(name, db_name)
+            target.create_db_if_not_exists()
+
+            # ACT -- Run the code that is being tested (2 todos per batch)
+            migrated = migrate.migrate(store, target, batch_size=2)
+
+            # ASSERT -- Evaluate result and compare to expected value
+            self.assertEqual(migrated, 3)
+            self.assertEqual(target.get_todos(), expected)
+            store = target
+
+    def test_migrate_reports_progress_per_batch(self):
+        # ARRANGE -- Define testing environments & values
+        self.paths.append("test_migrate.db")
+        target = backends.load_backend("sqlite", "test_migrate.db")
+        target.create_db_if_not_exists()
+        progress = []
+
+        # ACT -- Run the code that is being tested
+        migrate.migrate(
+            self.source,
+            target,
+            batch_size=2,
+            on_progress=lambda rows, elapsed: progress.append(rows),
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(progress, [2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import io
+import os
+import tempfile
+from unittest import mock
+
+import cli
+import profiling
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+def outer():
+    return busy(20_000) + inner()
+
+
+def inner():
+    return busy(40_000)
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.directory.name, "test_profiling.txt")
+        self.profile_dir = os.path.join(self.directory.name, "profiles")
+
+    def tearDown(self):
+        cli.db = None
+        self.directory.cleanup()
+
+    def test_collapsed_stacks_follow_the_call_paths(self):
+        # ARRANGE -- Define testing environments & values
+        profiler = profiling.CommandProfiler(self.profile_dir)
+
+        # ACT -- Run the code that is being tested
+        profiler.run("outer", outer)
+
+        # ASSERT -- busy() is reached from outer() directly and through inner()
+        with open(os.path.join(self.profile_dir, "001-outer.collapsed"), "r") as file:
+            stacks = [line.rpartition(" ")[0] for line in file]
+        frames = [
+            [frame.split(" ")[0] for frame in stack.split(";")] for stack in stacks
+        ]
+        self.assertIn(["outer", "busy"], frames)
+        self.assertIn(["outer", "inner", "busy"], frames)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.profile_dir, "001-outer.prof"))
+        )
+
+    def test_cli_profiles_each_command(self):
+        # ARRANGE -- Define testing environments & values
+        inputs = iter(["a", "first", "h", "q"])
+        output = io.StringIO()
+
+        # ACT -- Run the code that is being tested
+        with mock.patch("builtins.input", lambda _="": next(inputs)), mock.patch(
+            "sys.stdout", output
+        ):
+            cli.main(
+                [
+                    "--backend",
+                    "txt",
+                    "--db",
+                    self.db_name,
+                    "--profile",
+                    "--profile-dir",
+                    self.profile_dir,
+                ]
+            )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(
+            sorted(os.listdir(self.profile_dir)),
+            [
+                "001-prompt_add_todo.collapsed",
+                "001-prompt_add_todo.prof",
+                "002-prompt_help.collapsed",
+                "002-prompt_help.prof",
+            ],
+        )
+        self.assertIn("Hot functions of 2 profiled command(s)", output.getvalue())
+        self.assertIsNone(cli.profiler)
+
+
+if __name__ == "__main__":
+    unittest.main()
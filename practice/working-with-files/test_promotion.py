@@ -0,0 +1,138 @@
+import unittest
+from unittest import mock
+import io
+import os
+import shutil
+
+import cli
+import promotion
+
+
+class TestPromotingStore(unittest.TestCase):
+    def setUp(self):
+        """
+        - Start on a json store which gets promoted once it holds 3 todos
+        """
+        self.db_name = "test_promotion.json"
+        self.target_db = "test_promotion.db"
+        self.state_path = "test_promotion_state.json"
+        self.store = self._open_store()
+
+    def tearDown(self):
+        for path in [self.db_name, self.target_db, self.state_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(f"{self.db_name}.d", ignore_errors=True)
+
+    def test_promotes_once_row_threshold_is_reached(self):
+        # ACT -- Run the code that is being tested
+        self.store.add_todo("first")
+        self.store.add_todo("second")
+        promoted_early = self.store.promoted
+        self.store.add_todo("third")
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertFalse(promoted_early)
+        self.assertTrue(self.store.promoted)
+        self.assertEqual(self.store.store.DB_NAME, self.target_db)
+        self.assertEqual(
+            [todo["msg"] for todo in self.store.get_todos()],
+            ["first", "second", "third"],
+        )
+
+    def test_old_store_is_kept_and_later_runs_resume_on_sqlite(self):
+        # ARRANGE -- Trigger the promotion, then keep writing to the new store
+        for msg in ["first", "second", "third"]:
+            self.store.add_todo(msg)
+        self.store.add_todo("fourth")
+
+        # ACT -- Run the code that is being tested
+        reopened = self._open_store()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(reopened.promoted)
+        self.assertEqual(len(reopened.get_todos()), 4)
+        self.assertTrue(os.path.exists(self.db_name))
+
+    def test_rollback_switches_back_to_the_old_store(self):
+        # ARRANGE -- Trigger the promotion
+        for msg in ["first", "second", "third"]:
+            self.store.add_todo(msg)
+
+        # ACT -- Run the code that is being tested
+        state = promotion.rollback(self.state_path)
+        reopened = self._open_store()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(state["previous"]["backend"], "json")
+        self.assertFalse(reopened.promoted)
+        self.assertEqual(reopened.row_count, 3)
+
+    def test_promotion_refuses_a_target_holding_todos(self):
+        # ARRANGE -- Promote, roll back, then delete a todo from the old store
+        for msg in ["first", "second", "third"]:
+            self.store.add_todo(msg)
+        promotion.rollback(self.state_path)
+        reopened = self._open_store()
+        reopened.delete_todo(2)
+
+        # ACT + ASSERT -- The old target still holds todo 2
+        with self.assertRaises(ValueError):
+            reopened.promote()
+        reopened.add_todo("fourth")  # Doesn't try to promote (nor fail) again
+        self.assertFalse(reopened.promoted)
+        self.assertEqual(
+            [todo["msg"] for todo in reopened.get_todos()],
+            ["first", "second", "fourth"],
+        )
+
+    def test_rollback_copies_back_into_every_shard(self):
+        # ARRANGE -- A sharded store, promoted, then a todo deleted from SQLite
+        self.store.store.SHARD_SIZE = 2
+        for msg in ["first", "second", "third"]:
+            self.store.add_todo(msg)
+        self.store.delete_todo(0)
+
+        # ACT -- Run the code that is being tested
+        promotion.rollback(self.state_path, copy_back=True)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        previous = promotion.backends.load_backend("json", self.db_name)
+        previous.SHARD_SIZE = 2
+        self.assertEqual([todo["id"] for todo in previous.get_todos()], [1, 2])
+        self.assertEqual(
+            sorted(os.listdir(f"{self.db_name}.d")),
+            ["shard-000000.json", "shard-000001.json"],
+        )
+
+    def test_cli_promotes_the_store_and_later_runs_resume_on_sqlite(self):
+        # ARRANGE -- Define testing environments & values
+        self.addCleanup(setattr, cli, "db", None)
+        argv = ["--backend", "json", "--db", self.db_name]
+        policy = ["--promote-max-rows", "3", "--promote-to", self.target_db]
+
+        # ACT -- Add 3 todos w/ a policy, then list them w/o one
+        with mock.patch.object(cli, "PROMOTION_STATE", self.state_path):
+            with mock.patch("sys.stdin", io.StringIO("a first\na second\na third\n")):
+                with mock.patch("sys.stdout", io.StringIO()):
+                    cli.main(argv + policy + ["--batch", "-"])
+            with mock.patch("sys.stdout", io.StringIO()) as stdout:
+                cli.main(argv + ["--list"])
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(promotion.read_state(self.state_path)["backend"], "sqlite")
+        self.assertEqual(cli.db.DB_NAME, self.target_db)
+        self.assertEqual(len(stdout.getvalue().splitlines()), 3)
+
+    def _open_store(self):
+        return promotion.PromotingStore(
+            "json",
+            self.db_name,
+            max_rows=3,
+            state_path=self.state_path,
+            target_db=self.target_db,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
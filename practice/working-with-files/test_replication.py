@@ -0,0 +1,120 @@
+import unittest
+import os
+import tempfile
+import threading
+import time
+
+import backends
+import changelog
+import replication
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the replica")
+        time.sleep(0.01)
+
+
+class TestReplication(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        store = backends.load_backend("json", self.path("db.json"))
+        store.create_db_if_not_exists()
+        self.log = changelog.ChangeLog(self.path("todos.changes"))
+        self.primary = changelog.LoggedStore(store, self.log)
+        self.threads = []
+
+    def tearDown(self):
+        for stop, thread in self.threads:
+            stop()
+            thread.join()
+        self.log.close()
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def start(self, target, stop):
+        thread = threading.Thread(target=target)
+        thread.start()
+        self.threads.append((stop, thread))
+
+    def write_todos(self):
+        for id in range(20):
+            self.primary.add_todo(f"todo {id}")
+        self.primary.toggle_complete(3)
+        self.primary.update_todo(4, "updated todo")
+        self.primary.delete_todo(5)
+
+    def test_replica_tails_the_log_of_a_shared_directory(self):
+        # ARRANGE -- Define testing environments & values
+        store = backends.load_backend("sqlite", self.path("replica.db"))
+        store.create_db_if_not_exists()
+        replica = replication.Replica(store, self.log.path, poll_interval=0.01)
+        self.start(replica.run, replica.stop)
+
+        # ACT -- Run the code that is being tested
+        self.write_todos()
+        wait_for(lambda: replica.seq == self.log.seq)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(store.get_todos(), self.primary.get_todos())
+        self.assertEqual(changelog.load_seq(store), 23)
+        status = replica.status()
+        self.assertEqual(status["applied"], 23)
+        self.assertGreater(status["apply_rate"], 0)
+        self.assertGreaterEqual(status["lag_seconds"], 0)
+
+    def test_replica_follows_the_primary_over_a_socket(self):
+        # ARRANGE -- Define testing environments & values
+        self.write_todos()
+        server = replication.serve(
+            self.log.path, f"unix:{self.path('primary.sock')}", poll_interval=0.01
+        )
+
+        def stop_server():
+            server.shutdown()
+            server.server_close()
+
+        self.start(server.serve_forever, stop_server)
+        store = backends.load_backend("txt", self.path("replica.txt"))
+        store.create_db_if_not_exists()
+        replica = replication.Replica(
+            store, f"unix:{self.path('primary.sock')}", poll_interval=0.01
+        )
+
+        # ACT -- Run the code that is being tested
+        self.start(replica.run, replica.stop)
+        wait_for(lambda: replica.seq == self.log.seq)
+        self.primary.add_todo("after the replica caught up")
+        wait_for(lambda: replica.seq == self.log.seq)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(store.get_todos(), self.primary.get_todos())
+
+    def test_reads_go_to_replicas_that_are_not_too_far_behind(self):
+        # ARRANGE -- Define testing environments & values
+        self.write_todos()
+        store = backends.load_backend("csv", self.path("replica.csv"))
+        store.create_db_if_not_exists()
+        replica = replication.Replica(store, self.log.path)
+        with open(self.log.path, "rb") as file:
+            replica.apply(file.readlines()[:10])
+        db = replication.ReplicatedStore(self.primary, [store], max_lag=None)
+        fresh_only = replication.ReplicatedStore(self.primary, [store], max_lag=5)
+
+        # ACT -- Run the code that is being tested
+        from_replica = db.get_todos()
+        from_primary = list(fresh_only.iter_todos())
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(len(from_replica), 10)
+        self.assertEqual(from_primary, self.primary.get_todos())
+        self.assertTrue(db.add_todo("written to the primary"))
+        self.assertEqual(len(db.get_todos()), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
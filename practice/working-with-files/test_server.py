@@ -0,0 +1,154 @@
+import unittest
+import asyncio
+import contextlib
+import io
+import os
+
+import async_store
+import server
+
+
+class TestTodoServer(unittest.TestCase):
+    def setUp(self):
+        """
+        - Serve a fresh SQLite store on a random free port
+        """
+        self.db_name = "test_server.db"
+
+    def tearDown(self):
+        if os.path.exists(self.db_name):
+            os.remove(self.db_name)
+
+    def test_crud_over_a_single_keep_alive_connection(self):
+        # ACT -- Run the code that is being tested
+        responses = asyncio.run(
+            self._run_client(
+                [
+                    ("POST", "/todos", {"msg": "first"}),
+                    ("POST", "/todos", {"msg": "second"}),
+                    ("GET", "/todos/1", None),
+                    ("PATCH", "/todos/1", {"msg": "updated"}),
+                    ("GET", "/todos/1", None),
+                    ("POST", "/todos/2/toggle", None),
+                    ("DELETE", "/todos/1", None),
+                    ("GET", "/todos/1", None),
+                    ("GET", "/todos", None),
+                ]
+            )
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(
+            responses,
+            [
+                (201, {"created": True}),
+                (201, {"created": True}),
+                (200, {"id": 1, "msg": "first", "complete": False}),
+                (200, {"updated": True}),
+                (200, {"id": 1, "msg": "updated", "complete": False}),
+                (200, {"complete": True}),
+                (204, None),
+                (404, {"error": "Not Found"}),
+                (200, [{"id": 2, "msg": "second", "complete": True}]),
+            ],
+        )
+
+    def test_listing_is_streamed_in_chunks(self):
+        # ARRANGE -- More todos than fit in a single chunk
+        todos = [
+            {"id": id, "msg": f"todo {id}", "complete": False}
+            for id in range(async_store.ITER_BATCH_SIZE * 2 + 1)
+        ]
+
+        # ACT -- Run the code that is being tested
+        responses = asyncio.run(
+            self._run_client([("GET", "/todos", None)], preload=todos)
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(responses, [(200, todos)])
+
+    def test_bad_requests_are_rejected(self):
+        # ACT -- Run the code that is being tested
+        responses = asyncio.run(
+            self._run_client(
+                [
+                    ("POST", "/todos", {}),
+                    ("PUT", "/todos/1", None),
+                    ("GET", "/unknown", None),
+                ]
+            )
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual([status for status, _ in responses], [400, 405, 404])
+
+    def test_invalid_fields_are_rejected(self):
+        # ACT -- Run the code that is being tested
+        responses = asyncio.run(
+            self._run_client(
+                [
+                    ("POST", "/todos", {"msg": "first"}),
+                    ("POST", "/todos", {"msg": 1}),
+                    ("POST", "/todos", {"msg": "two\nlines"}),
+                    ("PATCH", "/todos/1", {"msg": "a,b"}),
+                    ("PATCH", "/todos/1", {"complete": "yes"}),
+                    ("PATCH", "/todos/1", {}),
+                    ("PATCH", "/todos/1", {"msg": None, "complete": None}),
+                    ("PATCH", "/todos/1", {"msg": None, "complete": True}),
+                    ("GET", "/todos", None),
+                ]
+            )
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(
+            [status for status, _ in responses],
+            [201, 400, 400, 400, 400, 400, 400, 200, 200],
+        )
+        self.assertEqual(
+            responses[-1][1], [{"id": 1, "msg": "first", "complete": True}]
+        )
+
+    def test_store_errors_are_answered(self):
+        # ARRANGE -- A store failing on reads
+        def failing_get_todo_by_id(id):
+            raise OSError("Disk error")
+
+        # ACT -- Run the code that is being tested
+        with contextlib.redirect_stderr(io.StringIO()):
+            responses = asyncio.run(
+                self._run_client(
+                    [("GET", "/todos/1", None)],
+                    patches={"get_todo_by_id": failing_get_todo_by_id},
+                )
+            )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(responses, [(500, {"error": "Store error"})])
+
+    async def _run_client(self, requests, preload=None, patches=None):
+        store = async_store.open_async_store("sqlite", self.db_name)
+        for name, func in (patches or {}).items():
+            setattr(store.store, name, func)
+        http_server = await server.serve(store, port=0)
+        port = http_server.sockets[0].getsockname()[1]
+        if preload:
+            await store.insert_todos(preload)
+
+        try:
+            reader, writer = await asyncio.open_connection(server.HOST, port)
+            responses = [
+                await server.request(reader, writer, method, path, payload)
+                for method, path, payload in requests
+            ]
+            writer.close()
+            return responses
+        finally:
+            http_server.close()
+            await http_server.wait_closed()
+            await store.aclose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+
+import backends
+import changelog
+import shared_store
+
+
+class TestSharedStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.name = f"test-todos-{os.getpid()}"
+        self.store = backends.load_backend(
+            "json", os.path.join(self.directory.name, "db.json")
+        )
+        self.store.create_db_if_not_exists()
+        self.store.insert_todos(
+            [
+                {"id": id, "msg": f"todo {id}", "complete": id % 2 == 0}
+                for id in range(100)
+            ]
+        )
+        self.log = changelog.ChangeLog(os.path.join(self.directory.name, "changes"))
+        self.db = changelog.LoggedStore(self.store, self.log)
+        self.publisher = None
+        self.readers = []
+
+    def tearDown(self):
+        for reader in self.readers:
+            reader.close()
+        if self.publisher is not None:
+            self.publisher.close()
+        self.log.close()
+        self.directory.cleanup()
+
+    def publish(self, log_path=None):
+        self.publisher = shared_store.Publisher(self.store, self.name, log_path)
+        reader = shared_store.SharedTodos(self.name)
+        self.readers.append(reader)
+        return reader
+
+    def test_other_processes_read_the_published_todos(self):
+        # ARRANGE -- Define testing environments & values
+        self.publish()
+        code = (
+            "import shared_store; "
+            f"reader = shared_store.SharedTodos({self.name!r}); "
+            "print(reader.get_todo_by_id(42)); print(len(reader.get_todos()))"
+        )
+
+        # ACT -- Run the code that is being tested
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(shared_store.__file__)),
+        ).stdout
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(
+            output.splitlines(),
+            ["{'id': 42, 'msg': 'todo 42', 'complete': True}", "100"],
+        )
+
+    def test_changes_are_applied_in_place(self):
+        # ARRANGE -- Define testing environments & values
+        reader = self.publish(self.log.path)
+        generation = reader.generation
+
+        # ACT -- Run the code that is being tested
+        self.db.add_todo("new todo")
+        self.db.update_todo(1, "updated todo", True)
+        self.db.toggle_complete(2)
+        self.db.delete_todo(3)
+        changed = self.publisher.refresh()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(changed)
+        self.assertFalse(self.publisher.refresh())
+        self.assertEqual(self.publisher.rebuilds, 1)
+        self.assertEqual(reader.generation, generation + 2)
+        self.assertEqual(reader.get_todos(), self.store.get_todos())
+        self.assertEqual(
+            reader.get_todo_by_id(1), {"id": 1, "msg": "updated todo", "complete": True}
+        )
+        self.assertIsNone(reader.get_todo_by_id(3))
+        self.assertIsNone(reader.get_todo_by_id(1000))
+
+    def test_readers_follow_a_rebuild(self):
+        # ARRANGE -- Define testing environments & values
+        reader = self.publish()
+
+        # ACT -- Run the code that is being tested
+        self.store.delete_todo(0)
+        self.store.insert_todos([{"id": 0, "msg": "back", "complete": False}])
+        os.utime(self.store.DB_NAME, ns=(0, 0))  # Same size, another mtime
+        changed = self.publisher.refresh()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(changed)
+        self.assertEqual(self.publisher.rebuilds, 2)
+        self.assertEqual(reader.get_todo_by_id(0)["msg"], "back")
+        self.assertEqual(len(reader.get_todos()), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import os
+
+import tiering
+
+
+class TestTieredStore(unittest.TestCase):
+    def setUp(self):
+        """
+        - Primary tier is a json store, archive tier is a SQLite store
+        """
+        self.primary_db = "test_primary.json"
+        self.archive_db = "test_archive.db"
+        self.store = tiering.open_tiered_store(
+            "json", self.primary_db, self.archive_db, archive_after=60
+        )
+
+        for msg in ["first", "second", "third"]:
+            self.store.add_todo(msg)
+        self.store.update_todo(0, None, True)
+
+    def tearDown(self):
+        for path in [
+            self.primary_db,
+            f"{self.primary_db}.bloom",
+            self.archive_db,
+            self.store.touched_path,
+        ]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_archive_completed_moves_only_old_completed_todos(self):
+        # ACT -- Nothing is old enough yet, then pretend 2 minutes went by
+        moved_now = self.store.archive_completed()
+        moved_later = self.store.archive_completed(now=self._now() + 120)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(moved_now, 0)
+        self.assertEqual(moved_later, 1)
+        self.assertEqual(
+            [todo["id"] for todo in self.store.primary.get_todos()], [1, 2]
+        )
+        self.assertEqual([todo["id"] for todo in self.store.archive.get_todos()], [0])
+
+    def test_reads_consult_both_tiers(self):
+        # ARRANGE -- Archive the completed todo
+        self.store.archive_completed(now=self._now() + 120)
+
+        # ACT -- Run the code that is being tested
+        todos = self.store.get_todos()
+        archived = self.store.get_todo_by_id(0)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual([todo["id"] for todo in todos], [0, 1, 2])
+        self.assertEqual(archived, {"id": 0, "msg": "first", "complete": True})
+
+    def test_new_ids_never_reuse_archived_ids(self):
+        # ARRANGE -- Archive the completed todo
+        self.store.archive_completed(now=self._now() + 120)
+
+        # ACT -- Run the code that is being tested
+        self.store.add_todo("fourth")
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(self.store.get_todo_by_id(3)["msg"], "fourth")
+        self.assertEqual(self.store.get_todo_by_id(0)["msg"], "first")
+
+    def test_toggling_archived_todo_moves_it_back(self):
+        # ARRANGE -- Archive the completed todo
+        self.store.archive_completed(now=self._now() + 120)
+
+        # ACT -- Run the code that is being tested
+        completed = self.store.toggle_complete(0)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertFalse(completed)
+        self.assertIsNone(self.store.archive.get_todo_by_id(0))
+        self.assertEqual(
+            self.store.primary.get_todo_by_id(0),
+            {"id": 0, "msg": "first", "complete": False},
+        )
+
+    def test_failed_archive_keeps_todos_in_the_primary_tier(self):
+        # ARRANGE -- The archive stores none of the todos
+        self.store.archive.insert_todos = lambda todos: 0
+
+        # ACT -- Run the code that is being tested
+        with self.assertRaises(RuntimeError):
+            self.store.archive_completed(now=self._now() + 120)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(
+            [todo["id"] for todo in self.store.primary.get_todos()], [0, 1, 2]
+        )
+
+    def test_restored_todos_are_read_in_id_order(self):
+        # ARRANGE -- Archive todo 0 and move it back, at the end of the primary file
+        self.store.archive_completed(now=self._now() + 120)
+        self.store.update_todo(0, "first again")
+
+        # ACT -- Run the code that is being tested
+        todos = self.store.get_todos()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(
+            [todo["id"] for todo in self.store.primary.get_todos()], [1, 2, 0]
+        )
+        self.assertEqual([todo["id"] for todo in todos], [0, 1, 2])
+
+    def _now(self):
+        return max(self.store._get_touched().values())
+
+
+if __name__ == "__main__":
+    unittest.main()
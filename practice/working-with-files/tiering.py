@@ -0,0 +1,264 @@
+"""
+Hot / Cold tiered storage for Todos
+
+- The primary (hot) store holds incomplete and recently touched todos
+- Completed todos which haven't been touched for ARCHIVE_AFTER seconds are
+  moved into a SQLite archive (cold) store by archive_completed()
+- Reads consult both tiers, so callers don't need to know where a todo lives
+
+Usage (ex. from a cron job):
+python tiering.py --primary json --archive archive.db --days 30
+"""
+
+import argparse
+import heapq
+import json
+import os
+import time
+
+import backends
+
+# Completed todos untouched for longer than this are moved to the archive
+ARCHIVE_AFTER = 7 * 24 * 60 * 60  # 1 week in seconds
+
+
+class TieredStore:
+    """
+    Exposes the db_controller functions on top of a primary and an archive store
+    """
+
+    def __init__(self, primary, archive, archive_after: float = ARCHIVE_AFTER):
+        """
+        :param primary: db_controller module used as the hot tier
+        :param archive: db_controller module used as the cold tier
+        :param archive_after: Seconds a completed todo must stay untouched before
+            it is archived
+        """
+        self.primary = primary
+        self.archive = archive
+        self.archive_after = archive_after
+        self.DB_NAME = primary.DB_NAME  # Like a db_controller, the primary tier's
+        self.touched_path = f"{primary.DB_NAME}.touched.json"
+        self._touched = None  # Mapping of todo id -> last touched timestamp
+        self._next_id = None  # Cached once computed, see _allocate_id()
+
+    def create_db_if_not_exists(self):
+        self.primary.create_db_if_not_exists()
+        self.archive.create_db_if_not_exists()
+
+    def get_todos(self):
+        return list(self.iter_todos())
+
+    def iter_todos(self):
+        """
+        Yield the todos of both tiers merged in id order
+        - The primary tier is sorted first, todos moved back from the archive
+          are appended to it out of order (it's the small, hot tier)
+        - The archive is read in id order, the ids being its SQLite table's
+          INTEGER PRIMARY KEY
+        """
+        return heapq.merge(
+            sorted(self.primary.iter_todos(), key=lambda todo: todo["id"]),
+            self.archive.iter_todos(),
+            key=lambda todo: todo["id"],
+        )
+
+    def get_todo_by_id(self, id: int):
+        todo = self.primary.get_todo_by_id(id)
+        if todo is None:
+            todo = self.archive.get_todo_by_id(id)
+        return todo
+
+    def add_todo(self, msg: str):
+        """
+        Add a new todo to the primary tier
+        - Ids are allocated across both tiers, so a new todo can never reuse
+          the id of an archived one
+        """
+        todo = {"id": self._allocate_id(), "msg": msg, "complete": False}
+        self.primary.insert_todos([todo])
+        self._touch(todo["id"])
+        return True
+
+    def insert_todos(self, todos):
+        todos = list(todos)
+        count = self.primary.insert_todos(todos)
+        for todo in todos:
+            self._touch(todo["id"], save=False)
+        self._save_touched()
+        self._next_id = None
+        return count
+
+    def update_todo(self, id: int, new_msg: str = None, new_complete: bool = None):
+        """
+        Update a todo in whichever tier holds it
+        - Updating an archived todo moves it back into the primary tier
+        """
+        updated = self.primary.update_todo(id, new_msg, new_complete)
+        if not updated:
+            updated = self._restore(id, new_msg, new_complete)
+        if updated:
+            self._touch(id)
+        return updated
+
+    def toggle_complete(self, id: int):
+        todo = self.get_todo_by_id(id)
+        if todo is None:
+            return None
+        new_complete = not todo["complete"]
+        self.update_todo(id, None, new_complete)
+        return new_complete
+
+    def delete_todo(self, id: int):
+        deleted = self.primary.delete_todo(id) or self.archive.delete_todo(id)
+        if deleted:
+            self._get_touched().pop(str(id), None)
+            self._save_touched()
+        return deleted
+
+    def execute_batch(self, ops):
+        """
+        Run each operation in turn, as they may span both tiers
+        """
+        results = []
+        for name, args in ops:
+            if name not in (
+                "add_todo",
+                "update_todo",
+                "toggle_complete",
+                "delete_todo",
+            ):
+                raise ValueError(f"Unsupported batch operation '{name}'")
+            results.append(getattr(self, name)(*args))
+        return results
+
+    def archive_completed(self, now: float = None):
+        """
+        Move completed todos untouched for longer than archive_after into the archive
+        - Todos seen for the first time are stamped as touched now, so freshly
+          added (or pre-existing) todos always get the full grace period
+        :param now: Current timestamp, defaults to time.time()
+        :return: Number of todos moved to the archive
+        """
+        now = time.time() if now is None else now
+        touched = self._get_touched()
+
+        to_archive = []
+        for todo in self.primary.iter_todos():
+            key = str(todo["id"])
+            if key not in touched:
+                touched[key] = now
+            elif todo["complete"] and now - touched[key] >= self.archive_after:
+                to_archive.append(todo)
+
+        # Copy to the archive first, so a crash never loses a todo, and only
+        # remove the todos from the primary tier once they're all archived
+        if to_archive:
+            count = self.archive.insert_todos(to_archive)
+            if count != len(to_archive):
+                self._save_touched()
+                raise RuntimeError(
+                    f"Only {count} of {len(to_archive)} todos were archived, "
+                    f"none were removed from {self.primary.DB_NAME}"
+                )
+            # A single batch, each file is rewritten once instead of once per todo
+            self.primary.execute_batch(
+                [("delete_todo", (todo["id"],)) for todo in to_archive]
+            )
+            for todo in to_archive:
+                touched.pop(str(todo["id"]), None)
+
+        self._save_touched()
+        return len(to_archive)
+
+    def _restore(self, id: int, new_msg: str = None, new_complete: bool = None):
+        """
+        Move an archived todo back into the primary tier, applying an update
+        :return: Boolean representing if the todo was found in the archive
+        """
+        todo = self.archive.get_todo_by_id(id)
+        if todo is None:
+            return False
+
+        if new_msg is not None:
+            todo["msg"] = new_msg
+        if new_complete is not None:
+            todo["complete"] = new_complete
+
+        # Only removed from the archive once it's safely in the primary tier
+        if self.primary.insert_todos([todo]) != 1:
+            raise RuntimeError(f"Todo {id} couldn't be moved back from the archive")
+        self.archive.delete_todo(id)
+        return True
+
+    def _allocate_id(self):
+        """
+        Return the next unused id across both tiers
+        """
+        if self._next_id is None:
+            ids = [todo["id"] for todo in self.iter_todos()]
+            self._next_id = max(ids) + 1 if ids else 0
+        id = self._next_id
+        self._next_id += 1
+        return id
+
+    def _touch(self, id: int, save: bool = True):
+        self._get_touched()[str(id)] = time.time()
+        if save:
+            self._save_touched()
+
+    def _get_touched(self):
+        if self._touched is None:
+            self._touched = {}
+            if os.path.exists(self.touched_path):
+                with open(self.touched_path, "r") as file:
+                    self._touched = json.load(file)
+        return self._touched
+
+    def _save_touched(self):
+        with open(self.touched_path, "w") as file:
+            json.dump(self._get_touched(), file)
+
+
+def open_tiered_store(
+    primary_backend: str,
+    primary_db: str = None,
+    archive_db: str = "archive.db",
+    archive_after: float = ARCHIVE_AFTER,
+):
+    """
+    Load both tiers and return a ready to use TieredStore
+    :param primary_backend: Name of the backend used as the primary tier
+    :param primary_db: DB file of the primary tier, defaults to the backend's own
+    :param archive_db: SQLite file used as the archive tier
+    :param archive_after: Seconds a completed todo stays in the primary tier
+    :return: TieredStore
+    """
+    primary = backends.load_backend(primary_backend, primary_db)
+    archive = backends.load_backend("sqlite", archive_db)
+    store = TieredStore(primary, archive, archive_after)
+    store.create_db_if_not_exists()
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Move old completed todos from a primary store into a SQLite archive"
+    )
+    parser.add_argument("--primary", choices=backends.BACKENDS, required=True)
+    parser.add_argument("--primary-db", help="DB file of the primary store")
+    parser.add_argument("--archive", default="archive.db", help="SQLite archive file")
+    parser.add_argument(
+        "--days", type=float, default=ARCHIVE_AFTER / 86400, help="Archive threshold"
+    )
+    args = parser.parse_args()
+
+    store = open_tiered_store(
+        args.primary, args.primary_db, args.archive, args.days * 86400
+    )
+    moved = store.archive_completed()
+    print(f"Archived {moved} completed todos into {args.archive}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,66 +3,204 @@ Responsible for Interfacing with the DB (.txt file)
 
 Shape of File:
 id,msg,complete
+
+Sharded Layout (optional, enabled by setting SHARD_SIZE):
+db.txt.d/shard-000000.txt -> ids 0 to SHARD_SIZE - 1
+db.txt.d/shard-000001.txt -> ids SHARD_SIZE to 2 * SHARD_SIZE - 1
+...
+
+Bloom Filter (optional, enabled by setting BLOOM_FILTER):
+db.txt.bloom -> counters of the ids in the DB, see bloom_filter.py
 """
 
 import os
+import sys
+
+# The modules shared by the file backends live in the top directory, like the
+# CLI (see main.py), which isn't on sys.path when the controller is imported
+# on its own (ex. by its tests)
+_TOP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _TOP_DIR not in sys.path:
+    sys.path.append(_TOP_DIR)
+
+import bloom_filter  # noqa: E402
+import file_store  # noqa: E402
 
 DB_NAME = "db.txt"
 
+# Number of ids stored per shard file, None keeps every todo in DB_NAME
+SHARD_SIZE = None
+
+# Files of at least this many bytes are parsed by several processes in
+# get_todos(), None parses every file in this process
+PARALLEL_THRESHOLD = 64 * 1024 * 1024
+PARALLEL_WORKERS = None  # Processes parsing a big file, None for one per CPU
+
+# Keep a Bloom filter of the ids in <DB_NAME>.bloom, so looking up, updating or
+# deleting an id which isn't in the DB doesn't read the file (the first lookup
+# reads every file to build it)
+BLOOM_FILTER = False
+BLOOM_COUNTERS_PER_ID = 10  # W/ 7 hashes, ~1% of the missing ids get a scan
+BLOOM_HASHES = 7
+BLOOM_MIN_IDS = 1024  # Number of ids the smallest filter is sized for
+
+SEARCH_BLOCK = 512  # Bytes read per step of the binary search of a file
+
 # Create a mapping between strings and their boolean types
 bool_mapping = {"True": True, "False": False}
 
+# Returned by _search_file() when the ids of a file are out of order
+_UNSORTED = object()
+
+# Mapping of txt file path -> (stamp, whether its ids are in increasing order,
+# last id) of the files scanned by get_todo_by_id(), see _in_order()
+_id_order = {}
+
+# Mapping of thread id -> number of lock() blocks it entered and didn't exit
+# yet, only the outermost block of each thread locks
+_lock_depths = {}
+
+
+def lock(shared: bool = False):
+    """
+    Lock the DB against writes from other processes, w/ an advisory flock() on
+    DB_NAME (or on the shard directory when sharded), see file_store.Lock
+    - The write functions hold it exclusively, backup.py holds it shared while
+      copying the files, so a backup never copies a half written file
+    :param shared: Take a shared lock, held by several processes at once
+    :return: Context manager holding the lock
+    """
+    return file_store.Lock(
+        _shard_dir() if SHARD_SIZE else DB_NAME, shared, _lock_depths
+    )
+
+
+# Runs a write function w/ the DB locked exclusively (see lock())
+_exclusive = file_store.exclusive(lock)
+
 
 def create_db_if_not_exists():
     """
     Create a new DB (txt file) if one does not exist in the directory
     :return: None
     """
-    if not os.path.exists(DB_NAME):
-        with open(DB_NAME, "w") as file:
+    if SHARD_SIZE:
+        os.makedirs(_shard_dir(), exist_ok=True)
+    elif not os.path.exists(DB_NAME):
+        with _open(DB_NAME, "w") as file:
             pass
 
 
 def get_todos():
     """
     Return a list of all Todos in the DB
+    - Files of PARALLEL_THRESHOLD bytes or more are parsed in parallel
     :return: List of Todo Dictionaries
     """
     todos = []
-    with open(DB_NAME, "r") as file:
-        for line in file:
-            id, msg, complete = line.strip().split(",")
-            todos.append(
-                {"id": int(id), "msg": msg, "complete": bool_mapping[complete]}
-            )
+    for path in _paths():
+        if PARALLEL_THRESHOLD and os.path.getsize(path) >= PARALLEL_THRESHOLD:
+            todos += _read_parallel(path)
+        else:
+            todos += _iter_file(path)
     return todos
 
 
+def iter_todos():
+    """
+    Lazily yield every Todo in the DB, one file (or shard) at a time
+    :return: Generator of Todo Dictionaries
+    """
+    for path in _paths():
+        yield from _iter_file(path)
+
+
 def get_todo_by_id(id: int):
     """
     Retrieve a Todo of specified ID from the DB
+    - The file is binary searched (see _search_file()), and only scanned when
+      its ids are out of order
+    - The search may not notice ids out of order, so an id it doesn't find
+      is only missing from a file a scan found in order (see _in_order()),
+      the first miss of a file scans it
     :param id: The ID of the Todo to return
     :return: Todo of specified ID or None if not found
     """
-    with open(DB_NAME, "r") as file:
+    path = _path_for_id(id)
+    if not os.path.exists(path) or not _might_exist(id):
+        return None
+
+    todo = _search_file(path, id)
+    if todo is not None and todo is not _UNSORTED:
+        return todo
+    if todo is None and _in_order(path):
+        return None
+
+    # Scan the file, recording whether its ids are in order for the next misses
+    stamp = _stamp(path)
+    in_order, last_id = True, None
+    with _open(path, "r") as file:
         for line in file:
             id_, msg, complete = line.strip().split(",")
             if int(id_) == id:
                 return {"id": int(id_), "msg": msg, "complete": bool_mapping[complete]}
+            in_order = in_order and (last_id is None or int(id_) >= last_id)
+            last_id = int(id_)
+    _id_order[path] = (stamp, in_order, last_id)
 
 
+@_exclusive
 def add_todo(msg: str):
     """
     Create a new Todo and add it to the DB
     :param msg: The message of the new Todo
     :return: Boolean representing if the book was updated or not
     """
-    todo_count = _get_todos_count()
-    with open(DB_NAME, "a") as file:
-        file.write(f"{todo_count},{msg},{False}\n")
-        return True
+    new_id = _next_id()
+    path = _path_for_id(new_id)
+    if SHARD_SIZE:
+        os.makedirs(_shard_dir(), exist_ok=True)
 
+    stamps = {path: _stamp(path)}
+    with _open(path, "a") as file:
+        file.write(f"{new_id},{msg},{False}\n")
+    _update_bloom_filter(stamps, added=[new_id])
+    _update_id_order(path, stamps[path], [new_id])
+    return True
+
+
+@_exclusive
+def insert_todos(todos):
+    """
+    Add Todos which already have an ID (ex. when moving todos between DBs)
+    - Each todo is appended to the file (or shard) covering its id
+    - The ids are expected not to exist in the DB yet
+    :param todos: Iterable of Todo Dictionaries
+    :return: Number of todos inserted
+    """
+    # Group the todos by the file they belong in, so each file is opened once
+    todos_by_path = {}
+    for todo in todos:
+        todos_by_path.setdefault(_path_for_id(todo["id"]), []).append(todo)
 
+    if SHARD_SIZE and todos_by_path:
+        os.makedirs(_shard_dir(), exist_ok=True)
+
+    stamps = {path: _stamp(path) for path in todos_by_path}
+    for path, batch in todos_by_path.items():
+        with _open(path, "a") as file:
+            file.writelines(
+                f"{todo['id']},{todo['msg']},{todo['complete']}\n" for todo in batch
+            )
+        _update_id_order(path, stamps[path], [todo["id"] for todo in batch])
+    _update_bloom_filter(
+        stamps, added=[todo["id"] for batch in todos_by_path.values() for todo in batch]
+    )
+
+    return sum(len(batch) for batch in todos_by_path.values())
+
+
+@_exclusive
 def update_todo(id: int, new_msg: str = None, new_complete: bool = None):
     """
     Update a Todo Item in the DB
@@ -74,8 +212,13 @@ def update_todo(id: int, new_msg: str = None, new_complete: bool = None):
     todos = []  # Will hold the existing todos
     updated = False  # Whether or not the specified todo was successfully updated
 
+    # Only the file (or shard) holding the id needs to be rewritten
+    path = _path_for_id(id)
+    if not os.path.exists(path) or not _might_exist(id):
+        return False
+
     # Read through the todos and replace the specific todo with updated information
-    with open(DB_NAME, "r") as file:
+    with _open(path, "r") as file:
         for line in file:
             id_, msg, complete = line.strip().split(",")
             if int(id_) == id:
@@ -92,25 +235,30 @@ def update_todo(id: int, new_msg: str = None, new_complete: bool = None):
         return False
 
     # Write back all todos to the DB, including the updated todo
-    with open(DB_NAME, "w") as file:
+    stamps = {path: _stamp(path)}
+    with _open(path, "w") as file:
         for todo in todos:
             file.write(f"{todo}\n")
+    _update_bloom_filter(stamps)
     return True
 
 
+@_exclusive
 def toggle_complete(id: int):
     """
     Toggle the completion status of the todo
     :param id: ID of the todo
-    :return: Boolean value representing completion status after toggle
+    :return: Boolean value representing completion status after toggle,
+        None if there is no todo w/ that id
     """
     todo = get_todo_by_id(id)
-    todo_complete = todo["complete"]
     if todo:
-        update_todo(id, None, (not todo_complete))
-    return not todo_complete
+        new_complete = not todo["complete"]
+        update_todo(id, None, new_complete)
+        return new_complete
 
 
+@_exclusive
 def delete_todo(id: int):
     """
     Delete the TODO w/ specified ID from the DB
@@ -119,25 +267,507 @@ def delete_todo(id: int):
     """
     todos = []  # Will hold the existing todos
 
+    # Only the file (or shard) holding the id needs to be rewritten
+    path = _path_for_id(id)
+    if not os.path.exists(path) or not _might_exist(id):
+        return False
+
+    deleted = 0  # Number of todos found w/ the specified id
+
     # Read through the todos and filter out the desired todo
-    with open(DB_NAME, "r") as file:
+    with _open(path, "r") as file:
         for line in file:
             id_, msg, complete = line.strip().split(",")
             if int(id_) != id:
                 todos.append(f"{id_},{msg},{complete}")
+            else:
+                deleted += 1
+
+    if not deleted:
+        return False
 
     # Write back all todos to the DB, including the updated todo
-    with open(DB_NAME, "w") as file:
+    stamps = {path: _stamp(path)}
+    with _open(path, "w") as file:
         for todo in todos:
             file.write(f"{todo}\n")
+    _update_bloom_filter(stamps, removed=[id] * deleted)
 
     return True
 
 
+@_exclusive
+def execute_batch(ops):
+    """
+    Run many operations, reading and writing each file (or shard) involved only once
+    - Results are the same as calling the functions one after the other
+    :param ops: List of (function name, args) tuples, the supported functions being
+        ("add_todo", (msg,)), ("update_todo", (id, new_msg, new_complete)),
+        ("toggle_complete", (id,)) and ("delete_todo", (id,))
+    :return: List of results, one per operation
+    """
+    loaded = {}  # Mapping of path -> _LoadedFile of the files read so far
+    changed = set()  # Paths of the files which need to be written back
+    stamps = {}  # Mapping of path -> _stamp() of the files read, for the filter
+    added, removed = [], []  # Ids added to / removed from the DB
+
+    def file_for(id):
+        path = _path_for_id(id)
+        if path not in loaded:
+            stamps[path] = _stamp(path)
+            loaded[path] = _LoadedFile(
+                _read_todos(path) if os.path.exists(path) else []
+            )
+        return path, loaded[path]
+
+    results = []
+    for name, args in ops:
+        if name == "add_todo":
+            new_id = _next_id(loaded)
+            path, file = file_for(new_id)
+            file.add({"id": new_id, "msg": args[0], "complete": False})
+            changed.add(path)
+            added.append(new_id)
+            results.append(True)
+
+        elif name in ("update_todo", "toggle_complete"):
+            path, file = file_for(args[0])
+            matches = file.by_id.get(args[0])
+            if not matches:
+                results.append(False if name == "update_todo" else None)
+                continue
+
+            if name == "update_todo":
+                _, new_msg, new_complete = args
+            else:
+                new_msg, new_complete = None, not matches[0]["complete"]
+            for todo in matches:
+                if new_msg is not None:
+                    todo["msg"] = new_msg
+                if new_complete is not None:
+                    todo["complete"] = new_complete
+            changed.add(path)
+            results.append(True if name == "update_todo" else new_complete)
+
+        elif name == "delete_todo":
+            path, file = file_for(args[0])
+            removed += [args[0]] * len(file.by_id.get(args[0], ()))
+            deleted = file.remove(args[0])
+            if deleted:
+                changed.add(path)
+            results.append(deleted)
+
+        else:
+            raise ValueError(f"Unsupported batch operation '{name}'")
+
+    if SHARD_SIZE and changed:
+        os.makedirs(_shard_dir(), exist_ok=True)
+    for path in changed:
+        _write_todos(loaded[path].live(), path)
+    if changed:
+        _update_bloom_filter(
+            {path: stamps[path] for path in changed}, added=added, removed=removed
+        )
+
+    return results
+
+
+class _LoadedFile:
+    """
+    Todos of a single file held in memory by execute_batch(), indexed by id
+    """
+
+    def __init__(self, todos):
+        self.todos = todos
+        self.by_id = {}  # Mapping of id -> todos w/ that id (ids may be repeated)
+        self.removed = set()  # id() of the deleted todos, dropped when written
+        for todo in todos:
+            self.by_id.setdefault(todo["id"], []).append(todo)
+
+    def __len__(self):
+        return len(self.todos) - len(self.removed)
+
+    def add(self, todo):
+        self.todos.append(todo)
+        self.by_id.setdefault(todo["id"], []).append(todo)
+
+    def remove(self, todo_id):
+        matches = self.by_id.pop(todo_id, [])
+        self.removed.update(id(todo) for todo in matches)
+        return bool(matches)
+
+    def live(self):
+        return [todo for todo in self.todos if id(todo) not in self.removed]
+
+
+def _might_exist(id: int):
+    """
+    Check the Bloom filter for an id, before reading the file which would hold it
+    (see bloom_filter.might_exist())
+    :param id: ID of the todo
+    :return: False if there is certainly no todo w/ that id, True if there may be
+    """
+    if not BLOOM_FILTER:
+        return True
+
+    path = _path_for_id(id)
+    # Shared, so that no write changes the files while the filter is checked
+    with lock(shared=True):
+        return bloom_filter.might_exist(
+            _bloom_path(), id, {path: _stamp(path)}, _build_bloom_filter
+        )
+
+
+def _update_bloom_filter(stamps, added=(), removed=()):
+    """
+    Count the ids added to / removed from the DB by a write in the Bloom filter
+    (see bloom_filter.update())
+    :param stamps: Mapping of path -> _stamp() of the files written, from before
+        they were written
+    :param added: Ids added to the DB
+    :param removed: Ids removed from the DB, once per todo removed
+    """
+    if not BLOOM_FILTER:
+        return
+    bloom_filter.update(
+        _bloom_path(),
+        stamps,
+        {path: _stamp(path) for path in stamps},
+        added,
+        removed,
+        BLOOM_COUNTERS_PER_ID,
+        _build_bloom_filter,
+    )
+
+
+def _build_bloom_filter():
+    """
+    Build the Bloom filter from every id in the DB, reading every file
+    :return: Open bloom_filter.BloomFilter
+    """
+    files = {
+        path: (_stamp(path), (todo["id"] for todo in _iter_file(path)))
+        for path in _paths()
+        if os.path.exists(path)
+    }
+    return bloom_filter.BloomFilter.build(
+        _bloom_path(), files, BLOOM_COUNTERS_PER_ID, BLOOM_HASHES, BLOOM_MIN_IDS
+    )
+
+
 def _get_todos_count():
     """
     Return the number of todos in the DB
     :return: Integer representing the number of todos in the DB
     """
-    with open(DB_NAME, "r") as file:
-        return len(file.readlines())
+    count = 0
+    for path in _paths():
+        with _open(path, "r") as file:
+            count += len(file.readlines())
+    return count
+
+
+def _next_id(loaded=None):
+    """
+    Return the id to assign to the next new todo
+    - Unsharded DBs keep using the number of todos as the next id
+    - Sharded DBs use the highest id of the last non-empty shard + 1,
+      so adding a todo never has to read every shard
+    :param loaded: Mapping of path -> _LoadedFile already in memory
+        (see execute_batch), used instead of reading those files
+    :return: Integer id for the next todo
+    """
+    loaded = loaded or {}
+    if not SHARD_SIZE:
+        if DB_NAME in loaded:
+            return len(loaded[DB_NAME])
+        return _get_todos_count()
+
+    for path in reversed(_paths(extra=loaded)):
+        if path in loaded:
+            ids = loaded[path].by_id.keys()
+        else:
+            ids = [todo["id"] for todo in _read_todos(path)]
+        if ids:
+            return max(ids) + 1
+    return 0
+
+
+def _read_todos(path):
+    """
+    Read every todo stored in a single txt file
+    :param path: Path of the txt file (DB_NAME or a shard)
+    :return: List of Todo Dictionaries
+    """
+    return list(_iter_file(path))
+
+
+def _iter_file(path):
+    """
+    Lazily yield the todos stored in a single txt file, one line at a time
+    :param path: Path of the txt file (DB_NAME or a shard)
+    :return: Generator of Todo Dictionaries
+    """
+    with _open(path, "r") as file:
+        for line in file:
+            id, msg, complete = line.strip().split(",")
+            yield {"id": int(id), "msg": msg, "complete": bool_mapping[complete]}
+
+
+def _search_file(path, id: int):
+    """
+    Binary search a txt file for a todo, as new ids are appended in increasing order
+    - Each step reads the block of bytes around the middle of the range left,
+      from the start of the line holding the middle byte, and parses its id:
+      ~log2(lines) blocks of SEARCH_BLOCK bytes are read
+    - The file is read unbuffered through _open(), so every block shows up in
+      the bytes read by metrics.MeteredStore
+    - Ids out of order (ex. inserted by a migration, or reused by add_todo()
+      after deletes) are detected when a line's id isn't between the ids of
+      the lines already read around it, the first and the last line included
+      (an id repeated out of order the search doesn't notice may return
+      another copy of it than the scan)
+    - add_todo() gives an unsharded DB the number of todos as the next id, so
+      once a todo other than the last one is deleted new ids go out of order,
+      and lookups of that file are scans again
+    :param path: Path of the txt file (DB_NAME or a shard)
+    :param id: ID of the todo
+    :return: Todo Dictionary, None if not found, _UNSORTED if ids out of order
+        were met (the file has to be scanned then)
+    """
+    with lock(shared=True), _open(path, "rb", buffering=0) as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return None
+
+        def read(start, end):
+            file.seek(start)
+            return file.read(end - start)
+
+        def line_start(low, offset):
+            # Return the start of the line holding the byte at offset, or low
+            while offset > low:
+                block_start = max(low, offset - SEARCH_BLOCK)
+                newline = read(block_start, offset).rfind(b"\n")
+                if newline != -1:
+                    return block_start + newline + 1
+                offset = block_start
+            return low
+
+        def line_at(start):
+            # Return the line starting at start (w/o its newline) and its id
+            line = b""
+            while start + len(line) < size:
+                block = read(start + len(line), start + len(line) + SEARCH_BLOCK)
+                newline = block.find(b"\n")
+                if newline != -1:
+                    line += block[:newline]
+                    break
+                line += block
+            comma = line.find(b",")
+            return line, int(line[:comma]) if comma != -1 else None
+
+        # Every id is between the first one and the last one
+        _, low = line_at(0)
+        _, high = line_at(line_start(0, size - 1))
+        if low is None or high is None:
+            return _UNSORTED
+
+        # Lines starting before lo have smaller ids, lines from hi on don't
+        lo, hi, found = 0, size, None
+        while lo < hi:
+            start = line_start(lo, (lo + hi) // 2)
+            line, line_id = line_at(start)
+            if line_id is None or not low <= line_id <= high:
+                return _UNSORTED
+            if line_id < id:
+                lo, low = start + len(line) + 1, line_id
+            else:
+                hi, high, found = start, line_id, line if line_id == id else None
+
+    if found is None:
+        return None
+    id_, msg, complete = found.decode().strip().split(",")
+    return {"id": int(id_), "msg": msg, "complete": bool_mapping[complete]}
+
+
+def _in_order(path):
+    """
+    Return whether the ids of a txt file are known to be in increasing order
+    - Known from the last scan of get_todo_by_id() (and the appends made by
+      this process since, see _update_id_order()), as long as the file didn't
+      change (see _stamp())
+    """
+    known = _id_order.get(path)
+    return known is not None and known[1] and known[0] == _stamp(path)
+
+
+def _update_id_order(path, stamp, ids):
+    """
+    Keep the order of a txt file known (see _in_order()) after appending ids to it
+    :param stamp: _stamp() of the file before the ids were appended
+    :param ids: Ids appended, in file order
+    """
+    known = _id_order.pop(path, None)
+    if known is None or known[0] != stamp:
+        return
+    _, in_order, last_id = known
+    for id in ids:
+        in_order = in_order and (last_id is None or id >= last_id)
+        last_id = id
+    _id_order[path] = (_stamp(path), in_order, last_id)
+
+
+def _read_parallel(path, workers: int = None):
+    """
+    Read every todo of a big txt file, parsed by several processes
+    - The file is split at newlines into one range of bytes per process
+    - Each process sends back its todos as columns (ids, messages joined by
+      newlines, completion flags), a lot faster to pickle than dictionaries,
+      and the dictionaries are built here in file order
+    - Needs os.fork() (the controller can't be imported by name from a new
+      interpreter), the file is parsed in this process w/o it, w/ one CPU, or
+      while other threads run (ex. AsyncStore's), as a forked child may
+      inherit locks they hold and deadlock
+    :param path: Path of the txt file (DB_NAME or a shard)
+    :param workers: Number of processes, defaults to PARALLEL_WORKERS
+    :return: List of Todo Dictionaries
+    """
+    import multiprocessing
+    import threading
+
+    workers = workers or PARALLEL_WORKERS or os.cpu_count() or 1
+    if (
+        workers < 2
+        or "fork" not in multiprocessing.get_all_start_methods()
+        or threading.active_count() > 1
+    ):
+        return list(_iter_file(path))
+
+    context = multiprocessing.get_context("fork")
+    processes = []
+    for start, end in _chunk_bounds(path, workers):
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_parse_chunk, args=(path, start, end, sender), daemon=True
+        )
+        process.start()
+        sender.close()
+        processes.append((process, receiver))
+
+    todos = []
+    try:
+        for _, receiver in processes:
+            chunk = receiver.recv()
+            if isinstance(chunk, Exception):
+                raise chunk
+            ids, messages, completes = chunk
+            todos += [
+                {"id": id, "msg": msg, "complete": complete == 1}
+                for id, msg, complete in zip(
+                    ids.tolist(), messages.split("\n"), completes
+                )
+            ]
+    finally:
+        for process, receiver in processes:
+            receiver.close()
+            process.join()
+    return todos
+
+
+def _chunk_bounds(path, count: int):
+    """
+    Split a file into ranges of whole lines of about the same size
+    :return: List of (start, end) byte offsets
+    """
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, "rb") as file:
+        for i in range(1, count):
+            file.seek(max(size * i // count, offsets[-1]))
+            file.readline()  # To the start of the next line
+            offsets.append(file.tell())
+    offsets.append(size)
+    return [(start, end) for start, end in zip(offsets, offsets[1:]) if start < end]
+
+
+def _parse_chunk(path, start: int, end: int, connection):
+    """
+    Parse the lines of a range of bytes of a txt file (run by _read_parallel())
+    :param connection: multiprocessing Connection the columns are sent to
+    """
+    import array
+
+    try:
+        with open(path, "rb") as file:
+            file.seek(start)
+            lines = file.read(end - start).decode().split("\n")
+        if not lines[-1]:
+            lines.pop()  # The range ends w/ a newline (unless the file doesn't)
+        ids, messages, completes = array.array("q"), [], bytearray()
+        for line in lines:
+            id, msg, complete = line.strip().split(",")
+            ids.append(int(id))
+            messages.append(msg)
+            completes.append(bool_mapping[complete])
+        result = ids, "\n".join(messages), bytes(completes)
+    except Exception as e:
+        result = e
+    connection.send(result)
+    connection.close()
+
+
+def _write_todos(todos, path=None):
+    """
+    Writes a list of dictionaries into a txt file
+    :param todos: Dictionary w/ following keys: "id", "msg", "complete"
+    :param path: File to write to, defaults to DB_NAME
+    """
+    with _open(path or DB_NAME, "w") as file:
+        file.writelines(
+            f"{todo['id']},{todo['msg']},{todo['complete']}\n" for todo in todos
+        )
+
+
+def _open(path, mode="r", **kwargs):
+    """
+    Open a DB file, every DB file is opened through here (see metrics.py)
+    :param path: Path of the file (DB_NAME or a shard)
+    :return: File object
+    """
+    return open(path, mode, **kwargs)
+
+
+def _bloom_path():
+    """
+    Return the path of the Bloom filter of the DB (ex. db.txt.bloom)
+    """
+    return f"{DB_NAME}.bloom"
+
+
+# Shared w/ the other file controllers, see file_store.py
+_stamp = file_store.stamp
+_suffixes = file_store.suffixes
+
+
+def _shard_dir():
+    """
+    Return the directory holding the shard files (ex. db.txt.d)
+    """
+    return file_store.shard_dir(DB_NAME)
+
+
+def _path_for_id(id: int):
+    """
+    Return the path of the file which holds (or will hold) the todo w/ specified ID
+    :return: DB_NAME, or the shard file covering the id when sharding is enabled
+    """
+    return file_store.path_for_id(DB_NAME, SHARD_SIZE, id)
+
+
+def _paths(extra=()):
+    """
+    Return the paths of every file making up the DB, ordered by id range
+    :param extra: Shard paths to include even if they don't exist on disk yet
+    """
+    return file_store.paths(DB_NAME, SHARD_SIZE, extra)
@@ -1,6 +1,10 @@
 import unittest
+from unittest import mock
 import db_controller as controller
 import os
+import sys
+import threading
+import shutil
 
 
 class TestDBController(unittest.TestCase):
@@ -28,8 +32,9 @@ class TestDBController(unittest.TestCase):
         - Works just like afterEach in Jest
         """
         # If the db exists (.txt file), remove it
-        if os.path.exists(self.db_name):
-            os.remove(self.db_name)
+        for path in [self.db_name, f"{self.db_name}.bloom"]:
+            if os.path.exists(path):
+                os.remove(path)
 
     def test_create_db_if_not_exists(self):
         # ARRANGE -- Define testing environments & values
@@ -120,6 +125,363 @@ class TestDBController(unittest.TestCase):
         self.assertTrue(deleted)
         self.assertEqual(len(todos), 0)
 
+    def test_execute_batch(self):
+        # ARRANGE -- Define testing environments & values
+        ops = [
+            ("add_todo", ("first",)),
+            ("add_todo", ("second",)),
+            ("update_todo", (1, "first updated", None)),
+            ("toggle_complete", (2,)),
+            ("delete_todo", (0,)),
+            ("delete_todo", (5,)),
+            ("toggle_complete", (5,)),
+        ]
+
+        # ACT -- Run the code that is being tested
+        results = controller.execute_batch(ops)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(results, [True, True, True, True, True, False, None])
+        self.assertEqual(
+            controller.get_todos(),
+            [
+                {"id": 1, "msg": "first updated", "complete": False},
+                {"id": 2, "msg": "second", "complete": True},
+            ],
+        )
+        with self.assertRaises(ValueError):
+            controller.execute_batch([("get_todos", ())])
+
+
+class TestShardedDBController(unittest.TestCase):
+    def setUp(self):
+        """
+        - Store every 2 ids in their own shard file under test_db.txt.d/
+        """
+        self.db_name = "test_db.txt"
+        controller.DB_NAME = self.db_name
+        controller.SHARD_SIZE = 2
+        controller.create_db_if_not_exists()
+
+        for i in range(5):
+            controller.add_todo(f"todo {i}")
+
+    def tearDown(self):
+        controller.SHARD_SIZE = None
+        shutil.rmtree(f"{self.db_name}.d", ignore_errors=True)
+        if os.path.exists(f"{self.db_name}.bloom"):
+            os.remove(f"{self.db_name}.bloom")
+
+    def test_add_todo_creates_shards(self):
+        # ASSERT -- 5 todos w/ 2 ids per shard should span 3 shard files
+        self.assertEqual(
+            sorted(os.listdir(f"{self.db_name}.d")),
+            ["shard-000000.txt", "shard-000001.txt", "shard-000002.txt"],
+        )
+
+    def test_get_todos_streams_shards_in_order(self):
+        # ACT -- Run the code that is being tested
+        todos = controller.get_todos()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual([todo["id"] for todo in todos], [0, 1, 2, 3, 4])
+        self.assertEqual(controller.get_todo_by_id(3)["msg"], "todo 3")
+        self.assertIsNone(controller.get_todo_by_id(10))
+
+    def test_update_and_delete_only_touch_one_shard(self):
+        # ARRANGE -- Remember the modification times of the untouched shards
+        shard_dir = f"{self.db_name}.d"
+        first = os.path.join(shard_dir, "shard-000000.txt")
+        last = os.path.join(shard_dir, "shard-000002.txt")
+        mtimes = (os.stat(first).st_mtime_ns, os.stat(last).st_mtime_ns)
+
+        # ACT -- Run the code that is being tested
+        updated = controller.update_todo(2, "updated", True)
+        deleted = controller.delete_todo(3)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(updated)
+        self.assertTrue(deleted)
+        self.assertEqual(
+            controller.get_todo_by_id(2), {"id": 2, "msg": "updated", "complete": True}
+        )
+        self.assertIsNone(controller.get_todo_by_id(3))
+        self.assertEqual(
+            (os.stat(first).st_mtime_ns, os.stat(last).st_mtime_ns), mtimes
+        )
+        self.assertFalse(controller.update_todo(10, "Nonexistent Todo"))
+
+    def test_execute_batch_across_shards(self):
+        # ACT -- Run the code that is being tested
+        results = controller.execute_batch(
+            [
+                ("add_todo", ("todo 5",)),
+                ("add_todo", ("todo 6",)),
+                ("toggle_complete", (6,)),
+                ("delete_todo", (0,)),
+            ]
+        )
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(results, [True, True, True, True])
+        self.assertEqual(
+            [todo["id"] for todo in controller.get_todos()], [1, 2, 3, 4, 5, 6]
+        )
+        self.assertTrue(controller.get_todo_by_id(6)["complete"])
+        self.assertIn("shard-000003.txt", os.listdir(f"{self.db_name}.d"))
+
+
+class TestParallelDBController(unittest.TestCase):
+    def setUp(self):
+        """
+        - Parse every file w/ 3 processes, whatever its size and the CPU count
+        """
+        self.db_name = "test_db.txt"
+        controller.DB_NAME = self.db_name
+        controller.PARALLEL_THRESHOLD = 1
+        controller.PARALLEL_WORKERS = 3
+        controller.create_db_if_not_exists()
+        controller.insert_todos(
+            [{"id": i, "msg": f"todo {i}", "complete": i % 3 == 0} for i in range(1000)]
+        )
+
+    def tearDown(self):
+        controller.PARALLEL_THRESHOLD = 64 * 1024 * 1024
+        controller.PARALLEL_WORKERS = None
+        for path in [self.db_name, f"{self.db_name}.bloom"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_get_todos_merges_chunks_in_id_order(self):
+        # ACT -- Run the code that is being tested
+        todos = controller.get_todos()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(todos, list(controller.iter_todos()))
+        self.assertEqual([todo["id"] for todo in todos], list(range(1000)))
+        self.assertEqual(len(controller._chunk_bounds(self.db_name, 3)), 3)
+
+    def test_last_line_wo_a_newline_is_parsed(self):
+        # ARRANGE -- Drop the newline ending the file
+        with open(self.db_name, "rb+") as file:
+            file.truncate(file.seek(0, os.SEEK_END) - 1)
+
+        # ACT -- Run the code that is being tested
+        todos = controller.get_todos()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual([todo["id"] for todo in todos], list(range(1000)))
+
+    def test_file_is_parsed_in_one_process_while_other_threads_run(self):
+        # ARRANGE -- Another thread runs, which a forked child could deadlock on
+        stop = threading.Event()
+        thread = threading.Thread(target=stop.wait)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(stop.set)
+
+        # ACT -- Run the code that is being tested
+        with mock.patch.object(controller, "_chunk_bounds") as chunk_bounds:
+            todos = controller.get_todos()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        chunk_bounds.assert_not_called()
+        self.assertEqual([todo["id"] for todo in todos], list(range(1000)))
+
+
+class TestBloomFilter(unittest.TestCase):
+    def setUp(self):
+        """
+        - 100 todos, todo 5 deleted, looked up through the Bloom filter
+        """
+        self.db_name = "test_db.txt"
+        controller.DB_NAME = self.db_name
+        controller.BLOOM_FILTER = True
+        controller.create_db_if_not_exists()
+        controller.insert_todos(
+            [{"id": i, "msg": f"todo {i}", "complete": False} for i in range(100)]
+        )
+        controller.delete_todo(5)
+
+    def tearDown(self):
+        controller.BLOOM_FILTER = False
+        for path in [self.db_name, f"{self.db_name}.bloom"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_missing_ids_are_not_read_from_the_db(self):
+        # ARRANGE -- Fail on any read of the DB file
+        real_open = open
+
+        def open_except_db(path, *args, **kwargs):
+            self.assertNotEqual(path, self.db_name)
+            return real_open(path, *args, **kwargs)
+
+        # ACT + ASSERT -- The filter answers for the deleted and the unknown ids
+        controller.get_todo_by_id(0)  # Builds the filter
+        with mock.patch.object(controller, "open", open_except_db, create=True):
+            self.assertIsNone(controller.get_todo_by_id(5))
+            self.assertIsNone(controller.get_todo_by_id(1000))
+            self.assertFalse(controller.update_todo(5, "Nonexistent Todo"))
+            self.assertFalse(controller.delete_todo(1000))
+        self.assertEqual(controller.get_todo_by_id(6)["msg"], "todo 6")
+
+    def test_concurrent_first_lookups_build_the_filter_safely(self):
+        # ARRANGE -- Threads all finding no filter, like the async store's reads,
+        # w/ enough todos for the builds to overlap
+        controller.insert_todos(
+            [{"id": i, "msg": "more", "complete": False} for i in range(100, 5000)]
+        )
+        os.remove(f"{self.db_name}.bloom")
+        results, errors = [], []
+
+        def lookup(id):
+            try:
+                results.append(controller.get_todo_by_id(id))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=lookup, args=(i,)) for i in range(20)]
+
+        # Switch threads as often as possible, for them to interleave
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+
+        # ACT -- Run the code that is being tested
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 20)
+        self.assertEqual(
+            [name for name in os.listdir(".") if name.endswith(".tmp")], []
+        )
+
+    def test_lock_excludes_the_other_threads(self):
+        # ARRANGE -- Another thread tries to write while this one holds the lock
+        written = threading.Event()
+        writer = threading.Thread(
+            target=lambda: controller.add_todo("from thread") and written.set()
+        )
+
+        # ACT -- Run the code that is being tested
+        with controller.lock():
+            writer.start()
+            blocked = not written.wait(0.2)
+        writer.join()
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertTrue(blocked)
+        self.assertTrue(written.is_set())
+
+    def test_filter_is_updated_by_writes_and_grows(self):
+        # ACT -- Run the code that is being tested
+        controller.get_todo_by_id(0)  # Builds the filter, sized for 1024 ids
+        controller.insert_todos(
+            [{"id": i, "msg": "new", "complete": False} for i in range(100, 3000)]
+        )
+        controller.execute_batch([("delete_todo", (7,)), ("add_todo", ("last",))])
+
+        # ASSERT -- Evaluate result and compare to expected value
+        bloom = controller.bloom_filter.BloomFilter.open(controller._bloom_path())
+        self.addCleanup(bloom.close)
+        self.assertEqual(bloom.count, 2999)
+        self.assertGreaterEqual(bloom.size, 3000 * controller.BLOOM_COUNTERS_PER_ID)
+        self.assertIn(2500, bloom)
+        self.assertIsNone(controller.get_todo_by_id(7))
+        self.assertFalse(controller._might_exist(7))
+
+    def test_filter_is_rebuilt_when_the_db_changes_behind_its_back(self):
+        # ARRANGE -- Replace the DB w/o going through the controller
+        controller.get_todo_by_id(0)
+        replaced = controller.get_todos() + [{"id": 5, "msg": "back", "complete": True}]
+        os.remove(self.db_name)
+        controller.BLOOM_FILTER = False
+        try:
+            controller.create_db_if_not_exists()
+            controller.insert_todos(replaced)
+        finally:
+            controller.BLOOM_FILTER = True
+
+        # ACT -- Run the code that is being tested
+        todo = controller.get_todo_by_id(5)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(todo, {"id": 5, "msg": "back", "complete": True})
+
+
+class TestBinarySearch(unittest.TestCase):
+    def setUp(self):
+        self.db_name = "test_db.txt"
+        controller.DB_NAME = self.db_name
+
+    def tearDown(self):
+        for path in [self.db_name, f"{self.db_name}.bloom"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def write_ids(self, ids):
+        with open(self.db_name, "w") as file:
+            file.writelines(f"{id},todo {id},{id % 2 == 0}\n" for id in ids)
+
+    def test_ids_in_order_are_found_wo_scanning(self):
+        # ARRANGE -- Fail on any scan of the DB file (the search opens it in binary),
+        # once the first miss scanned it and an id was appended in order
+        self.write_ids(range(0, 2000, 2))
+        self.assertIsNone(controller.get_todo_by_id(1))
+        controller.insert_todos([{"id": 2000, "msg": "todo 2000", "complete": True}])
+        real_open = open
+
+        def open_except_scans(path, mode="r", *args, **kwargs):
+            self.assertFalse(path == self.db_name and mode == "r")
+            return real_open(path, mode, *args, **kwargs)
+
+        # ACT -- Run the code that is being tested
+        with mock.patch.object(controller, "open", open_except_scans, create=True):
+            todos = [controller.get_todo_by_id(id) for id in (0, 2, 1000, 2000)]
+            missing = [controller.get_todo_by_id(id) for id in (-1, 1001, 2002)]
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(
+            todos,
+            [
+                {"id": id, "msg": f"todo {id}", "complete": True}
+                for id in (0, 2, 1000, 2000)
+            ],
+        )
+        self.assertEqual(missing, [None, None, None])
+
+    def test_ids_out_of_order_fall_back_to_a_scan(self):
+        # ARRANGE -- A migrated range, then an id reused by add_todo() after deletes
+        self.write_ids([5, 6, 7, 0, 1, 2, 3, 4])
+        controller.delete_todo(0)
+        controller.delete_todo(1)
+        controller.add_todo("reused")
+
+        # ACT -- Run the code that is being tested
+        todos = [controller.get_todo_by_id(id) for id in range(8)]
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(
+            [todo and todo["id"] for todo in todos], [None, None, 2, 3, 4, 5, 6, 7]
+        )
+        self.assertEqual(controller.get_todo_by_id(6)["msg"], "todo 6")
+        self.assertIs(controller._search_file(self.db_name, 6), controller._UNSORTED)
+
+    def test_ids_out_of_order_the_search_doesnt_notice_are_found(self):
+        # ARRANGE -- Every line the search reads is between the first and last ids
+        self.write_ids([29, 36, 23, 22, 9, 29, 12, 34, 30, 34])
+
+        # ACT -- Run the code that is being tested
+        todo = controller.get_todo_by_id(36)
+
+        # ASSERT -- Evaluate result and compare to expected value
+        self.assertEqual(todo["id"], 36)
+        self.assertIsNone(controller._search_file(self.db_name, 36))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,4 +1,10 @@
-import cli
+import os
+import sys
+
+# The CLI is shared by every backend and lives in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cli  # noqa: E402
 
 if __name__ == "__main__":
-    cli.start_cli()
+    cli.main(backend="txt")